@@ -4,7 +4,7 @@ Manages all application settings using Pydantic Settings
 """
 
 from functools import lru_cache
-from typing import Optional
+from typing import Dict, List, Optional
 from pydantic_settings import BaseSettings
 
 
@@ -22,9 +22,35 @@ class Settings(BaseSettings):
     # Google Gemini
     gemini_api_key: Optional[str] = None
     gemini_model: str = "gemini-2.0-flash"
+    llm_max_concurrency: int = 16  # Concurrent Gemini calls per process
+    llm_timeout: float = 30.0  # Seconds per call (and per streamed chunk)
+    llm_max_retries: int = 2  # Retries for failed or timed-out calls
+    llm_retry_backoff: float = 0.5  # Base seconds for exponential retry backoff
+    llm_circuit_failure_threshold: int = 5  # Consecutive failed calls before the circuit opens
+    llm_circuit_reset_timeout: float = 30.0  # Seconds before a trial call is allowed through
+    
+    # Vector store
+    vector_store_backend: str = "chroma"  # "chroma" or "mmap" (quantized memory-mapped NumPy index)
+    mmap_index_directory: str = "./vector_index"
+    mmap_index_dtype: str = "float16"  # "float16" (2x smaller than float32) or "int8" (4x)
+    vector_store_manifest_path: str = "./vector_store_manifest.json"  # Live index generation after a rebuild
+    reindex_page_size: int = 500  # Rows read from the database per rebuild page
+    reindex_max_workers: int = 2  # Threads embedding and writing rebuild batches
     
     # ChromaDB
     chroma_persist_directory: str = "./chroma_db"
+    vector_store_max_workers: int = 8  # Threads running blocking ChromaDB calls
+    vector_store_max_pending: int = 64  # Calls that may queue for a thread before callers wait
+    vector_store_queue_timeout: Optional[float] = None  # Seconds to wait for admission (None = no limit)
+    
+    # Embeddings
+    embedding_model_name: str = "all-MiniLM-L6-v2"  # Chroma's default ONNX model
+    embedding_query_cache_size: int = 2048  # Query vectors kept in the in-process LRU cache
+    embedding_max_workers: int = 2  # Threads running the embedding model
+    embedding_max_pending: int = 32  # Embedding calls that may queue before callers wait
+    embedding_cache_enabled: bool = True  # Persist document embeddings keyed by (model, content SHA-256)
+    embedding_cache_path: str = "./embedding_cache.sqlite3"
+    embedding_cache_max_entries: int = 500_000  # Least recently used vectors are evicted beyond this
     
     # JWT Authentication
     secret_key: str = "your-secret-key-change-in-production"
@@ -35,10 +61,63 @@ class Settings(BaseSettings):
     # LTP Settings
     ltp_update_threshold: float = 0.1  # Minimum change to trigger profile update
     concept_mastery_threshold: float = 0.8  # Score needed to mark concept as mastered
+    ltp_sm2_min_ease: float = 1.3  # Lower bound for the SM-2 ease factor
+    ltp_sm2_max_ease: float = 2.5  # Upper bound for the SM-2 ease factor
+    ltp_replan_chunk_size: int = 10000  # Mastery rows per chunk when re-planning review schedules
     
     # RAG Settings
     rag_top_k_student: int = 5  # Number of student context docs to retrieve
     rag_top_k_academic: int = 5  # Number of academic docs to retrieve
+    rag_student_shard_mode: str = "none"  # "none", "profile" (collection per profile) or "hash" (buckets)
+    rag_student_shard_buckets: int = 64  # Bucket collections in "hash" mode
+    rag_student_shard_cache_size: int = 256  # Shards kept loaded; least recently used ones are unloaded from the backend
+    rag_student_candidate_multiplier: int = 3  # Student candidates fetched per result for re-scoring
+    rag_student_recency_half_life_days: float = 30.0  # Age at which the recency factor halves
+    rag_student_recency_weight: float = 0.3  # Share of the student score subject to time decay (0 = off)
+    rag_student_error_boost: float = 0.25  # Extra weight for contexts the student answered wrongly
+    rag_student_context_type_weights: Dict[str, float] = {}  # e.g. {"chat": 0.8, "assessment": 1.2}
+    rag_compaction_enabled: bool = False  # Opt in: periodically merges old student contexts into summaries and deletes the originals
+    rag_compaction_interval_seconds: float = 3600.0  # Pause between compaction runs
+    rag_compaction_context_types: List[str] = ["chat"]  # Context types subject to compaction
+    rag_compaction_min_age_days: float = 30.0  # Contexts older than this are compacted
+    rag_compaction_max_contexts_per_profile: int = 500  # Older contexts beyond this count are compacted too
+    rag_compaction_min_group_size: int = 5  # Contexts per concept needed before they are merged
+    rag_compaction_batch_size: int = 200  # Contexts deleted per vector/SQL batch
+    rag_compaction_summary_max_tokens: int = 400  # Length cap for a summary context
+    rag_compaction_use_llm: bool = True  # Summarize with the LLM when available (extractive otherwise)
+    rag_student_search_timeout: Optional[float] = 2.0  # Seconds before student retrieval is skipped
+    rag_academic_search_timeout: Optional[float] = 3.0  # Seconds before academic retrieval is skipped
+    rag_ingest_batch_size: int = 64  # Documents embedded and written to Chroma per batch
+    rag_chunk_tokens: int = 300  # Target chunk size for /documents/ingest
+    rag_chunk_overlap_tokens: int = 50  # Trailing sentences repeated at the start of the next chunk
+    rag_dedup_enabled: bool = True  # Skip exact and near-duplicate chunks on ingest
+    rag_dedup_threshold: float = 0.8  # Estimated Jaccard similarity at which a chunk is a near duplicate
+    rag_dedup_num_perm: int = 128  # MinHash permutations per chunk
+    rag_dedup_bands: int = 16  # LSH bands (num_perm must be a multiple)
+    rag_gap_analysis_mode: str = "inline"  # "inline", "parallel" or "deferred"
+    rag_answer_cache_enabled: bool = True
+    rag_answer_cache_similarity: float = 0.95  # Cosine similarity needed to reuse an answer
+    rag_answer_cache_ttl_seconds: float = 3600.0
+    rag_answer_cache_max_entries: int = 1000
+    rag_lexical_weight: float = 0.3  # BM25 share in hybrid academic retrieval (0 = vector only)
+    rag_hybrid_rrf_k: int = 60  # Reciprocal rank fusion damping constant
+    rag_rerank_enabled: bool = False  # Requires sentence-transformers
+    rag_rerank_model: str = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+    rag_rerank_candidate_multiplier: int = 4  # Academic candidates fetched per requested result
+    rag_rerank_batch_size: int = 32  # Max (query, document) pairs per model call
+    rag_rerank_max_wait_ms: float = 5.0  # How long a batch waits for concurrent requests
+    rag_rerank_max_workers: int = 2  # CPU threads running the cross-encoder
+    rag_rerank_timeout: float = 0.5  # Latency budget; retrieval order is kept when exceeded
+    rag_context_token_budget: int = 2000  # Prompt tokens available for retrieved chunks
+    rag_context_academic_share: float = 0.6  # Budget share reserved for academic sources
+    rag_context_dedup_threshold: float = 0.85  # Shingle similarity at which chunks count as duplicates
+    rag_gap_context_token_budget: int = 800  # Context tokens sent to gap detection
+    rag_write_buffer_enabled: bool = True  # Persist chat history/interaction contexts after responding
+    rag_write_buffer_max_batch: int = 200  # Queued rows that trigger an early flush
+    rag_write_buffer_flush_interval: float = 1.0  # Seconds between time-triggered flushes
+    rag_write_buffer_max_retries: int = 3  # Retries of a flush hitting a transient database error
+    rag_write_buffer_retry_backoff: float = 0.2  # Base delay in seconds, doubled per retry
+    rag_write_buffer_max_pending: int = 10000  # Queued rows per table; the oldest are dropped beyond this during an outage
     
     class Config:
         env_file = ".env"
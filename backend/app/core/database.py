@@ -3,8 +3,12 @@ SkillTwin - Database Configuration
 Async SQLAlchemy setup with SQLite for development
 """
 
+from typing import Any, Dict
+from sqlalchemy import event, inspect, text, Integer
+from sqlalchemy.ext.compiler import compiles
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, async_sessionmaker
-from sqlalchemy.orm import DeclarativeBase
+from sqlalchemy.orm import DeclarativeBase, Session
+from sqlalchemy.sql.functions import FunctionElement
 from app.core.config import settings
 
 
@@ -23,6 +27,39 @@ async_session_maker = async_sessionmaker(
 )
 
 
+# Total SQL statements sent by the engine (see statements_executed)
+_statement_count = 0
+
+
+@event.listens_for(engine.sync_engine, "before_cursor_execute")
+def _count_statement(*_args) -> None:
+    global _statement_count
+    _statement_count += 1
+
+
+def statements_executed() -> int:
+    """Statements run so far; diff the value around a call to count its queries"""
+    return _statement_count
+
+
+_REQUEST_CACHE_PREFIX = "request_cache:"
+
+
+def request_cache(session: AsyncSession, name: str) -> Dict[Any, Any]:
+    """
+    Dict cache that lives as long as the session, i.e. one request when the
+    session comes from get_db. Services sharing the session share the cache.
+    Cleared on rollback, since rolled-back objects are expired.
+    """
+    return session.info.setdefault(_REQUEST_CACHE_PREFIX + name, {})
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _clear_request_caches(session: Session, previous_transaction) -> None:
+    for key in [k for k in session.info if str(k).startswith(_REQUEST_CACHE_PREFIX)]:
+        del session.info[key]
+
+
 class Base(DeclarativeBase):
     """Base class for all database models"""
     pass
@@ -37,7 +74,71 @@ async def get_db() -> AsyncSession:
             await session.close()
 
 
+def dialect_insert(model):
+    """INSERT for the configured database, with on_conflict_do_nothing/do_update"""
+    if engine.dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert(model)
+
+
+class floor_int(FunctionElement):
+    """floor(x) as an INTEGER, rounding the same way as Python's int() for x >= 0"""
+    type = Integer()
+    inherit_cache = True
+
+
+@compiles(floor_int)
+def _compile_floor_int(element, compiler, **kw):
+    return f"CAST(FLOOR({compiler.process(element.clauses, **kw)}) AS INTEGER)"
+
+
+@compiles(floor_int, "sqlite")
+def _compile_floor_int_sqlite(element, compiler, **kw):
+    # SQLite's FLOOR needs the optional math functions; CAST truncates, which is floor for x >= 0
+    return f"CAST({compiler.process(element.clauses, **kw)} AS INTEGER)"
+
+
+def _create_missing_indexes(connection) -> None:
+    """
+    create_all skips the indexes of tables that already exist. Models that
+    need existing rows fixed first do it in a before_create listener on the
+    index. Failing to create an index stops startup: queries depend on them
+    (e.g. upserts need their unique index).
+    """
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            try:
+                index.create(connection, checkfirst=True)
+            except Exception as e:
+                raise RuntimeError(f"Could not create index {index.name} on {table.name}: {e}") from e
+
+
+def _add_missing_columns(connection) -> None:
+    """
+    create_all skips the new columns of tables that already exist. Nullable
+    ones are added in place; anything else needs a manual migration, so
+    startup stops instead of failing on the first query.
+    """
+    inspector = inspect(connection)
+    for table in Base.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing:
+                continue
+            if not column.nullable or column.primary_key:
+                raise RuntimeError(f"Column {table.name}.{column.name} is missing and must be migrated manually")
+            column_type = column.type.compile(dialect=connection.dialect)
+            connection.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}"))
+            print(f"🔧 Added column {table.name}.{column.name}")
+
+
 async def init_db():
     """Initialize database tables"""
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(_add_missing_columns)
+        await conn.run_sync(_create_missing_indexes)
@@ -0,0 +1,152 @@
+"""
+SkillTwin - Bounded Executor
+Runs blocking client calls (ChromaDB, embedding models) off the event loop
+"""
+
+import asyncio
+import functools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+
+class ExecutorSaturatedError(RuntimeError):
+    """Raised when a call is not admitted to the executor within its queue timeout"""
+
+
+class BoundedExecutor:
+    """
+    Thread pool with admission control for blocking calls.
+    At most `max_workers` calls run at once and at most `max_pending` more may
+    queue for a worker. Callers beyond that wait for admission on the event loop,
+    which is the back-pressure reported by `get_stats`.
+    """
+    
+    def __init__(
+        self,
+        name: str,
+        max_workers: int,
+        max_pending: int,
+        queue_timeout: Optional[float] = None
+    ):
+        self.name = name
+        self.max_workers = max(1, max_workers)
+        self.max_pending = max(0, max_pending)
+        self.queue_timeout = queue_timeout
+        
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._admission: Optional[asyncio.Semaphore] = None
+        self._lock = threading.Lock()
+        
+        # Metrics
+        self._waiting = 0  # Callers waiting for admission
+        self._admitted = 0  # Calls queued or running in the pool
+        self._running = 0
+        self._completed = 0
+        self._failed = 0
+        self._rejected = 0
+        self._total_queue_seconds = 0.0
+        self._total_run_seconds = 0.0
+        self._max_queue_seconds = 0.0
+    
+    @property
+    def capacity(self) -> int:
+        return self.max_workers + self.max_pending
+    
+    @property
+    def saturated(self) -> bool:
+        """True when new calls would have to wait for admission"""
+        return self._waiting > 0 or self._admitted >= self.capacity
+    
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.max_workers,
+                thread_name_prefix=self.name
+            )
+        return self._executor
+    
+    def _get_admission(self) -> asyncio.Semaphore:
+        if self._admission is None:
+            self._admission = asyncio.Semaphore(self.capacity)
+        return self._admission
+    
+    async def run(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """Run a blocking callable in the pool and await its result"""
+        admission = self._get_admission()
+        
+        self._waiting += 1
+        try:
+            if self.queue_timeout is not None:
+                await asyncio.wait_for(admission.acquire(), timeout=self.queue_timeout)
+            else:
+                await admission.acquire()
+        except asyncio.TimeoutError:
+            self._rejected += 1
+            raise ExecutorSaturatedError(
+                f"{self.name} executor saturated ({self._admitted} calls in flight)"
+            )
+        finally:
+            self._waiting -= 1
+        
+        self._admitted += 1
+        submitted_at = time.perf_counter()
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(
+                self._get_executor(),
+                functools.partial(self._call, submitted_at, fn, args, kwargs)
+            )
+        finally:
+            self._admitted -= 1
+            admission.release()
+    
+    def _call(self, submitted_at: float, fn: Callable[..., Any], args: tuple, kwargs: dict) -> Any:
+        """Worker-thread wrapper that records queue and run times"""
+        started_at = time.perf_counter()
+        queued = started_at - submitted_at
+        with self._lock:
+            self._running += 1
+            self._total_queue_seconds += queued
+            self._max_queue_seconds = max(self._max_queue_seconds, queued)
+        
+        failed = False
+        try:
+            return fn(*args, **kwargs)
+        except BaseException:
+            failed = True
+            raise
+        finally:
+            with self._lock:
+                self._running -= 1
+                self._total_run_seconds += time.perf_counter() - started_at
+                if failed:
+                    self._failed += 1
+                else:
+                    self._completed += 1
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Snapshot of pool usage and back-pressure"""
+        with self._lock:
+            finished = self._completed + self._failed
+            return {
+                "max_workers": self.max_workers,
+                "max_pending": self.max_pending,
+                "running": self._running,
+                "queued": max(0, self._admitted - self._running),
+                "waiting_for_admission": self._waiting,
+                "completed": self._completed,
+                "failed": self._failed,
+                "rejected": self._rejected,
+                "avg_queue_ms": round(self._total_queue_seconds / finished * 1000, 3) if finished else 0.0,
+                "max_queue_ms": round(self._max_queue_seconds * 1000, 3),
+                "avg_run_ms": round(self._total_run_seconds / finished * 1000, 3) if finished else 0.0,
+                "saturated": self.saturated
+            }
+    
+    def shutdown(self, wait: bool = True) -> None:
+        """Stop the worker threads"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait)
+            self._executor = None
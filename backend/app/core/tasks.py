@@ -0,0 +1,39 @@
+"""
+SkillTwin - Background Tasks
+Tracks fire-and-forget jobs so they are not garbage collected and can be drained on shutdown
+"""
+
+import asyncio
+from typing import Coroutine, Any, Set
+
+_background_tasks: Set[asyncio.Task] = set()
+
+
+def _on_task_done(task: asyncio.Task) -> None:
+    _background_tasks.discard(task)
+    if not task.cancelled() and task.exception() is not None:
+        print(f"Background task {task.get_name()} failed: {task.exception()}")
+
+
+def spawn_background_task(coro: Coroutine[Any, Any, Any], name: str) -> asyncio.Task:
+    """Run a coroutine in the background, keeping a reference until it finishes"""
+    task = asyncio.create_task(coro, name=name)
+    _background_tasks.add(task)
+    task.add_done_callback(_on_task_done)
+    return task
+
+
+def pending_background_tasks() -> int:
+    """Number of background tasks still running"""
+    return len(_background_tasks)
+
+
+async def drain_background_tasks(timeout: float = 30.0) -> None:
+    """Wait for running background tasks, cancelling any still running after `timeout`"""
+    if not _background_tasks:
+        return
+    done, pending = await asyncio.wait(set(_background_tasks), timeout=timeout)
+    for task in pending:
+        task.cancel()
+    if pending:
+        await asyncio.gather(*pending, return_exceptions=True)
@@ -8,7 +8,8 @@ from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
 from app.core.config import settings
-from app.core.database import init_db
+from app.core.database import init_db, async_session_maker
+from app.core.tasks import drain_background_tasks
 
 # Import all models to register them with SQLAlchemy
 from app.models.user import User  # noqa: F401
@@ -26,6 +27,13 @@ from app.modules.dual_rag.models import (  # noqa: F401
     GapAnalysis
 )
 from app.modules.micro_lessons.models import MicroLesson  # noqa: F401
+from app.modules.dual_rag.vector_store import vector_store
+from app.modules.dual_rag.write_buffer import interaction_buffer
+from app.modules.dual_rag.service import DualRAGService
+from app.modules.dual_rag.reranker import reranker
+from app.modules.dual_rag.reindex import vector_rebuilder
+from app.modules.dual_rag.compaction import context_compactor
+from app.modules.dual_rag.vector_backends import read_vector_manifest
 
 # Import routers
 from app.modules.ltp.routes import router as ltp_router
@@ -42,11 +50,25 @@ async def lifespan(app: FastAPI):
     print("🚀 Starting SkillTwin Backend...")
     await init_db()
     print("✅ Database initialized")
+    async with async_session_maker() as db:
+        indexed = await DualRAGService(db, vector_store).rebuild_lexical_index()
+    print(f"✅ Lexical and duplicate indexes built ({indexed} academic documents)")
+    index_model = read_vector_manifest().get("embedding_model")
+    if index_model and index_model != settings.embedding_model_name:
+        print(f"⚠️ Vector index was built with {index_model}; run reindex_vectors.py for {settings.embedding_model_name}")
+    interaction_buffer.start()
+    context_compactor.start()
     
     yield
     
     # Shutdown
     print("👋 Shutting down SkillTwin Backend...")
+    await drain_background_tasks()
+    await context_compactor.stop()
+    await interaction_buffer.stop()
+    reranker.shutdown()
+    vector_rebuilder.shutdown()
+    vector_store.shutdown()
 
 
 # Create FastAPI app
@@ -0,0 +1,245 @@
+"""
+SkillTwin - Semantic Answer Cache
+Reuses Dual RAG answers for near-identical questions over the same academic sources
+"""
+
+import math
+import operator
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import List, Dict, Any, Optional, Tuple
+
+from app.core.config import settings
+
+# (subject, topic, modality, sorted academic doc ids, owning profile or None if shared)
+PartitionKey = Tuple[Optional[str], Optional[str], str, Tuple[str, ...], Optional[str]]
+
+
+def _unit(vector: List[float]) -> List[float]:
+    norm = math.sqrt(sum(v * v for v in vector))
+    return [v / norm for v in vector] if norm else list(vector)
+
+
+def _dot(a: List[float], b: List[float]) -> float:
+    return sum(map(operator.mul, a, b))
+
+
+class CachedAnswer:
+    """A cached answer together with the question vector it was generated for"""
+    
+    __slots__ = ("id", "partition", "embedding", "answer", "confidence", "created_at")
+    
+    def __init__(
+        self,
+        partition: PartitionKey,
+        embedding: List[float],
+        answer: str,
+        confidence: float
+    ):
+        self.id = str(uuid.uuid4())
+        self.partition = partition
+        self.embedding = embedding
+        self.answer = answer
+        self.confidence = confidence
+        self.created_at = time.monotonic()
+    
+    @property
+    def academic_doc_ids(self) -> Tuple[str, ...]:
+        return self.partition[3]
+
+
+class SemanticAnswerCache:
+    """
+    LRU + TTL cache of generated answers.
+    Entries are partitioned by subject/topic, modality and the exact set of
+    academic documents retrieved; within a partition a lookup hits when the
+    cosine similarity of the question vectors reaches `similarity_threshold`.
+    Answers personalized from a student's history or gaps are stored under
+    that profile and only served back to it; answers built from academic
+    sources alone are shared by everyone.
+    """
+    
+    def __init__(
+        self,
+        similarity_threshold: float = 0.95,
+        ttl_seconds: float = 3600.0,
+        max_entries: int = 1000,
+        enabled: bool = True
+    ):
+        self.similarity_threshold = similarity_threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.enabled = enabled
+        
+        self._entries: "OrderedDict[str, CachedAnswer]" = OrderedDict()
+        self._partitions: Dict[PartitionKey, List[str]] = {}
+        self._lock = threading.Lock()
+        
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._expirations = 0
+        self._invalidations = 0
+    
+    def _partition_key(
+        self,
+        subject: Optional[str],
+        topic: Optional[str],
+        modality: str,
+        academic_doc_ids: List[str],
+        profile_id: Optional[str] = None
+    ) -> PartitionKey:
+        return subject, topic, modality, tuple(sorted(academic_doc_ids)), profile_id
+    
+    def _remove(self, entry_id: str) -> None:
+        entry = self._entries.pop(entry_id, None)
+        if entry is None:
+            return
+        ids = self._partitions.get(entry.partition)
+        if ids is not None:
+            ids.remove(entry_id)
+            if not ids:
+                del self._partitions[entry.partition]
+    
+    def _expired(self, entry: CachedAnswer, now: float) -> bool:
+        return now - entry.created_at > self.ttl_seconds
+    
+    def lookup(
+        self,
+        embedding: List[float],
+        subject: Optional[str],
+        topic: Optional[str],
+        modality: str,
+        academic_doc_ids: List[str],
+        profile_id: Optional[str] = None
+    ) -> Optional[CachedAnswer]:
+        """Best fresh shared or own entry at or above the similarity threshold"""
+        if not self.enabled or not academic_doc_ids:
+            return None
+        
+        query = _unit(embedding)
+        partitions = {
+            self._partition_key(subject, topic, modality, academic_doc_ids, owner)
+            for owner in (None, profile_id)
+        }
+        now = time.monotonic()
+        
+        with self._lock:
+            best, best_score = None, self.similarity_threshold
+            candidates = [entry_id for partition in partitions for entry_id in self._partitions.get(partition, [])]
+            for entry_id in candidates:
+                entry = self._entries[entry_id]
+                if self._expired(entry, now):
+                    self._remove(entry_id)
+                    self._expirations += 1
+                    continue
+                score = _dot(query, entry.embedding)
+                if score >= best_score:
+                    best, best_score = entry, score
+            
+            if best is None:
+                self._misses += 1
+                return None
+            
+            self._entries.move_to_end(best.id)
+            self._hits += 1
+            return best
+    
+    def store(
+        self,
+        embedding: List[float],
+        subject: Optional[str],
+        topic: Optional[str],
+        modality: str,
+        academic_doc_ids: List[str],
+        answer: str,
+        confidence: float,
+        profile_id: Optional[str] = None
+    ) -> None:
+        """
+        Cache an answer, evicting the least recently used entries beyond capacity.
+        Pass the profile_id of a personalized answer so only that student gets it.
+        """
+        if not self.enabled or not academic_doc_ids:
+            return
+        
+        entry = CachedAnswer(
+            partition=self._partition_key(subject, topic, modality, academic_doc_ids, profile_id),
+            embedding=_unit(embedding),
+            answer=answer,
+            confidence=confidence
+        )
+        with self._lock:
+            self._entries[entry.id] = entry
+            self._partitions.setdefault(entry.partition, []).append(entry.id)
+            while len(self._entries) > self.max_entries:
+                oldest_id = next(iter(self._entries))
+                self._remove(oldest_id)
+                self._evictions += 1
+    
+    def invalidate_documents(self, doc_ids: List[str]) -> int:
+        """Drop entries whose answers were built from any of these documents"""
+        targets = set(doc_ids)
+        with self._lock:
+            stale = [
+                entry_id for entry_id, entry in self._entries.items()
+                if targets.intersection(entry.academic_doc_ids)
+            ]
+            for entry_id in stale:
+                self._remove(entry_id)
+            self._invalidations += len(stale)
+            return len(stale)
+    
+    def invalidate_scope(self, subject: Optional[str], topic: Optional[str]) -> int:
+        """
+        Drop entries that a new document with this subject/topic could change:
+        entries filtered to the same subject/topic and unfiltered entries.
+        """
+        with self._lock:
+            stale = [
+                entry_id for entry_id, entry in self._entries.items()
+                if entry.partition[0] in (None, subject) and entry.partition[1] in (None, topic)
+            ]
+            for entry_id in stale:
+                self._remove(entry_id)
+            self._invalidations += len(stale)
+            return len(stale)
+    
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._partitions.clear()
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Hit/miss counters for tuning the similarity threshold"""
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "enabled": self.enabled,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "similarity_threshold": self.similarity_threshold,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": round(self._hits / lookups, 4) if lookups else 0.0,
+                "evictions": self._evictions,
+                "expirations": self._expirations,
+                "invalidations": self._invalidations
+            }
+
+
+# Singleton instance
+answer_cache = SemanticAnswerCache(
+    similarity_threshold=settings.rag_answer_cache_similarity,
+    ttl_seconds=settings.rag_answer_cache_ttl_seconds,
+    max_entries=settings.rag_answer_cache_max_entries,
+    enabled=settings.rag_answer_cache_enabled
+)
+
+
+def get_answer_cache() -> SemanticAnswerCache:
+    """Dependency for getting the answer cache instance"""
+    return answer_cache
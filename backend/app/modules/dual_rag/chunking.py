@@ -0,0 +1,333 @@
+"""
+SkillTwin - Document Chunking
+Splits academic sources into overlapping token-sized chunks and detects duplicate chunks
+"""
+
+import hashlib
+import re
+import threading
+import zlib
+from typing import List, Dict, Any, Optional, Iterable, Tuple
+
+import numpy as np
+
+from app.core.config import settings
+from app.modules.dual_rag.context_packing import estimate_tokens
+
+_PARAGRAPH = re.compile(r"\n\s*\n")
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+_WORD = re.compile(r"\w+")
+_WHITESPACE = re.compile(r"\s+")
+
+# Mersenne prime for the MinHash permutations; hashes and coefficients stay
+# below it so a * h + b fits in uint64
+_MERSENNE_PRIME = (1 << 31) - 1
+
+
+class TextChunker:
+    """
+    Packs paragraphs and sentences into chunks of about `chunk_tokens`.
+    Each chunk starts with up to `overlap_tokens` of trailing sentences from the
+    previous one, so a definition split across a boundary is retrievable from both.
+    """
+    
+    def __init__(self, chunk_tokens: int = 300, overlap_tokens: int = 50):
+        self.chunk_tokens = max(1, chunk_tokens)
+        self.overlap_tokens = max(0, min(overlap_tokens, self.chunk_tokens // 2))
+    
+    def _units(self, text: str) -> List[str]:
+        """Sentences (paragraph ends included), with overlong sentences cut at word boundaries"""
+        units = []
+        for paragraph in _PARAGRAPH.split(text):
+            for sentence in _SENTENCE_END.split(paragraph.strip()):
+                sentence = _WHITESPACE.sub(" ", sentence).strip()
+                if not sentence:
+                    continue
+                if estimate_tokens(sentence) <= self.chunk_tokens:
+                    units.append(sentence)
+                    continue
+                piece = []
+                for word in sentence.split(" "):
+                    if piece and estimate_tokens(" ".join(piece + [word])) > self.chunk_tokens:
+                        units.append(" ".join(piece))
+                        piece = []
+                    piece.append(word)
+                if piece:
+                    units.append(" ".join(piece))
+        return units
+    
+    def split(
+        self,
+        text: str,
+        chunk_tokens: Optional[int] = None,
+        overlap_tokens: Optional[int] = None
+    ) -> List[str]:
+        """Chunks in document order; text that fits in one chunk comes back whole"""
+        if chunk_tokens is not None or overlap_tokens is not None:
+            return TextChunker(
+                chunk_tokens if chunk_tokens is not None else self.chunk_tokens,
+                overlap_tokens if overlap_tokens is not None else self.overlap_tokens
+            ).split(text)
+        
+        chunks: List[str] = []
+        current: List[str] = []
+        used = 0
+        fresh = 0  # Units in `current` that are not overlap from the previous chunk
+        for unit in self._units(text):
+            cost = estimate_tokens(unit) + (1 if current else 0)
+            if current and used + cost > self.chunk_tokens:
+                chunks.append(" ".join(current))
+                # Carry trailing sentences into the next chunk as overlap
+                overlap: List[str] = []
+                overlap_used = 0
+                for previous in reversed(current):
+                    previous_cost = estimate_tokens(previous) + 1
+                    if overlap_used + previous_cost > self.overlap_tokens:
+                        break
+                    overlap.insert(0, previous)
+                    overlap_used += previous_cost
+                # Drop overlap that would push this sentence past the chunk size
+                while overlap and overlap_used + estimate_tokens(unit) + 1 > self.chunk_tokens:
+                    overlap_used -= estimate_tokens(overlap.pop(0)) + 1
+                current = overlap
+                used = overlap_used
+                fresh = 0
+                cost = estimate_tokens(unit) + (1 if current else 0)
+            current.append(unit)
+            used += cost
+            fresh += 1
+        if current and fresh:
+            chunks.append(" ".join(current))
+        return chunks
+
+
+def normalize_text(text: str) -> str:
+    """Case-folded text with collapsed whitespace, used for exact duplicate hashing"""
+    return _WHITESPACE.sub(" ", text.casefold()).strip()
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha1(normalize_text(text).encode("utf-8")).hexdigest()
+
+
+def dedup_scope(subject: Optional[str], topic: Optional[str]) -> Tuple[str, str]:
+    """Scope key that duplicate detection is confined to"""
+    return (normalize_text(subject or ""), normalize_text(topic or ""))
+
+
+class DuplicateMatch:
+    """An existing chunk that a new chunk duplicates"""
+    
+    def __init__(self, doc_id: str, kind: str, similarity: float):
+        self.doc_id = doc_id
+        self.kind = kind  # "exact" or "near"
+        self.similarity = similarity
+
+
+class ChunkDeduplicator:
+    """
+    Exact and near-duplicate detection for academic chunks.
+    Exact duplicates are found by hashing normalized text; near duplicates by
+    MinHash signatures over word shingles, bucketed with LSH bands so a lookup
+    only compares against chunks sharing at least one band. Candidates are kept
+    when their estimated Jaccard similarity reaches `threshold`.
+    Chunks only duplicate chunks of the same scope (subject and topic), so a
+    passage shared by two courses is indexed under both.
+    """
+    
+    def __init__(
+        self,
+        threshold: float = 0.8,
+        num_perm: int = 128,
+        bands: int = 16,
+        shingle_size: int = 5,
+        enabled: bool = True,
+        seed: int = 1
+    ):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+        self.enabled = enabled
+        
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(1, _MERSENNE_PRIME, size=num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, _MERSENNE_PRIME, size=num_perm, dtype=np.uint64)
+        
+        self._exact: Dict[Tuple[Tuple, str], str] = {}  # (scope, content hash) -> doc_id
+        self._signatures: Dict[str, np.ndarray] = {}  # doc_id -> MinHash signature
+        self._hashes: Dict[str, str] = {}  # doc_id -> content hash
+        self._scopes: Dict[str, Tuple] = {}  # doc_id -> scope
+        self._buckets: Dict[Tuple[Tuple, int, bytes], set] = {}
+        self._lock = threading.Lock()
+        self.ready = False
+        
+        # Metrics
+        self._checks = 0
+        self._exact_hits = 0
+        self._near_hits = 0
+    
+    def __len__(self) -> int:
+        return len(self._hashes)
+    
+    def signature(self, text: str) -> Optional[np.ndarray]:
+        """MinHash signature of the text's word shingles (None for empty text)"""
+        words = _WORD.findall(text.casefold())
+        if not words:
+            return None
+        size = min(self.shingle_size, len(words))
+        shingles = {" ".join(words[i:i + size]) for i in range(len(words) - size + 1)}
+        hashes = np.fromiter(
+            (zlib.crc32(s.encode("utf-8")) % _MERSENNE_PRIME for s in shingles),
+            dtype=np.uint64,
+            count=len(shingles)
+        )
+        permuted = (np.outer(self._a, hashes) + self._b[:, None]) % _MERSENNE_PRIME
+        return permuted.min(axis=1)
+    
+    def _band_keys(self, signature: np.ndarray, scope: Tuple) -> List[Tuple[Tuple, int, bytes]]:
+        return [
+            (scope, band, signature[band * self.rows:(band + 1) * self.rows].tobytes())
+            for band in range(self.bands)
+        ]
+    
+    def _find(
+        self,
+        digest: str,
+        signature: Optional[np.ndarray],
+        scope: Tuple
+    ) -> Optional[DuplicateMatch]:
+        doc_id = self._exact.get((scope, digest))
+        if doc_id is not None:
+            return DuplicateMatch(doc_id, "exact", 1.0)
+        if signature is None:
+            return None
+        
+        best: Optional[DuplicateMatch] = None
+        seen = set()
+        for key in self._band_keys(signature, scope):
+            for candidate in self._buckets.get(key, ()):
+                if candidate in seen:
+                    continue
+                seen.add(candidate)
+                similarity = float(np.mean(self._signatures[candidate] == signature))
+                if similarity >= self.threshold and (best is None or similarity > best.similarity):
+                    best = DuplicateMatch(candidate, "near", similarity)
+        return best
+    
+    def _add(self, doc_id: str, digest: str, signature: Optional[np.ndarray], scope: Tuple) -> None:
+        if doc_id in self._hashes:
+            self._remove(doc_id)
+        self._hashes[doc_id] = digest
+        self._scopes[doc_id] = scope
+        self._exact.setdefault((scope, digest), doc_id)
+        if signature is not None:
+            self._signatures[doc_id] = signature
+            for key in self._band_keys(signature, scope):
+                self._buckets.setdefault(key, set()).add(doc_id)
+    
+    def _remove(self, doc_id: str) -> bool:
+        digest = self._hashes.pop(doc_id, None)
+        if digest is None:
+            return False
+        scope = self._scopes.pop(doc_id)
+        if self._exact.get((scope, digest)) == doc_id:
+            del self._exact[(scope, digest)]
+        signature = self._signatures.pop(doc_id, None)
+        if signature is not None:
+            for key in self._band_keys(signature, scope):
+                bucket = self._buckets.get(key)
+                if bucket is not None:
+                    bucket.discard(doc_id)
+                    if not bucket:
+                        del self._buckets[key]
+        return True
+    
+    def check_and_add(self, doc_id: str, text: str, scope: Tuple = ()) -> Optional[DuplicateMatch]:
+        """
+        Return the chunk of the same scope this text duplicates, or register it under `doc_id`.
+        Checking and registering under one lock keeps concurrent ingests from
+        both accepting the same passage.
+        """
+        digest = content_hash(text)
+        signature = self.signature(text)
+        with self._lock:
+            self._checks += 1
+            match = self._find(digest, signature, scope) if self.enabled else None
+            if match is None:
+                self._add(doc_id, digest, signature, scope)
+            elif match.kind == "exact":
+                self._exact_hits += 1
+            else:
+                self._near_hits += 1
+            return match
+    
+    def add(self, doc_id: str, text: str, scope: Tuple = ()) -> None:
+        """Register a chunk without checking it"""
+        digest = content_hash(text)
+        signature = self.signature(text)
+        with self._lock:
+            self._add(doc_id, digest, signature, scope)
+    
+    def remove_many(self, doc_ids: Iterable[str]) -> int:
+        with self._lock:
+            return sum(1 for doc_id in doc_ids if self._remove(doc_id))
+    
+    def rebuild(self, documents: Iterable[Tuple[str, str, Tuple]]) -> int:
+        """Replace the index with (doc_id, content, scope) triples and mark it ready"""
+        index = ChunkDeduplicator(
+            self.threshold, self.num_perm, self.bands, self.shingle_size, self.enabled
+        )
+        count = 0
+        for doc_id, content, scope in documents:
+            index._add(doc_id, content_hash(content), index.signature(content), scope)
+            count += 1
+        with self._lock:
+            self._exact = index._exact
+            self._signatures = index._signatures
+            self._hashes = index._hashes
+            self._scopes = index._scopes
+            self._buckets = index._buckets
+            self.ready = True
+        return count
+    
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "ready": self.ready,
+                "chunks": len(self._hashes),
+                "threshold": self.threshold,
+                "num_perm": self.num_perm,
+                "bands": self.bands,
+                "checks": self._checks,
+                "exact_duplicates": self._exact_hits,
+                "near_duplicates": self._near_hits
+            }
+
+
+# Singleton instances
+text_chunker = TextChunker(
+    chunk_tokens=settings.rag_chunk_tokens,
+    overlap_tokens=settings.rag_chunk_overlap_tokens
+)
+
+chunk_deduplicator = ChunkDeduplicator(
+    threshold=settings.rag_dedup_threshold,
+    num_perm=settings.rag_dedup_num_perm,
+    bands=settings.rag_dedup_bands,
+    enabled=settings.rag_dedup_enabled
+)
+
+
+def get_text_chunker() -> TextChunker:
+    """Dependency for getting the text chunker instance"""
+    return text_chunker
+
+
+def get_chunk_deduplicator() -> ChunkDeduplicator:
+    """Dependency for getting the chunk deduplicator instance"""
+    return chunk_deduplicator
@@ -0,0 +1,386 @@
+"""
+SkillTwin - Student Context Compaction
+Background job that condenses old student contexts into per-concept summaries
+"""
+
+import asyncio
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import List, Dict, Any, Optional, Tuple
+
+from sqlalchemy import select, delete, insert
+
+from app.core.config import settings
+from app.core.database import async_session_maker
+from app.core.tasks import spawn_background_task
+from app.modules.dual_rag.context_packing import truncate_to_tokens
+from app.modules.dual_rag.llm import LLMClient, get_llm_client
+from app.modules.dual_rag.models import StudentContext
+from app.modules.dual_rag.reindex import student_row_metadata
+from app.modules.dual_rag.schemas import ContextType
+from app.modules.dual_rag.vector_store import VectorStoreService, get_vector_store
+
+GroupKey = Tuple[Optional[str], Optional[str], Optional[str]]  # (concept_id, subject, topic)
+
+
+def _question(content: str) -> str:
+    """The question of a "Q: ...\\nA: ..." interaction context, or its first line"""
+    first_line = content.strip().split("\n", 1)[0]
+    return first_line[3:].strip() if first_line.startswith("Q: ") else first_line.strip()
+
+
+class StudentContextCompactor:
+    """
+    Retention policy for student contexts of the configured `context_types`:
+    contexts older than `min_age_days`, and the oldest ones beyond
+    `max_contexts_per_profile`, are merged per concept (or subject/topic) into
+    one "summary" context. Groups smaller than `min_group_size` are left alone.
+    A group's previous summary is folded into the new one, so each concept keeps
+    a single summary. Summaries are written before the originals are deleted in
+    batches from the vector store and the database; when a delete fails, the
+    superseded summaries it left are removed on a later run.
+    """
+    
+    def __init__(
+        self,
+        context_types: Optional[List[str]] = None,
+        min_age_days: float = 30.0,
+        max_contexts_per_profile: int = 500,
+        min_group_size: int = 5,
+        batch_size: int = 200,
+        summary_max_tokens: int = 400,
+        interval: float = 3600.0,
+        use_llm: bool = True,
+        enabled: bool = True,
+        vector_store: Optional[VectorStoreService] = None,
+        llm: Optional[LLMClient] = None
+    ):
+        self.context_types = context_types or [ContextType.CHAT.value]
+        self.min_age_days = min_age_days
+        self.max_contexts_per_profile = max(0, max_contexts_per_profile)
+        self.min_group_size = max(2, min_group_size)
+        self.batch_size = max(1, batch_size)
+        self.summary_max_tokens = summary_max_tokens
+        self.interval = interval
+        self.use_llm = use_llm
+        self.enabled = enabled
+        self._vector_store = vector_store
+        self._llm = llm
+        
+        self._task: Optional[asyncio.Task] = None
+        self._triggered: Optional[asyncio.Task] = None
+        self._wake: Optional[asyncio.Event] = None
+        self._lock: Optional[asyncio.Lock] = None
+        self._closing = False
+        
+        # Metrics
+        self._runs = 0
+        self._profiles_compacted = 0
+        self._contexts_removed = 0
+        self._summaries_written = 0
+        self._llm_summaries = 0
+        self._errors = 0
+        self._last_run_at: Optional[str] = None
+        self._last_run_seconds = 0.0
+    
+    @property
+    def vector_store(self) -> VectorStoreService:
+        return self._vector_store or get_vector_store()
+    
+    @property
+    def llm(self) -> LLMClient:
+        return self._llm or get_llm_client()
+    
+    # ============ Background Loop ============
+    
+    def start(self) -> None:
+        """Start the periodic compaction loop (called from the app lifespan)"""
+        if not self.enabled or self._task is not None:
+            return
+        self._closing = False
+        self._wake = asyncio.Event()
+        self._task = asyncio.create_task(self._run(), name="student-context-compaction")
+    
+    async def stop(self) -> None:
+        """Stop the loop; a run in progress finishes its current profile"""
+        if self._task is None:
+            return
+        self._closing = True
+        self._wake.set()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+    
+    def trigger(self) -> bool:
+        """Compact every profile in the background now; False if a triggered run is still going"""
+        if self._triggered is not None and not self._triggered.done():
+            return False
+        self._triggered = spawn_background_task(self.compact_all(), name="student-context-compaction-now")
+        return True
+    
+    async def _run(self) -> None:
+        while not self._closing:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.interval)
+            except asyncio.TimeoutError:
+                pass
+            if self._closing:
+                break
+            try:
+                await self.compact_all()
+            except Exception as e:
+                self._errors += 1
+                print(f"Compaction error: {e}")
+    
+    # ============ Compaction ============
+    
+    async def compact_all(self) -> Dict[str, Any]:
+        """Compact every profile that has contexts of the compacted types"""
+        async with async_session_maker() as db:
+            profile_ids = list((await db.scalars(
+                select(StudentContext.profile_id)
+                .where(StudentContext.context_type.in_(self.context_types))
+                .distinct()
+            )).all())
+        
+        totals = {"profiles": 0, "groups": 0, "removed": 0, "summaries": 0}
+        for profile_id in profile_ids:
+            if self._closing:
+                break
+            result = await self.compact_profile(profile_id)
+            totals["profiles"] += 1 if result["removed"] else 0
+            for key in ("groups", "removed", "summaries"):
+                totals[key] += result[key]
+        return totals
+    
+    async def compact_profile(self, profile_id: str, now: Optional[datetime] = None) -> Dict[str, Any]:
+        """Apply the retention policy to one profile"""
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            started = time.perf_counter()
+            now = now or datetime.utcnow()
+            try:
+                result = await self._compact_profile(profile_id, now)
+            except Exception:
+                self._errors += 1
+                raise
+            self._runs += 1
+            self._last_run_at = now.isoformat()
+            self._last_run_seconds = time.perf_counter() - started
+            if result["removed"]:
+                self._profiles_compacted += 1
+            return result
+    
+    def _select(self, contexts: List[StudentContext], now: datetime) -> List[StudentContext]:
+        """Contexts (newest first) that fall outside the age or count limits"""
+        cutoff = now - timedelta(days=self.min_age_days)
+        return [
+            context for index, context in enumerate(contexts)
+            if index >= self.max_contexts_per_profile
+            or (context.created_at is not None and context.created_at < cutoff)
+        ]
+    
+    @staticmethod
+    def _group_key(context: StudentContext) -> GroupKey:
+        if context.concept_id:
+            return context.concept_id, None, None
+        return None, context.subject, context.topic
+    
+    async def _compact_profile(self, profile_id: str, now: datetime) -> Dict[str, Any]:
+        async with async_session_maker() as db:
+            contexts = list((await db.scalars(
+                select(StudentContext)
+                .where(
+                    StudentContext.profile_id == profile_id,
+                    StudentContext.context_type.in_(self.context_types)
+                )
+                .order_by(StudentContext.created_at.desc())
+            )).all())
+            summaries = list((await db.scalars(
+                select(StudentContext).where(
+                    StudentContext.profile_id == profile_id,
+                    StudentContext.context_type == ContextType.SUMMARY.value
+                )
+            )).all())
+        
+        groups: Dict[GroupKey, List[StudentContext]] = {}
+        for context in self._select(contexts, now):
+            groups.setdefault(self._group_key(context), []).append(context)
+        # Newest first: each summary folds in the one before it, so only the newest is kept
+        previous: Dict[GroupKey, List[StudentContext]] = {}
+        for summary in sorted(summaries, key=lambda c: c.created_at or datetime.min, reverse=True):
+            previous.setdefault(self._group_key(summary), []).append(summary)
+        
+        result = {"profile_id": profile_id, "groups": 0, "removed": 0, "summaries": 0}
+        for key, members in groups.items():
+            if len(members) < self.min_group_size or self._closing:
+                continue
+            members.sort(key=lambda c: c.created_at or now)
+            priors = previous.pop(key, [])
+            prior = priors[0] if priors else None
+            summary_row = await self._build_summary(profile_id, members, prior)
+            
+            # Write the summary first so a failure part-way never loses history
+            await self.vector_store.add_student_contexts(
+                doc_ids=[summary_row["id"]],
+                contents=[summary_row["content"]],
+                metadatas=[student_row_metadata(StudentContext(**summary_row))]
+            )
+            async with async_session_maker() as db:
+                await db.execute(insert(StudentContext), [summary_row])
+                await db.commit()
+            self._summaries_written += 1
+            
+            removed = members + priors
+            await self._delete(profile_id, removed)
+            
+            result["groups"] += 1
+            result["summaries"] += 1
+            result["removed"] += len(removed)
+        
+        # Superseded summaries left by a run whose deletes failed
+        superseded = [summary for priors in previous.values() for summary in priors[1:]]
+        if superseded and not self._closing:
+            await self._delete(profile_id, superseded)
+            result["removed"] += len(superseded)
+        
+        self._contexts_removed += result["removed"]
+        return result
+    
+    async def _delete(self, profile_id: str, contexts: List[StudentContext]) -> None:
+        """Remove contexts from the vector store and the database in batches"""
+        for start in range(0, len(contexts), self.batch_size):
+            batch = contexts[start:start + self.batch_size]
+            deleted = await self.vector_store.delete_student_contexts(
+                [c.embedding_id or c.id for c in batch],
+                profile_id
+            )
+            if not deleted:
+                # Keep the rows so the next run retries instead of orphaning vectors
+                raise RuntimeError(f"vector delete failed for profile {profile_id}")
+            async with async_session_maker() as db:
+                await db.execute(
+                    delete(StudentContext).where(StudentContext.id.in_([c.id for c in batch]))
+                )
+                await db.commit()
+    
+    async def _build_summary(
+        self,
+        profile_id: str,
+        members: List[StudentContext],
+        prior: Optional[StudentContext]
+    ) -> Dict[str, Any]:
+        """StudentContext row condensing `members` (oldest first) and any prior summary"""
+        newest = members[-1]
+        label = newest.concept_name or newest.topic or newest.subject or "general questions"
+        content = None
+        if self.use_llm and self.llm.available:
+            content = await self._llm_summary(label, members, prior)
+        if content is None:
+            content = self._extractive_summary(label, members, prior)
+        
+        wrong = sum(1 for c in members if c.was_correct is False)
+        summary_id = str(uuid.uuid4())
+        return {
+            "id": summary_id,
+            "profile_id": profile_id,
+            "context_type": ContextType.SUMMARY.value,
+            "content": truncate_to_tokens(content, self.summary_max_tokens),
+            "concept_id": newest.concept_id,
+            "concept_name": newest.concept_name,
+            "subject": newest.subject,
+            "topic": newest.topic,
+            "tags": ["compacted"],
+            # A summary only counts as a mistake when most merged contexts were wrong
+            "was_correct": False if wrong * 2 > len(members) else None,
+            "confidence_score": None,
+            "embedding_id": summary_id,
+            # The real insert time, so a rebuild's catch-up picks the summary up;
+            # recency scoring uses the newest source's time instead
+            "created_at": datetime.utcnow(),
+            "recency_at": newest.recency_at or newest.created_at
+        }
+    
+    def _extractive_summary(
+        self,
+        label: str,
+        members: List[StudentContext],
+        prior: Optional[StudentContext]
+    ) -> str:
+        first, last = members[0].created_at, members[-1].created_at
+        span = f" ({first:%Y-%m-%d} to {last:%Y-%m-%d})" if first and last else ""
+        lines = [f"Summary of {len(members)} earlier interactions about {label}{span}."]
+        if prior is not None:
+            lines.append(f"Earlier: {prior.content}")
+        questions = []
+        for context in members:
+            question = _question(context.content)
+            if context.was_correct is False:
+                question += " (answered incorrectly)"
+            if question not in questions:
+                questions.append(question)
+        lines.append("Asked about: " + "; ".join(questions))
+        return "\n".join(lines)
+    
+    async def _llm_summary(
+        self,
+        label: str,
+        members: List[StudentContext],
+        prior: Optional[StudentContext]
+    ) -> Optional[str]:
+        transcript = "\n\n".join(c.content for c in members)
+        prompt = f"""Condense these past tutoring interactions about {label} into a short
+note for a tutor. Keep what the student asked, what they struggled with or got
+wrong, and what was explained. Write plain sentences, at most {self.summary_max_tokens * 3} characters.
+
+{f"Previous note: {prior.content}" if prior is not None else ""}
+
+Interactions:
+{transcript}"""
+        try:
+            text = (await self.llm.generate(prompt, temperature=0.2)).strip()
+        except Exception as e:
+            print(f"Compaction summary LLM error: {e}")
+            return None
+        if not text:
+            return None
+        self._llm_summaries += 1
+        return text
+    
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "running": self._task is not None,
+            "triggered_run_in_progress": self._triggered is not None and not self._triggered.done(),
+            "context_types": self.context_types,
+            "min_age_days": self.min_age_days,
+            "max_contexts_per_profile": self.max_contexts_per_profile,
+            "runs": self._runs,
+            "profiles_compacted": self._profiles_compacted,
+            "contexts_removed": self._contexts_removed,
+            "summaries_written": self._summaries_written,
+            "llm_summaries": self._llm_summaries,
+            "errors": self._errors,
+            "last_run_at": self._last_run_at,
+            "last_run_ms": round(self._last_run_seconds * 1000, 1)
+        }
+
+
+# Singleton instance
+context_compactor = StudentContextCompactor(
+    context_types=settings.rag_compaction_context_types,
+    min_age_days=settings.rag_compaction_min_age_days,
+    max_contexts_per_profile=settings.rag_compaction_max_contexts_per_profile,
+    min_group_size=settings.rag_compaction_min_group_size,
+    batch_size=settings.rag_compaction_batch_size,
+    summary_max_tokens=settings.rag_compaction_summary_max_tokens,
+    interval=settings.rag_compaction_interval_seconds,
+    use_llm=settings.rag_compaction_use_llm,
+    enabled=settings.rag_compaction_enabled
+)
+
+
+def get_context_compactor() -> StudentContextCompactor:
+    """Dependency for getting the student context compactor instance"""
+    return context_compactor
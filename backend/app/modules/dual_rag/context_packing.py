@@ -0,0 +1,189 @@
+"""
+SkillTwin - Context Packing
+Fits retrieved Dual RAG chunks into a prompt token budget
+"""
+
+import math
+import re
+from operator import attrgetter
+from typing import List, Optional, Set, Tuple
+
+from app.core.config import settings
+from app.modules.dual_rag.schemas import RetrievedContext
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+_WORD = re.compile(r"\w+")
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token for English text)"""
+    return math.ceil(len(text) / 4) if text else 0
+
+
+def _shingles(text: str, size: int = 3) -> Set[Tuple[str, ...]]:
+    words = _WORD.findall(text.lower())
+    if len(words) < size:
+        return {tuple(words)} if words else set()
+    return {tuple(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+
+def _jaccard(a: Set[Tuple[str, ...]], b: Set[Tuple[str, ...]]) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Cut text to at most `max_tokens`, ending on a sentence boundary when possible"""
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    
+    kept = []
+    used = 0
+    for sentence in _SENTENCE_END.split(text):
+        cost = estimate_tokens(sentence) + (1 if kept else 0)
+        if used + cost > max_tokens:
+            break
+        kept.append(sentence)
+        used += cost
+    
+    if kept:
+        return " ".join(kept)
+    # First sentence alone is too long: fall back to a word boundary
+    cut = text[:max_tokens * 4].rsplit(" ", 1)[0]
+    return cut.rstrip(",;:") + "..." if cut else ""
+
+
+class ContextPack:
+    """Chunks selected for a prompt plus token accounting"""
+    
+    def __init__(
+        self,
+        student_contexts: List[RetrievedContext],
+        academic_contexts: List[RetrievedContext],
+        tokens_used: int,
+        tokens_dropped: int,
+        duplicates_removed: int,
+        truncated: int
+    ):
+        self.student_contexts = student_contexts
+        self.academic_contexts = academic_contexts
+        self.tokens_used = tokens_used
+        self.tokens_dropped = tokens_dropped
+        self.duplicates_removed = duplicates_removed
+        self.truncated = truncated
+
+
+class ContextPacker:
+    """
+    Selects retrieved chunks for a prompt.
+    Near-duplicate chunks (word-shingle Jaccard >= `dedup_threshold`) are
+    removed, keeping the more relevant copy. Each source first fills its
+    share of the budget with whole chunks in relevance order; leftover
+    budget then goes to the best remaining chunks of either source, and the
+    last one that does not fit is truncated at a sentence boundary.
+    """
+    
+    def __init__(
+        self,
+        token_budget: int = 2000,
+        academic_share: float = 0.6,
+        dedup_threshold: float = 0.85,
+        min_chunk_tokens: int = 32
+    ):
+        self.token_budget = token_budget
+        self.academic_share = min(1.0, max(0.0, academic_share))
+        self.dedup_threshold = dedup_threshold
+        self.min_chunk_tokens = min_chunk_tokens
+    
+    def _dedupe(
+        self,
+        contexts: List[RetrievedContext],
+        seen: List[Set[Tuple[str, ...]]]
+    ) -> Tuple[List[RetrievedContext], int]:
+        """Drop chunks nearly identical to an already kept one; `seen` is shared across sources"""
+        kept = []
+        for context in contexts:
+            shingles = _shingles(context.content)
+            if any(_jaccard(shingles, other) >= self.dedup_threshold for other in seen):
+                continue
+            seen.append(shingles)
+            kept.append(context)
+        return kept, len(contexts) - len(kept)
+    
+    def pack(
+        self,
+        student_contexts: List[RetrievedContext],
+        academic_contexts: List[RetrievedContext],
+        token_budget: Optional[int] = None
+    ) -> ContextPack:
+        """Pack both sources into `token_budget` (defaults to the packer's budget)"""
+        budget = self.token_budget if token_budget is None else token_budget
+        total_tokens = sum(
+            estimate_tokens(c.content) for c in student_contexts + academic_contexts
+        )
+        
+        by_score = attrgetter("relevance_score")
+        # Academic chunks are deduplicated first so verified sources win ties
+        seen: List[Set[Tuple[str, ...]]] = []
+        academic, academic_dupes = self._dedupe(sorted(academic_contexts, key=by_score, reverse=True), seen)
+        student, student_dupes = self._dedupe(sorted(student_contexts, key=by_score, reverse=True), seen)
+        
+        selected = {"student": [], "academic": []}
+        remaining = []
+        used = 0
+        
+        # Pass 1: whole chunks within each source's share
+        shares = {
+            "academic": int(budget * self.academic_share) if student else budget,
+            "student": budget - int(budget * self.academic_share) if academic else budget
+        }
+        for source, candidates in (("academic", academic), ("student", student)):
+            spent = 0
+            for context in candidates:
+                cost = estimate_tokens(context.content)
+                if spent + cost <= shares[source]:
+                    selected[source].append(context)
+                    spent += cost
+                else:
+                    remaining.append(context)
+            used += spent
+        
+        # Pass 2: leftover budget to the best remaining chunks, truncating to fit
+        truncated = 0
+        for context in sorted(remaining, key=by_score, reverse=True):
+            room = budget - used
+            if room < self.min_chunk_tokens:
+                break
+            cost = estimate_tokens(context.content)
+            if cost > room:
+                content = truncate_to_tokens(context.content, room)
+                if estimate_tokens(content) < self.min_chunk_tokens:
+                    continue
+                context = context.model_copy(update={"content": content})
+                cost = estimate_tokens(content)
+                truncated += 1
+            selected[context.source].append(context)
+            used += cost
+        
+        return ContextPack(
+            student_contexts=sorted(selected["student"], key=by_score, reverse=True),
+            academic_contexts=sorted(selected["academic"], key=by_score, reverse=True),
+            tokens_used=used,
+            tokens_dropped=total_tokens - used,
+            duplicates_removed=academic_dupes + student_dupes,
+            truncated=truncated
+        )
+
+
+# Singleton instance
+context_packer = ContextPacker(
+    token_budget=settings.rag_context_token_budget,
+    academic_share=settings.rag_context_academic_share,
+    dedup_threshold=settings.rag_context_dedup_threshold
+)
+
+
+def get_context_packer() -> ContextPacker:
+    """Dependency for getting the context packer instance"""
+    return context_packer
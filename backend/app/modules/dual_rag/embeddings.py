@@ -0,0 +1,316 @@
+"""
+SkillTwin - Embedding Service
+Computes query/document embeddings off the event loop with an LRU query cache
+and a persistent document embedding cache
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import List, Dict, Any, Optional, Tuple
+
+import numpy as np
+from chromadb.utils import embedding_functions
+
+from app.core.config import settings
+from app.core.executor import BoundedExecutor
+
+# Chroma's built-in ONNX model; keeping it as the default means collections
+# created before embeddings were computed here stay compatible
+DEFAULT_MODEL_NAME = "all-MiniLM-L6-v2"
+
+
+def normalize_query(text: str) -> str:
+    """Collapse whitespace so trivially different spellings share a cache entry"""
+    return " ".join(text.split())
+
+
+def content_sha256(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class PersistentEmbeddingCache:
+    """
+    Disk-backed document embeddings keyed by (model name, content SHA-256).
+    Vectors are stored as float32 blobs in SQLite, so re-ingesting a source or
+    rebuilding the vector store only runs the model for text it has not seen.
+    Once `max_entries` is exceeded the least recently used rows are evicted.
+    """
+    
+    def __init__(self, path: str, max_entries: int = 500_000):
+        self.path = path
+        self.max_entries = max_entries
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self._entries = 0
+        
+        # Metrics
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+    
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            directory = os.path.dirname(os.path.abspath(self.path))
+            os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings ("
+                "model TEXT NOT NULL, content_hash TEXT NOT NULL, vector BLOB NOT NULL, "
+                "last_used REAL NOT NULL, PRIMARY KEY (model, content_hash))"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_embeddings_last_used ON embeddings (last_used)")
+            self._entries = conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+            self._evict(conn)  # max_entries may have been lowered since the last run
+            conn.commit()
+            self._conn = conn
+        return self._conn
+    
+    def _evict(self, conn: sqlite3.Connection) -> None:
+        overflow = self._entries - self.max_entries
+        if overflow > 0:
+            conn.execute(
+                "DELETE FROM embeddings WHERE rowid IN "
+                "(SELECT rowid FROM embeddings ORDER BY last_used LIMIT ?)",
+                (overflow,)
+            )
+            self._entries -= overflow
+            self._evictions += overflow
+    
+    def get_many(self, model: str, hashes: List[str]) -> Dict[str, List[float]]:
+        """Cached vectors for the given content hashes (misses are absent)"""
+        if not hashes:
+            return {}
+        unique = list(dict.fromkeys(hashes))
+        found: Dict[str, List[float]] = {}
+        with self._lock:
+            conn = self._connect()
+            # Stay well under SQLite's bound-parameter limit
+            for start in range(0, len(unique), 500):
+                chunk = unique[start:start + 500]
+                rows = conn.execute(
+                    f"SELECT content_hash, vector FROM embeddings WHERE model = ? "
+                    f"AND content_hash IN ({','.join('?' * len(chunk))})",
+                    [model, *chunk]
+                ).fetchall()
+                for content_hash, blob in rows:
+                    found[content_hash] = np.frombuffer(blob, dtype=np.float32).tolist()
+            if found:
+                conn.executemany(
+                    "UPDATE embeddings SET last_used = ? WHERE model = ? AND content_hash = ?",
+                    [(time.time(), model, content_hash) for content_hash in found]
+                )
+                conn.commit()
+            self._hits += len(found)
+            self._misses += len(unique) - len(found)
+        return found
+    
+    def put_many(self, model: str, items: Dict[str, List[float]]) -> None:
+        """Store vectors by content hash, evicting the least recently used rows if full"""
+        if not items:
+            return
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            before = conn.total_changes
+            conn.executemany(
+                "INSERT OR IGNORE INTO embeddings (model, content_hash, vector, last_used) VALUES (?, ?, ?, ?)",
+                [
+                    (model, content_hash, np.asarray(vector, dtype=np.float32).tobytes(), now)
+                    for content_hash, vector in items.items()
+                ]
+            )
+            self._entries += conn.total_changes - before
+            self._evict(conn)
+            conn.commit()
+    
+    def clear(self) -> None:
+        with self._lock:
+            conn = self._connect()
+            conn.execute("DELETE FROM embeddings")
+            conn.commit()
+            self._entries = 0
+    
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self._hits + self._misses
+            size = sum(
+                os.path.getsize(path)
+                for path in (self.path, self.path + "-wal")
+                if os.path.exists(path)
+            )
+            return {
+                "path": self.path,
+                "entries": self._entries,
+                "max_entries": self.max_entries,
+                "size_bytes": size,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": round(self._hits / lookups, 4) if lookups else 0.0,
+                "evictions": self._evictions
+            }
+    
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+class EmbeddingService:
+    """
+    Wraps the embedding model used by every vector collection.
+    Query vectors are cached by (model name, normalized text) so repeated
+    questions skip the model entirely; document vectors go through the
+    optional persistent cache.
+    """
+    
+    def __init__(
+        self,
+        model_name: str = DEFAULT_MODEL_NAME,
+        cache_size: int = 2048,
+        executor: Optional[BoundedExecutor] = None,
+        document_cache: Optional[PersistentEmbeddingCache] = None
+    ):
+        self.model_name = model_name
+        self.cache_size = cache_size
+        self.document_cache = document_cache
+        self._function = None
+        self._executor = executor or BoundedExecutor(
+            name="embedding",
+            max_workers=settings.embedding_max_workers,
+            max_pending=settings.embedding_max_pending
+        )
+        
+        self._cache: "OrderedDict[Tuple[str, str], List[float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+    
+    @property
+    def function(self):
+        """Chroma-compatible embedding function (created on first use)"""
+        if self._function is None:
+            if self.model_name == DEFAULT_MODEL_NAME:
+                self._function = embedding_functions.DefaultEmbeddingFunction()
+            else:
+                self._function = embedding_functions.SentenceTransformerEmbeddingFunction(
+                    model_name=self.model_name
+                )
+        return self._function
+    
+    @property
+    def executor(self) -> BoundedExecutor:
+        return self._executor
+    
+    def _cache_key(self, text: str) -> Tuple[str, str]:
+        return self.model_name, normalize_query(text).casefold()
+    
+    def _cache_get(self, key: Tuple[str, str]) -> Optional[List[float]]:
+        with self._lock:
+            vector = self._cache.get(key)
+            if vector is None:
+                self._misses += 1
+                return None
+            self._cache.move_to_end(key)
+            self._hits += 1
+            return vector
+    
+    def _cache_put(self, key: Tuple[str, str], vector: List[float]) -> None:
+        with self._lock:
+            self._cache[key] = vector
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+    
+    def _embed(self, texts: List[str]) -> List[List[float]]:
+        """Blocking model call; always run through the executor"""
+        return [list(map(float, vector)) for vector in self.function(texts)]
+    
+    async def embed_query(self, text: str) -> List[float]:
+        """Embed a single query, serving repeats from the LRU cache"""
+        key = self._cache_key(text)
+        vector = self._cache_get(key)
+        if vector is not None:
+            return vector
+        
+        vector = (await self._executor.run(self._embed, [normalize_query(text)]))[0]
+        self._cache_put(key, vector)
+        return vector
+    
+    async def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        """Embed several queries, running the model once for all uncached ones"""
+        keys = [self._cache_key(text) for text in texts]
+        vectors = [self._cache_get(key) for key in keys]
+        missing = list({keys[i]: texts[i] for i, v in enumerate(vectors) if v is None}.items())
+        if missing:
+            computed = await self._executor.run(
+                self._embed, [normalize_query(text) for _, text in missing]
+            )
+            fresh = {}
+            for (key, _), vector in zip(missing, computed):
+                self._cache_put(key, vector)
+                fresh[key] = vector
+            vectors = [v if v is not None else fresh[key] for key, v in zip(keys, vectors)]
+        return vectors
+    
+    def embed_documents_sync(self, texts: List[str]) -> List[List[float]]:
+        """Blocking: serve cached vectors and run the model only for the rest"""
+        if self.document_cache is None:
+            return self._embed(texts)
+        
+        hashes = [content_sha256(text) for text in texts]
+        cached = self.document_cache.get_many(self.model_name, hashes)
+        missing = {h: text for h, text in zip(hashes, texts) if h not in cached}
+        if missing:
+            computed = dict(zip(missing, self._embed(list(missing.values()))))
+            self.document_cache.put_many(self.model_name, computed)
+            cached.update(computed)
+        return [cached[h] for h in hashes]
+    
+    async def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Embed a batch of documents in a single model call, skipping cached content"""
+        if not texts:
+            return []
+        return await self._executor.run(self.embed_documents_sync, texts)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Query cache and executor statistics"""
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "model_name": self.model_name,
+                "query_cache_size": len(self._cache),
+                "query_cache_capacity": self.cache_size,
+                "query_cache_hits": self._hits,
+                "query_cache_misses": self._misses,
+                "query_cache_hit_rate": round(self._hits / lookups, 4) if lookups else 0.0,
+                "document_cache": self.document_cache.get_stats() if self.document_cache else None,
+                "executor": self._executor.get_stats()
+            }
+    
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=True)
+        if self.document_cache is not None:
+            self.document_cache.close()
+
+
+# Singleton instance
+embedding_service = EmbeddingService(
+    model_name=settings.embedding_model_name,
+    cache_size=settings.embedding_query_cache_size,
+    document_cache=PersistentEmbeddingCache(
+        path=settings.embedding_cache_path,
+        max_entries=settings.embedding_cache_max_entries
+    ) if settings.embedding_cache_enabled else None
+)
+
+
+def get_embedding_service() -> EmbeddingService:
+    """Dependency for getting the embedding service instance"""
+    return embedding_service
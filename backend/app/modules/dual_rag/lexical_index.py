@@ -0,0 +1,200 @@
+"""
+SkillTwin - Lexical Index
+In-process BM25 inverted index over academic documents, fused with vector results
+"""
+
+import math
+import re
+import threading
+from collections import Counter
+from typing import List, Dict, Any, Optional, Iterable, Tuple
+
+# \w keeps symbols like "²" attached ("mv²"); operators are dropped, so
+# "F = ma" and "F=ma" produce the same terms
+_TOKEN = re.compile(r"\w+")
+
+STOPWORDS = frozenset(
+    "a an and are as at be by for from how in is it of on or that the this to was what when "
+    "where which who why with".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    """Lower-cased word/symbol tokens without common English stopwords"""
+    return [t for t in _TOKEN.findall(text.casefold()) if t not in STOPWORDS]
+
+
+def _matches(metadata: Dict[str, Any], filters: Optional[Dict[str, Any]]) -> bool:
+    """Equality filters, mirroring the simple Chroma `where` dicts used by the service"""
+    if not filters:
+        return True
+    return all(metadata.get(key) == value for key, value in filters.items())
+
+
+class BM25Index:
+    """
+    Okapi BM25 over an inverted index (term -> {doc_id: term frequency}).
+    Documents are added and removed incrementally; searches only touch the
+    postings of the query terms, so lookups take microseconds.
+    """
+    
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self._postings: Dict[str, Dict[str, int]] = {}
+        self._doc_terms: Dict[str, Counter] = {}
+        self._doc_length: Dict[str, int] = {}
+        self._content: Dict[str, str] = {}
+        self._metadata: Dict[str, Dict[str, Any]] = {}
+        self._total_length = 0
+        self._lock = threading.Lock()
+        self.ready = False
+    
+    def __len__(self) -> int:
+        return len(self._doc_length)
+    
+    def _add(self, doc_id: str, content: str, metadata: Dict[str, Any]) -> None:
+        if doc_id in self._doc_length:
+            self._remove(doc_id)
+        terms = Counter(tokenize(content))
+        for term, tf in terms.items():
+            self._postings.setdefault(term, {})[doc_id] = tf
+        length = sum(terms.values())
+        self._doc_terms[doc_id] = terms
+        self._doc_length[doc_id] = length
+        self._content[doc_id] = content
+        self._metadata[doc_id] = metadata or {}
+        self._total_length += length
+    
+    def _remove(self, doc_id: str) -> bool:
+        terms = self._doc_terms.pop(doc_id, None)
+        if terms is None:
+            return False
+        for term in terms:
+            postings = self._postings.get(term)
+            if postings is not None:
+                postings.pop(doc_id, None)
+                if not postings:
+                    del self._postings[term]
+        self._total_length -= self._doc_length.pop(doc_id)
+        self._content.pop(doc_id, None)
+        self._metadata.pop(doc_id, None)
+        return True
+    
+    def add(self, doc_id: str, content: str, metadata: Optional[Dict[str, Any]] = None) -> None:
+        """Index (or re-index) a document"""
+        with self._lock:
+            self._add(doc_id, content, metadata)
+    
+    def add_many(self, documents: Iterable[Tuple[str, str, Dict[str, Any]]]) -> int:
+        """Index several (doc_id, content, metadata) tuples"""
+        count = 0
+        with self._lock:
+            for doc_id, content, metadata in documents:
+                self._add(doc_id, content, metadata)
+                count += 1
+        return count
+    
+    def remove(self, doc_id: str) -> bool:
+        with self._lock:
+            return self._remove(doc_id)
+    
+    def remove_many(self, doc_ids: Iterable[str]) -> int:
+        with self._lock:
+            return sum(1 for doc_id in doc_ids if self._remove(doc_id))
+    
+    def rebuild(self, documents: Iterable[Tuple[str, str, Dict[str, Any]]]) -> int:
+        """Replace the whole index and mark it ready for queries"""
+        index = BM25Index(self.k1, self.b)
+        count = index.add_many(documents)
+        with self._lock:
+            self._postings = index._postings
+            self._doc_terms = index._doc_terms
+            self._doc_length = index._doc_length
+            self._content = index._content
+            self._metadata = index._metadata
+            self._total_length = index._total_length
+            self.ready = True
+        return count
+    
+    def search(
+        self,
+        query: str,
+        n_results: int = 5,
+        filters: Optional[Dict[str, Any]] = None
+    ) -> List[Dict[str, Any]]:
+        """Top documents by BM25 score, formatted like vector store results"""
+        terms = set(tokenize(query))
+        with self._lock:
+            n_docs = len(self._doc_length)
+            if not terms or not n_docs:
+                return []
+            avg_length = self._total_length / n_docs
+            
+            scores: Dict[str, float] = {}
+            for term in terms:
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (n_docs - len(postings) + 0.5) / (len(postings) + 0.5))
+                for doc_id, tf in postings.items():
+                    norm = self.k1 * (1 - self.b + self.b * self._doc_length[doc_id] / avg_length)
+                    scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+            
+            ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+            results = []
+            for doc_id, score in ranked:
+                metadata = self._metadata[doc_id]
+                if not _matches(metadata, filters):
+                    continue
+                results.append({
+                    "id": doc_id,
+                    "content": self._content[doc_id],
+                    "metadata": metadata,
+                    "score": score
+                })
+                if len(results) >= n_results:
+                    break
+            return results
+    
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "ready": self.ready,
+                "documents": len(self._doc_length),
+                "terms": len(self._postings),
+                "avg_document_length": round(self._total_length / len(self._doc_length), 1)
+                if self._doc_length else 0.0
+            }
+
+
+def reciprocal_rank_fusion(
+    vector_results: List[Dict[str, Any]],
+    lexical_results: List[Dict[str, Any]],
+    lexical_weight: float,
+    n_results: int,
+    k: int = 60
+) -> List[Dict[str, Any]]:
+    """
+    Weighted RRF: score = (1 - w) / (k + vector rank) + w / (k + lexical rank).
+    Scores are rescaled so a document ranked first by both lists scores 1.0.
+    """
+    weights = (
+        (vector_results, 1.0 - lexical_weight, "vector_score"),
+        (lexical_results, lexical_weight, "lexical_score")
+    )
+    fused: Dict[str, Dict[str, Any]] = {}
+    for results, weight, key in weights:
+        for rank, result in enumerate(results, start=1):
+            entry = fused.setdefault(
+                result["id"],
+                {**result, "score": 0.0, "vector_score": None, "lexical_score": None}
+            )
+            entry["score"] += weight / (k + rank)
+            entry[key] = result["score"]
+    
+    best = 1.0 / (k + 1)
+    ranked = sorted(fused.values(), key=lambda item: item["score"], reverse=True)[:n_results]
+    for entry in ranked:
+        entry["score"] = entry["score"] / best
+    return ranked
@@ -0,0 +1,336 @@
+"""
+SkillTwin - LLM Client
+Process-wide Gemini client with concurrency limit, timeouts, retries and a circuit breaker
+"""
+
+import asyncio
+import time
+from typing import Any, AsyncIterator, Dict, Optional
+
+from app.core.config import settings
+
+# Optional: Import Google Gemini for LLM calls
+try:
+    import google.generativeai as genai
+    GEMINI_AVAILABLE = True
+except ImportError:
+    GEMINI_AVAILABLE = False
+
+
+class LLMUnavailableError(RuntimeError):
+    """Raised when the LLM is not configured or its circuit breaker is open"""
+
+
+class CircuitBreaker:
+    """
+    Classic closed -> open -> half-open breaker.
+    After `failure_threshold` consecutive failed calls the circuit opens and
+    calls are rejected immediately; after `reset_timeout` seconds one trial
+    call is let through and its outcome closes or re-opens the circuit.
+    """
+    
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+    
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_timeout = reset_timeout
+        self._state = self.CLOSED
+        self._consecutive_failures = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+        self.times_opened = 0
+    
+    @property
+    def state(self) -> str:
+        if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+            self._state = self.HALF_OPEN
+            self._trial_in_flight = False
+        return self._state
+    
+    def allow(self) -> bool:
+        """Whether a call may proceed right now"""
+        state = self.state
+        if state == self.CLOSED:
+            return True
+        if state == self.HALF_OPEN and not self._trial_in_flight:
+            self._trial_in_flight = True
+            return True
+        return False
+    
+    def record_success(self) -> None:
+        self._state = self.CLOSED
+        self._consecutive_failures = 0
+        self._trial_in_flight = False
+    
+    def record_failure(self) -> None:
+        self._consecutive_failures += 1
+        if self._state == self.HALF_OPEN or self._consecutive_failures >= self.failure_threshold:
+            if self._state != self.OPEN:
+                self.times_opened += 1
+            self._state = self.OPEN
+            self._opened_at = time.monotonic()
+            self._trial_in_flight = False
+    
+    def release_trial(self) -> None:
+        """
+        Called when the half-open trial call ends; a trial that was cancelled or
+        abandoned without an outcome counts as failed, so the circuit re-opens
+        and a later call gets its own trial.
+        """
+        if self._state == self.HALF_OPEN and self._trial_in_flight:
+            self.record_failure()
+    
+    def get_stats(self) -> Dict[str, Any]:
+        state = self.state
+        return {
+            "state": state,
+            "consecutive_failures": self._consecutive_failures,
+            "times_opened": self.times_opened,
+            "retry_in_seconds": round(max(0.0, self.reset_timeout - (time.monotonic() - self._opened_at)), 1)
+            if state == self.OPEN else 0.0
+        }
+
+
+class LLMClient:
+    """
+    Shared Gemini client.
+    The SDK is configured and the model built once per process, so its
+    underlying connection is reused across requests.
+    """
+    
+    def __init__(
+        self,
+        api_key: Optional[str],
+        model_name: str,
+        max_concurrency: int = 16,
+        timeout: float = 30.0,
+        max_retries: int = 2,
+        retry_backoff: float = 0.5,
+        failure_threshold: int = 5,
+        reset_timeout: float = 30.0
+    ):
+        self.api_key = api_key
+        self.model_name = model_name
+        self.timeout = timeout
+        self.max_retries = max(0, max_retries)
+        self.retry_backoff = retry_backoff
+        self.max_concurrency = max(1, max_concurrency)
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+        
+        self._model = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        
+        # Metrics
+        self._in_flight = 0
+        self._calls = 0
+        self._successes = 0
+        self._failures = 0
+        self._timeouts = 0
+        self._retries = 0
+        self._short_circuited = 0
+        self._blocked = 0
+        self._total_latency = 0.0
+    
+    @property
+    def available(self) -> bool:
+        """True when an LLM is configured (the circuit may still be open)"""
+        return GEMINI_AVAILABLE and bool(self.api_key)
+    
+    def _get_model(self):
+        if self._model is None:
+            genai.configure(api_key=self.api_key)
+            self._model = genai.GenerativeModel(self.model_name)
+        return self._model
+    
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._semaphore
+    
+    def _admit(self) -> bool:
+        """
+        Fail fast when the LLM is missing or the circuit is open.
+        Returns True when this call is the half-open trial and must release it.
+        """
+        if not self.available:
+            raise LLMUnavailableError("LLM is not configured")
+        trial = self.breaker.state == CircuitBreaker.HALF_OPEN
+        if not self.breaker.allow():
+            self._short_circuited += 1
+            raise LLMUnavailableError("LLM circuit breaker is open")
+        return trial
+    
+    def _generation_config(self, temperature: float, response_mime_type: Optional[str]):
+        config = {"temperature": temperature}
+        if response_mime_type:
+            config["response_mime_type"] = response_mime_type
+        return genai.GenerationConfig(**config)
+    
+    async def generate(
+        self,
+        prompt: str,
+        temperature: float = 0.7,
+        response_mime_type: Optional[str] = None
+    ) -> str:
+        """Generate a full completion, retrying transient failures"""
+        trial = self._admit()
+        self._calls += 1
+        started = time.perf_counter()
+        last_error: Optional[Exception] = None
+        
+        try:
+            for attempt in range(self.max_retries + 1):
+                if attempt:
+                    self._retries += 1
+                    await asyncio.sleep(self.retry_backoff * (2 ** (attempt - 1)))
+                try:
+                    async with self._get_semaphore():
+                        self._in_flight += 1
+                        try:
+                            response = await asyncio.wait_for(
+                                self._get_model().generate_content_async(
+                                    prompt,
+                                    generation_config=self._generation_config(temperature, response_mime_type)
+                                ),
+                                timeout=self.timeout
+                            )
+                        finally:
+                            self._in_flight -= 1
+                    text = response.text
+                    self._successes += 1
+                    self._total_latency += time.perf_counter() - started
+                    self.breaker.record_success()
+                    return text
+                except asyncio.TimeoutError as e:
+                    self._timeouts += 1
+                    last_error = e
+                except ValueError:
+                    # Blocked or empty candidates: the model did answer, so the
+                    # circuit stays closed, and retrying will not help
+                    self._blocked += 1
+                    self.breaker.record_success()
+                    raise
+                except Exception as e:
+                    last_error = e
+            
+            self._failures += 1
+            self.breaker.record_failure()
+            raise last_error or RuntimeError("LLM call failed")
+        finally:
+            if trial:
+                self.breaker.release_trial()
+    
+    async def stream(
+        self,
+        prompt: str,
+        temperature: float = 0.7
+    ) -> AsyncIterator[str]:
+        """
+        Stream completion text; only the initial request is retried.
+        A stream closed early by the consumer counts as neither success nor
+        failure, except that an unfinished half-open trial re-opens the circuit.
+        """
+        trial = self._admit()
+        self._calls += 1
+        started = time.perf_counter()
+        
+        try:
+            async with self._get_semaphore():
+                self._in_flight += 1
+                try:
+                    response = None
+                    last_error: Optional[Exception] = None
+                    for attempt in range(self.max_retries + 1):
+                        if attempt:
+                            self._retries += 1
+                            await asyncio.sleep(self.retry_backoff * (2 ** (attempt - 1)))
+                        try:
+                            response = await asyncio.wait_for(
+                                self._get_model().generate_content_async(
+                                    prompt,
+                                    generation_config=self._generation_config(temperature, None),
+                                    stream=True
+                                ),
+                                timeout=self.timeout
+                            )
+                            break
+                        except asyncio.TimeoutError as e:
+                            self._timeouts += 1
+                            last_error = e
+                        except Exception as e:
+                            last_error = e
+                
+                    if response is None:
+                        self._failures += 1
+                        self.breaker.record_failure()
+                        raise last_error or RuntimeError("LLM call failed")
+                
+                    chunks = response.__aiter__()
+                    while True:
+                        try:
+                            chunk = await asyncio.wait_for(chunks.__anext__(), timeout=self.timeout)
+                        except StopAsyncIteration:
+                            break
+                        except Exception:
+                            self._failures += 1
+                            self.breaker.record_failure()
+                            raise
+                        try:
+                            text = chunk.text
+                        except ValueError:
+                            # Blocked mid-stream: a model answer, not an outage
+                            self._blocked += 1
+                            self.breaker.record_success()
+                            raise
+                        if text:
+                            yield text
+                
+                    self._successes += 1
+                    self._total_latency += time.perf_counter() - started
+                    self.breaker.record_success()
+                finally:
+                    self._in_flight -= 1
+        finally:
+            if trial:
+                self.breaker.release_trial()
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Client configuration, call counters and circuit state"""
+        return {
+            "available": self.available,
+            "model": self.model_name,
+            "initialized": self._model is not None,
+            "max_concurrency": self.max_concurrency,
+            "in_flight": self._in_flight,
+            "calls": self._calls,
+            "successes": self._successes,
+            "failures": self._failures,
+            "timeouts": self._timeouts,
+            "retries": self._retries,
+            "short_circuited": self._short_circuited,
+            "blocked": self._blocked,
+            "avg_latency_ms": round(self._total_latency / self._successes * 1000, 1) if self._successes else 0.0,
+            "circuit": self.breaker.get_stats()
+        }
+
+
+_llm_client: Optional[LLMClient] = None
+
+
+def get_llm_client() -> LLMClient:
+    """Shared LLM client, created on first use"""
+    global _llm_client
+    if _llm_client is None:
+        _llm_client = LLMClient(
+            api_key=settings.gemini_api_key,
+            model_name=settings.gemini_model,
+            max_concurrency=settings.llm_max_concurrency,
+            timeout=settings.llm_timeout,
+            max_retries=settings.llm_max_retries,
+            retry_backoff=settings.llm_retry_backoff,
+            failure_threshold=settings.llm_circuit_failure_threshold,
+            reset_timeout=settings.llm_circuit_reset_timeout
+        )
+    return _llm_client
@@ -0,0 +1,607 @@
+"""
+SkillTwin - Memory-Mapped Vector Index
+Quantized (float16/int8) embeddings in memory-mapped files, searched with NumPy matrix products
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import sqlite3
+import threading
+from typing import List, Dict, Any, Optional, Tuple
+
+import numpy as np
+
+from app.modules.dual_rag.vector_backends import VectorBackend, VectorCollection
+
+# Metadata keys kept as hashed column arrays, so filtering never touches the record store
+FILTER_COLUMNS = ("profile_id", "subject", "topic", "context_type", "source_type")
+
+_INITIAL_CAPACITY = 1024
+_SCAN_ROWS = 65536  # Rows dequantized per matrix product, bounding temporary memory
+_SQLITE_CHUNK = 500  # Host parameters per IN (...) clause
+# Deleted and replaced rows stay in the files until this share of them is dead
+_COMPACT_DEAD_FRACTION = 0.3
+_COMPACT_MIN_DEAD_ROWS = 1024
+
+
+def _hash_value(value: Any) -> int:
+    """Stable 64-bit code for a metadata value (0 means missing)"""
+    if value is None:
+        return 0
+    digest = hashlib.blake2b(str(value).encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "little", signed=True) or 1
+
+
+def _flatten_where(where: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """Equality conditions from a Chroma-style where ({k: v}, {k: {"$eq": v}}, {"$and": [...]})"""
+    conditions: Dict[str, Any] = {}
+    if not where:
+        return conditions
+    for key, value in where.items():
+        if key == "$and":
+            for clause in value:
+                conditions.update(_flatten_where(clause))
+        elif key.startswith("$"):
+            raise ValueError(f"Unsupported where operator for mmap backend: {key}")
+        elif isinstance(value, dict):
+            if set(value) != {"$eq"}:
+                raise ValueError(f"Unsupported where operator for mmap backend: {value}")
+            conditions[key] = value["$eq"]
+        else:
+            conditions[key] = value
+    return conditions
+
+
+def _chunks(values: List[Any], size: int = _SQLITE_CHUNK):
+    for i in range(0, len(values), size):
+        yield values[i:i + size]
+
+
+class MmapCollection(VectorCollection):
+    """
+    One collection stored in its own directory:
+      meta.json       dimensions, dtype, used rows and live count
+      vectors.bin     (capacity, dim) float16 or int8 matrix
+      scales.bin      per-row float32 scale (int8 only)
+      norms.bin       per-row squared L2 norm of the original vector
+      alive.bin       per-row uint8 tombstone flag
+      col_<key>.bin   per-row int64 hash of each filter column
+      records.sqlite  row -> id, document, metadata JSON
+    Opening a collection only maps the files, so cold start is near-instant.
+    Distances are squared L2, matching Chroma's default space.
+    Deletes and upserts only tombstone rows; once enough are dead, compact()
+    copies the live rows into a new generation of the files (<name>.<n>.bin,
+    records.<n>.sqlite) and switches to it by rewriting meta.json.
+    """
+    
+    def __init__(
+        self,
+        path: str,
+        name: str,
+        dtype: str = "float16",
+        embedding_function=None,
+        metadata: Optional[Dict[str, Any]] = None
+    ):
+        self.name = name
+        self.path = path
+        self.embedding_function = embedding_function
+        self._lock = threading.RLock()
+        
+        os.makedirs(path, exist_ok=True)
+        self._meta_path = os.path.join(path, "meta.json")
+        if os.path.exists(self._meta_path):
+            with open(self._meta_path) as f:
+                self._meta = json.load(f)
+        else:
+            self._meta = {
+                "dtype": dtype,
+                "dim": None,
+                "size": 0,
+                "capacity": 0,
+                "live": 0,
+                "metadata": metadata or {}
+            }
+            self._save_meta()
+        
+        self._db = self._open_records(self._generation)
+        self._maps: Dict[str, np.memmap] = {}
+        if self._meta["capacity"]:
+            self._map_arrays()
+        self._remove_other_generations()  # Left by a compaction that did not finish
+        self._maybe_compact()
+    
+    # ============ Storage ============
+    
+    @property
+    def metadata(self) -> Dict[str, Any]:
+        return self._meta["metadata"]
+    
+    @property
+    def quantized(self) -> bool:
+        return self._meta["dtype"] == "int8"
+    
+    @property
+    def _generation(self) -> int:
+        return self._meta.get("generation", 0)
+    
+    def _array_path(self, key: str, generation: Optional[int] = None) -> str:
+        generation = self._generation if generation is None else generation
+        return os.path.join(self.path, f"{key}.bin" if not generation else f"{key}.{generation}.bin")
+    
+    def _records_path(self, generation: int) -> str:
+        return os.path.join(self.path, "records.sqlite" if not generation else f"records.{generation}.sqlite")
+    
+    def _open_records(self, generation: int) -> sqlite3.Connection:
+        db = sqlite3.connect(self._records_path(generation), check_same_thread=False)
+        db.execute(
+            "CREATE TABLE IF NOT EXISTS records "
+            "(row INTEGER PRIMARY KEY, id TEXT UNIQUE NOT NULL, document TEXT, metadata TEXT)"
+        )
+        db.commit()
+        return db
+    
+    def _remove_other_generations(self) -> None:
+        records = os.path.basename(self._records_path(self._generation))
+        arrays = {os.path.basename(self._array_path(key)) for key in self._layout()}
+        for name in os.listdir(self.path):
+            if name.startswith(records) or name in arrays:
+                continue  # Includes the current records' journal files
+            if name.endswith(".bin") or name.startswith("records."):
+                os.remove(os.path.join(self.path, name))
+    
+    def _save_meta(self) -> None:
+        tmp_path = self._meta_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self._meta, f)
+        os.replace(tmp_path, self._meta_path)
+    
+    def _layout(self) -> Dict[str, Tuple[np.dtype, Tuple[int, ...]]]:
+        """File name -> (dtype, per-row shape)"""
+        layout = {
+            "vectors": (np.dtype(self._meta["dtype"]), (self._meta["dim"],)),
+            "norms": (np.dtype(np.float32), ()),
+            "alive": (np.dtype(np.uint8), ())
+        }
+        if self.quantized:
+            layout["scales"] = (np.dtype(np.float32), ())
+        for column in FILTER_COLUMNS:
+            layout[f"col_{column}"] = (np.dtype(np.int64), ())
+        return layout
+    
+    @property
+    def _arrays(self) -> Dict[str, np.memmap]:
+        """The mapped arrays, remapped on first use after unload()"""
+        if not self._maps and self._meta["capacity"]:
+            self._map_arrays()
+        return self._maps
+    
+    def _map_arrays(self) -> None:
+        capacity = self._meta["capacity"]
+        self._maps = {
+            key: np.memmap(
+                self._array_path(key),
+                dtype=dtype,
+                mode="r+",
+                shape=(capacity,) + row_shape
+            )
+            for key, (dtype, row_shape) in self._layout().items()
+        }
+    
+    def _ensure_capacity(self, rows: int) -> None:
+        capacity = self._meta["capacity"]
+        if rows <= capacity:
+            return
+        new_capacity = max(rows, capacity * 2, _INITIAL_CAPACITY)
+        for array in self._maps.values():
+            array.flush()
+        self._maps = {}
+        for key, (dtype, row_shape) in self._layout().items():
+            row_bytes = dtype.itemsize * int(np.prod(row_shape, dtype=np.int64))
+            with open(self._array_path(key), "ab") as f:
+                f.truncate(new_capacity * row_bytes)  # Extends with zeros (alive = 0)
+        self._meta["capacity"] = new_capacity
+        self._map_arrays()
+    
+    def _flush(self) -> None:
+        for array in self._maps.values():
+            array.flush()
+        self._save_meta()
+    
+    def unload(self) -> None:
+        """Unmap the arrays to free their pages; the next call maps them again"""
+        with self._lock:
+            self._flush()
+            self._maps = {}
+    
+    def _maybe_compact(self) -> None:
+        dead = self._meta["size"] - self._meta["live"]
+        if dead >= _COMPACT_MIN_DEAD_ROWS and dead > self._meta["size"] * _COMPACT_DEAD_FRACTION:
+            self.compact()
+    
+    def compact(self) -> int:
+        """
+        Copy the live rows into a new file generation, dropping tombstoned ones;
+        returns the rows reclaimed. The meta.json rewrite is the commit point:
+        a crash before it leaves the old generation intact.
+        """
+        with self._lock:
+            size = self._meta["size"]
+            if size == self._meta["live"]:
+                return 0
+            generation = self._generation + 1
+            rows = np.flatnonzero(self._arrays["alive"][:size])
+            capacity = max(len(rows), _INITIAL_CAPACITY)
+            
+            for key, (dtype, row_shape) in self._layout().items():
+                source = self._arrays[key]
+                target = np.memmap(
+                    self._array_path(key, generation), dtype=dtype, mode="w+", shape=(capacity,) + row_shape
+                )
+                for start in range(0, len(rows), _SCAN_ROWS):
+                    target[start:start + _SCAN_ROWS] = source[rows[start:start + _SCAN_ROWS]]
+                target.flush()
+                del target
+            
+            db = self._open_records(generation)
+            new_rows = {int(row): index for index, row in enumerate(rows)}
+            for chunk in _chunks(list(new_rows)):
+                placeholders = ",".join("?" * len(chunk))
+                db.executemany(
+                    "INSERT INTO records (row, id, document, metadata) VALUES (?, ?, ?, ?)",
+                    [
+                        (new_rows[row], doc_id, document, metadata)
+                        for row, doc_id, document, metadata in self._db.execute(
+                            f"SELECT row, id, document, metadata FROM records WHERE row IN ({placeholders})",
+                            chunk
+                        )
+                    ]
+                )
+            db.commit()
+            
+            for array in self._maps.values():
+                array.flush()
+            self._maps = {}
+            self._db.close()
+            self._meta.update(generation=generation, size=len(rows), capacity=capacity, live=len(rows))
+            self._save_meta()
+            self._db = db
+            self._map_arrays()
+            self._remove_other_generations()
+            return size - len(rows)
+    
+    def close(self) -> None:
+        with self._lock:
+            self._flush()
+            self._maps = {}
+            self._db.close()
+    
+    # ============ Writes ============
+    
+    def _rows_for_ids(self, ids: List[str]) -> List[int]:
+        rows = []
+        for chunk in _chunks(ids):
+            placeholders = ",".join("?" * len(chunk))
+            rows.extend(
+                row for (row,) in self._db.execute(
+                    f"SELECT row FROM records WHERE id IN ({placeholders})", chunk
+                )
+            )
+        return rows
+    
+    def _tombstone(self, ids: List[str]) -> int:
+        rows = self._rows_for_ids(ids)
+        if not rows:
+            return 0
+        self._arrays["alive"][np.asarray(rows, dtype=np.int64)] = 0
+        for chunk in _chunks(rows):
+            placeholders = ",".join("?" * len(chunk))
+            self._db.execute(f"DELETE FROM records WHERE row IN ({placeholders})", chunk)
+        self._meta["live"] -= len(rows)
+        return len(rows)
+    
+    def add(
+        self,
+        ids: List[str],
+        documents: Optional[List[str]] = None,
+        metadatas: Optional[List[Dict[str, Any]]] = None,
+        embeddings: Optional[List[List[float]]] = None
+    ) -> None:
+        """Append records; an existing id is replaced"""
+        if not ids:
+            return
+        if embeddings is None:
+            if documents is None or self.embedding_function is None:
+                raise ValueError("embeddings or documents with an embedding function are required")
+            embeddings = self.embedding_function(documents)
+        vectors = np.asarray(embeddings, dtype=np.float32)
+        count = len(ids)
+        documents = documents or [None] * count
+        metadatas = metadatas or [{} for _ in range(count)]
+        
+        with self._lock:
+            if self._meta["dim"] is None:
+                self._meta["dim"] = int(vectors.shape[1])
+            elif vectors.shape[1] != self._meta["dim"]:
+                raise ValueError(
+                    f"Embedding dimension {vectors.shape[1]} does not match collection "
+                    f"dimension {self._meta['dim']}"
+                )
+            
+            if self._meta["live"]:
+                self._tombstone(list(ids))
+            
+            start = self._meta["size"]
+            end = start + count
+            self._ensure_capacity(end)
+            arrays = self._arrays
+            
+            if self.quantized:
+                scales = np.abs(vectors).max(axis=1) / 127.0
+                scales[scales == 0] = 1.0
+                arrays["vectors"][start:end] = np.clip(
+                    np.rint(vectors / scales[:, None]), -127, 127
+                ).astype(np.int8)
+                arrays["scales"][start:end] = scales
+            else:
+                arrays["vectors"][start:end] = vectors.astype(np.float16)
+            arrays["norms"][start:end] = np.einsum("ij,ij->i", vectors, vectors)
+            for column in FILTER_COLUMNS:
+                arrays[f"col_{column}"][start:end] = [
+                    _hash_value((metadata or {}).get(column)) for metadata in metadatas
+                ]
+            
+            self._db.executemany(
+                "INSERT OR REPLACE INTO records (row, id, document, metadata) VALUES (?, ?, ?, ?)",
+                [
+                    (start + i, ids[i], documents[i], json.dumps(metadatas[i] or {}))
+                    for i in range(count)
+                ]
+            )
+            self._db.commit()
+            
+            # Rows become visible only once fully written
+            arrays["alive"][start:end] = 1
+            self._meta["size"] = end
+            self._meta["live"] += count
+            self._flush()
+            self._maybe_compact()
+    
+    def delete(self, ids: List[str]) -> None:
+        with self._lock:
+            if self._meta["size"] and self._tombstone(list(ids)):
+                self._db.commit()
+                self._flush()
+                self._maybe_compact()
+    
+    def count(self) -> int:
+        return self._meta["live"]
+    
+    def get(
+        self,
+        limit: Optional[int] = None,
+        offset: Optional[int] = None,
+        include: Optional[List[str]] = None
+    ) -> Dict[str, Any]:
+        include = ["metadatas", "documents"] if include is None else include
+        with self._lock:
+            records = self._db.execute(
+                "SELECT id, document, metadata FROM records ORDER BY row LIMIT ? OFFSET ?",
+                (-1 if limit is None else limit, offset or 0)
+            ).fetchall()
+        return {
+            "ids": [doc_id for doc_id, _, _ in records],
+            "documents": [document for _, document, _ in records] if "documents" in include else None,
+            "metadatas": [json.loads(metadata) for _, _, metadata in records] if "metadatas" in include else None
+        }
+    
+    # ============ Search ============
+    
+    def _candidate_rows(self, size: int, conditions: Dict[str, Any]) -> np.ndarray:
+        mask = self._arrays["alive"][:size].astype(bool)
+        for key, value in conditions.items():
+            if key in FILTER_COLUMNS:
+                mask &= self._arrays[f"col_{key}"][:size] == _hash_value(value)
+        return np.flatnonzero(mask)
+    
+    def _distances(self, rows: np.ndarray, queries: np.ndarray) -> np.ndarray:
+        """Squared L2 distances (len(rows), n_queries), dequantizing in bounded chunks"""
+        query_norms = np.einsum("ij,ij->i", queries, queries)
+        out = np.empty((len(rows), len(queries)), dtype=np.float32)
+        vectors = self._arrays["vectors"]
+        for start in range(0, len(rows), _SCAN_ROWS):
+            chunk = rows[start:start + _SCAN_ROWS]
+            block = vectors[chunk].astype(np.float32)
+            if self.quantized:
+                block *= self._arrays["scales"][chunk][:, None]
+            dots = block @ queries.T
+            out[start:start + len(chunk)] = (
+                self._arrays["norms"][chunk][:, None] - 2 * dots + query_norms[None, :]
+            )
+        # Quantization error can push near-exact matches slightly below zero
+        return np.maximum(out, 0.0, out=out)
+    
+    def _fetch_records(self, rows: List[int]) -> Dict[int, Tuple[str, Optional[str], Dict[str, Any]]]:
+        records = {}
+        for chunk in _chunks(rows):
+            placeholders = ",".join("?" * len(chunk))
+            for row, doc_id, document, metadata in self._db.execute(
+                f"SELECT row, id, document, metadata FROM records WHERE row IN ({placeholders})",
+                chunk
+            ):
+                records[row] = (doc_id, document, json.loads(metadata) if metadata else {})
+        return records
+    
+    def query(
+        self,
+        query_embeddings: Optional[List[List[float]]] = None,
+        n_results: int = 10,
+        where: Optional[Dict[str, Any]] = None,
+        query_texts: Optional[List[str]] = None
+    ) -> Dict[str, Any]:
+        """Exact nearest neighbours by brute-force matrix product over the filtered rows"""
+        if query_embeddings is None:
+            query_embeddings = self.embedding_function(query_texts)
+        queries = np.asarray(query_embeddings, dtype=np.float32)
+        if queries.ndim == 1:
+            queries = queries[None, :]
+        conditions = _flatten_where(where)
+        result = {"ids": [], "documents": [], "metadatas": [], "distances": []}
+        
+        with self._lock:
+            size = self._meta["size"]
+            if not size or self._meta["dim"] is None:
+                for key in result:
+                    result[key] = [[] for _ in range(len(queries))]
+                return result
+            rows = self._candidate_rows(size, conditions)
+            distances = self._distances(rows, queries) if len(rows) else np.empty((0, len(queries)))
+            
+            for q in range(len(queries)):
+                ids, documents, metadatas, dists = self._top_matches(
+                    rows, distances[:, q], n_results, conditions
+                )
+                result["ids"].append(ids)
+                result["documents"].append(documents)
+                result["metadatas"].append(metadatas)
+                result["distances"].append(dists)
+        return result
+    
+    def _top_matches(
+        self,
+        rows: np.ndarray,
+        distances: np.ndarray,
+        n_results: int,
+        conditions: Dict[str, Any]
+    ) -> Tuple[List[str], List[Optional[str]], List[Dict[str, Any]], List[float]]:
+        """
+        Best rows by distance whose metadata satisfies every condition.
+        Hashed columns pre-filter; non-column keys and hash collisions are
+        checked on the fetched metadata, widening the window until satisfied.
+        """
+        ids, documents, metadatas, dists = [], [], [], []
+        window = n_results
+        consumed = 0
+        while len(ids) < n_results and consumed < len(rows):
+            window = min(len(rows), max(window, n_results))
+            if window < len(rows):
+                top = np.argpartition(distances, window - 1)[:window]
+            else:
+                top = np.arange(len(rows))
+            ordered = top[np.argsort(distances[top], kind="stable")][consumed:]
+            records = self._fetch_records([int(r) for r in rows[ordered]])
+            for index in ordered:
+                record = records.get(int(rows[index]))
+                if record is None:
+                    continue
+                doc_id, document, metadata = record
+                if any(metadata.get(key) != value for key, value in conditions.items()):
+                    continue
+                ids.append(doc_id)
+                documents.append(document)
+                metadatas.append(metadata)
+                dists.append(float(distances[index]))
+                if len(ids) >= n_results:
+                    break
+            consumed = window
+            window *= 4
+        return ids, documents, metadatas, dists
+    
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            vector_bytes = 0
+            if self._maps:
+                vector_bytes = self._meta["size"] * self._arrays["vectors"].strides[0]
+            return {
+                "name": self.name,
+                "dtype": self._meta["dtype"],
+                "dim": self._meta["dim"],
+                "live": self._meta["live"],
+                "rows": self._meta["size"],
+                "capacity": self._meta["capacity"],
+                "vector_bytes": vector_bytes
+            }
+
+
+class MmapVectorBackend(VectorBackend):
+    """Local backend storing each collection as memory-mapped NumPy arrays"""
+    
+    name = "mmap"
+    
+    def __init__(self, path: str, dtype: str = "float16"):
+        if dtype not in ("float16", "int8"):
+            raise ValueError(f"Unsupported mmap index dtype: {dtype}")
+        self.path = path
+        self.dtype = dtype
+        os.makedirs(path, exist_ok=True)
+        self._collections: Dict[str, MmapCollection] = {}
+        self._lock = threading.Lock()
+    
+    def _collection_path(self, name: str) -> str:
+        return os.path.join(self.path, name)
+    
+    def _open(self, name: str, embedding_function, metadata: Optional[Dict[str, Any]]) -> MmapCollection:
+        collection = self._collections.get(name)
+        if collection is None:
+            collection = MmapCollection(
+                self._collection_path(name),
+                name,
+                dtype=self.dtype,
+                embedding_function=embedding_function,
+                metadata=metadata
+            )
+            self._collections[name] = collection
+        elif embedding_function is not None:
+            collection.embedding_function = embedding_function
+        return collection
+    
+    def get_or_create_collection(
+        self,
+        name: str,
+        metadata: Optional[Dict[str, Any]] = None,
+        embedding_function=None
+    ) -> MmapCollection:
+        with self._lock:
+            return self._open(name, embedding_function, metadata)
+    
+    def get_collection(self, name: str, embedding_function=None) -> MmapCollection:
+        with self._lock:
+            if name not in self._collections and not os.path.exists(
+                os.path.join(self._collection_path(name), "meta.json")
+            ):
+                raise ValueError(f"Collection {name} does not exist.")
+            return self._open(name, embedding_function, None)
+    
+    def delete_collection(self, name: str) -> None:
+        with self._lock:
+            collection = self._collections.pop(name, None)
+            if collection is not None:
+                collection.close()
+            shutil.rmtree(self._collection_path(name), ignore_errors=True)
+    
+    def list_collections(self) -> List[str]:
+        with self._lock:
+            stored = {
+                name for name in os.listdir(self.path)
+                if os.path.exists(os.path.join(self._collection_path(name), "meta.json"))
+            }
+            return sorted(stored | set(self._collections))
+    
+    def release_collection(self, collection: MmapCollection) -> None:
+        """
+        Unmap the collection's arrays but keep the object registered: a second
+        MmapCollection on the same directory would append at the same row
+        numbers and overwrite records. Calls holding it simply remap on use.
+        """
+        collection.unload()
+    
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "backend": self.name,
+                "path": self.path,
+                "dtype": self.dtype,
+                "open_collections": len(self._collections),
+                "vector_bytes": sum(c.get_stats()["vector_bytes"] for c in self._collections.values())
+            }
@@ -44,6 +44,9 @@ class StudentContext(Base):
     
     # Timestamps
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    # Time the content dates from, when older than the row (compaction summaries
+    # keep their newest source's); recency scoring uses it over created_at
+    recency_at: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
 
 
 class AcademicDocument(Base):
@@ -0,0 +1,400 @@
+"""
+SkillTwin - Vector Index Rebuild
+Rebuilds the vector store from the SQL source of truth into a new index generation
+and swaps it in atomically
+"""
+
+import asyncio
+import os
+import shutil
+import time
+from datetime import datetime, timedelta
+from typing import List, Dict, Any, Optional, Callable, Tuple
+
+from sqlalchemy import select, func, or_
+
+from app.core.config import settings
+from app.core.database import async_session_maker
+from app.core.executor import BoundedExecutor
+from app.core.tasks import spawn_background_task
+from app.modules.dual_rag.models import StudentContext, AcademicDocument
+from app.modules.dual_rag.vector_backends import (
+    VectorBackend,
+    active_generation,
+    create_vector_backend,
+    generation_path,
+    read_vector_manifest,
+    write_vector_manifest
+)
+from app.modules.dual_rag.vector_store import VectorStoreService, StudentShardCache, get_vector_store
+
+# Rows written shortly before the rebuild started are replayed too, covering
+# clock skew between the write buffer and this process
+_CATCH_UP_MARGIN = timedelta(seconds=5)
+
+
+def academic_row_metadata(document: AcademicDocument) -> Dict[str, Any]:
+    """Vector store metadata for a stored academic document (None values dropped)"""
+    metadata = {
+        "source_type": document.source_type,
+        "source_name": document.source_name,
+        "subject": document.subject,
+        "topic": document.topic,
+        "subtopic": document.subtopic,
+        "grade_level": document.grade_level,
+        "difficulty_level": document.difficulty_level,
+        "title": document.title
+    }
+    if document.total_chunks and document.total_chunks > 1:
+        metadata["chunk_index"] = document.chunk_index
+        metadata["total_chunks"] = document.total_chunks
+    return {k: v for k, v in metadata.items() if v is not None}
+
+
+def student_row_metadata(context: StudentContext) -> Dict[str, Any]:
+    """Vector store metadata for a stored student context (None values dropped)"""
+    # "created_at" drives recency scoring, so it is the content's time rather than the row's
+    recency = context.recency_at or context.created_at
+    metadata = {
+        "profile_id": context.profile_id,
+        "context_type": context.context_type,
+        "concept_id": context.concept_id,
+        "concept_name": context.concept_name,
+        "subject": context.subject,
+        "topic": context.topic,
+        "was_correct": context.was_correct,
+        "created_at": recency.isoformat() if recency else None
+    }
+    return {k: v for k, v in metadata.items() if v is not None}
+
+
+class _RebuildTarget:
+    """Collections of the generation being built"""
+    
+    def __init__(self, vector_store: VectorStoreService, backend: VectorBackend):
+        self.backend = backend
+        self.student, self.academic = vector_store.open_collections(backend)
+        self.shards: StudentShardCache = vector_store.new_shard_cache()
+        self.embedding_function = vector_store.embedder.function
+    
+    def student_collection_for(self, profile_id: Optional[str]):
+        if not self.shards.enabled or profile_id is None:
+            return self.student
+        return self.shards.get(self.backend, profile_id, self.embedding_function)
+
+
+class VectorIndexRebuilder:
+    """
+    Streams StudentContext and AcademicDocument rows in keyset-paginated pages,
+    embeds them in parallel batches and writes a fresh index generation next to
+    the live one. Live queries keep using the old generation until the swap.
+    Progress is checkpointed in the manifest after every page, so an interrupted
+    rebuild resumes from its last completed page. Deletes are only tracked while
+    a rebuild runs, so a resumed one first drops copied records whose rows were
+    deleted in between, possibly by another process.
+    """
+    
+    def __init__(
+        self,
+        vector_store: Optional[VectorStoreService] = None,
+        page_size: int = 500,
+        batch_size: int = 64,
+        max_workers: int = 2
+    ):
+        self._vector_store = vector_store
+        self.page_size = max(1, page_size)
+        self.batch_size = max(1, batch_size)
+        # Separate from the query embedding pool so rebuild batches never queue ahead of live queries
+        self._executor = BoundedExecutor(
+            name="reindex",
+            max_workers=max_workers,
+            max_pending=max_workers
+        )
+        self._task: Optional[asyncio.Task] = None
+        self._progress: Dict[str, Any] = {"status": "idle"}
+    
+    @property
+    def vector_store(self) -> VectorStoreService:
+        if self._vector_store is None:
+            self._vector_store = get_vector_store()
+        return self._vector_store
+    
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+    
+    def start(self, resume: bool = True) -> bool:
+        """Start a rebuild in the background; False if one is already running"""
+        if self.running:
+            return False
+        self._task = spawn_background_task(self.rebuild(resume=resume), name="vector-reindex")
+        return True
+    
+    def get_progress(self) -> Dict[str, Any]:
+        progress = dict(self._progress)
+        started = progress.pop("_started", None)
+        finished = progress.pop("_finished", None)
+        if started is not None:
+            elapsed = (finished or time.perf_counter()) - started
+            processed = progress.get("processed_this_run", 0)
+            remaining = sum(progress.get("totals", {}).values()) - sum(progress.get("done", {}).values())
+            rate = processed / elapsed if elapsed > 0 else 0.0
+            progress["elapsed_seconds"] = round(elapsed, 1)
+            progress["docs_per_second"] = round(rate, 1)
+            progress["eta_seconds"] = round(max(0, remaining) / rate, 1) if rate else None
+        return progress
+    
+    # ============ Rebuild ============
+    
+    def _start_state(self, resume: bool) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        """(manifest, rebuild state), resuming an unfinished rebuild when allowed"""
+        manifest = read_vector_manifest()
+        backend = settings.vector_store_backend
+        model = settings.embedding_model_name
+        state = manifest.get("rebuild")
+        if (
+            resume and state
+            and state.get("backend") == backend
+            and state.get("embedding_model") == model
+        ):
+            state["resumed"] = True
+            return manifest, state
+        
+        live_generation, _ = active_generation(backend)
+        generation = max(live_generation, (state or {}).get("generation", 0)) + 1
+        path = generation_path(backend, generation)
+        shutil.rmtree(path, ignore_errors=True)  # Leftover from an abandoned rebuild
+        state = {
+            "backend": backend,
+            "embedding_model": model,
+            "generation": generation,
+            "path": path,
+            "started_at": datetime.utcnow().isoformat(),
+            "cursors": {"academic": None, "student": None},
+            "done": {"academic": 0, "student": 0},
+            "resumed": False
+        }
+        return manifest, state
+    
+    async def rebuild(
+        self,
+        resume: bool = True,
+        on_progress: Optional[Callable[[Dict[str, Any]], None]] = None
+    ) -> Dict[str, Any]:
+        """Build a new generation from the database and swap it in; returns final progress"""
+        manifest, state = self._start_state(resume)
+        manifest["rebuild"] = state
+        write_vector_manifest(manifest)
+        
+        self._progress = {
+            "status": "running",
+            "phase": "starting",
+            "generation": state["generation"],
+            "path": state["path"],
+            "resumed": state["resumed"],
+            "done": dict(state["done"]),
+            "processed_this_run": 0,
+            "_started": time.perf_counter()
+        }
+        vector_store = self.vector_store
+        vector_store.begin_delete_tracking()
+        try:
+            backend = await self._executor.run(create_vector_backend, state["backend"], state["path"])
+            target = await self._executor.run(_RebuildTarget, vector_store, backend)
+            if state["resumed"]:
+                self._progress["phase"] = "reconcile"
+                self._progress["reconciled"] = await self._reconcile(target)
+            
+            async with async_session_maker() as db:
+                self._progress["totals"] = {
+                    "academic": await db.scalar(select(func.count()).select_from(AcademicDocument)),
+                    "student": await db.scalar(select(func.count()).select_from(StudentContext))
+                }
+            
+            for kind, model in (("academic", AcademicDocument), ("student", StudentContext)):
+                self._progress["phase"] = kind
+                await self._copy(kind, model, target, manifest, state, on_progress)
+            
+            # Rows added while copying: replay them, then swap with no await in between
+            # the final delete replay and the swap
+            self._progress["phase"] = "catch_up"
+            since = datetime.fromisoformat(state["started_at"]) - _CATCH_UP_MARGIN
+            catch_up_started = datetime.utcnow()
+            await self._catch_up(target, since)
+            await self._replay_deletes(target, vector_store.end_delete_tracking())
+            
+            self._progress["phase"] = "swap"
+            previous_path = active_generation(state["backend"])[1]
+            vector_store.swap_backend(backend)
+            write_vector_manifest({
+                "backend": state["backend"],
+                "generation": state["generation"],
+                "path": state["path"],
+                "previous_path": previous_path,
+                "embedding_model": state["embedding_model"],
+                "swapped_at": datetime.utcnow().isoformat(),
+                "rebuild": None
+            })
+            
+            # Writes that reached the old generation between the catch-up and the swap
+            from app.modules.dual_rag.write_buffer import get_interaction_buffer
+            await get_interaction_buffer().flush()
+            await self._catch_up(target, catch_up_started - _CATCH_UP_MARGIN)
+            
+            # Keep one previous generation for rollback and drop anything older
+            older = manifest.get("previous_path")
+            keep = {os.path.realpath(p) for p in (previous_path, state["path"], generation_path(state["backend"], 0))}
+            if older and os.path.realpath(older) not in keep:
+                shutil.rmtree(older, ignore_errors=True)
+        except Exception as e:
+            vector_store.end_delete_tracking()
+            self._progress.update({"status": "failed", "error": str(e), "_finished": time.perf_counter()})
+            print(f"Vector index rebuild failed: {e}")
+            raise
+        
+        self._progress.update({"status": "complete", "phase": "done", "_finished": time.perf_counter()})
+        progress = self.get_progress()
+        if on_progress:
+            on_progress(progress)
+        return progress
+    
+    async def _copy(
+        self,
+        kind: str,
+        model,
+        target: _RebuildTarget,
+        manifest: Dict[str, Any],
+        state: Dict[str, Any],
+        on_progress: Optional[Callable[[Dict[str, Any]], None]]
+    ) -> None:
+        """Copy one table page by page, checkpointing the cursor after each page"""
+        cursor = state["cursors"][kind]
+        while True:
+            async with async_session_maker() as db:
+                query = select(model).order_by(model.id).limit(self.page_size)
+                if cursor is not None:
+                    query = query.where(model.id > cursor)
+                rows = list((await db.scalars(query)).all())
+            if not rows:
+                break
+            
+            await self._write_rows(kind, rows, target)
+            
+            cursor = rows[-1].id
+            state["cursors"][kind] = cursor
+            state["done"][kind] += len(rows)
+            write_vector_manifest(manifest)
+            self._progress["done"] = dict(state["done"])
+            self._progress["processed_this_run"] += len(rows)
+            if on_progress:
+                on_progress(self.get_progress())
+    
+    async def _reconcile(self, target: _RebuildTarget) -> int:
+        """Delete target records whose database row is gone; returns how many"""
+        removed = 0
+        for name in await self._executor.run(target.backend.list_collections):
+            model = AcademicDocument if name == "academic_documents" else StudentContext
+            collection = await self._executor.run(
+                target.backend.get_collection, name, target.embedding_function
+            )
+            stale: List[str] = []
+            offset = 0
+            while True:
+                ids = (await self._executor.run(
+                    collection.get, limit=self.page_size, offset=offset, include=[]
+                ))["ids"]
+                if not ids:
+                    break
+                offset += len(ids)
+                async with async_session_maker() as db:
+                    found = await db.execute(
+                        select(model.id, model.embedding_id)
+                        .where(or_(model.id.in_(ids), model.embedding_id.in_(ids)))
+                    )
+                    live = {value for row in found for value in row if value}
+                stale.extend(doc_id for doc_id in ids if doc_id not in live)
+            
+            # Deleted after paging so offsets stay valid
+            for start in range(0, len(stale), self.page_size):
+                await self._executor.run(collection.delete, ids=stale[start:start + self.page_size])
+            removed += len(stale)
+        return removed
+    
+    async def _write_rows(self, kind: str, rows: List[Any], target: _RebuildTarget, replace: bool = False) -> None:
+        """Embed and write rows in parallel batches on the rebuild pool"""
+        batches = [rows[i:i + self.batch_size] for i in range(0, len(rows), self.batch_size)]
+        await asyncio.gather(*(
+            self._executor.run(self._write_batch, kind, batch, target, replace)
+            for batch in batches
+        ))
+    
+    def _write_batch(self, kind: str, rows: List[Any], target: _RebuildTarget, replace: bool) -> None:
+        """Blocking: embed a batch and add it to the target generation"""
+        embedder = self.vector_store.embedder
+        if kind == "academic":
+            groups = {None: (target.academic, rows)}
+        else:
+            groups = {}
+            for row in rows:
+                name = target.shards.shard_name(row.profile_id)
+                if name not in groups:
+                    groups[name] = (target.student_collection_for(row.profile_id), [])
+                groups[name][1].append(row)
+        
+        for collection, group in groups.values():
+            ids = [row.embedding_id or row.id for row in group]
+            contents = [row.content for row in group]
+            metadatas = [
+                academic_row_metadata(row) if kind == "academic" else student_row_metadata(row)
+                for row in group
+            ]
+            if replace:
+                collection.delete(ids=ids)
+            collection.add(
+                ids=ids,
+                embeddings=embedder.embed_documents_sync(contents),
+                documents=contents,
+                metadatas=metadatas
+            )
+    
+    async def _catch_up(self, target: _RebuildTarget, since: datetime) -> int:
+        """Re-write rows created since `since` (delete then add, so repeats are harmless)"""
+        written = 0
+        for kind, model in (("academic", AcademicDocument), ("student", StudentContext)):
+            async with async_session_maker() as db:
+                rows = list((await db.scalars(
+                    select(model).where(model.created_at >= since).order_by(model.id)
+                )).all())
+            for start in range(0, len(rows), self.page_size):
+                await self._write_rows(kind, rows[start:start + self.page_size], target, replace=True)
+            written += len(rows)
+        return written
+    
+    async def _replay_deletes(
+        self,
+        target: _RebuildTarget,
+        deletes: List[Tuple[str, str, Optional[str]]]
+    ) -> None:
+        """Apply deletes made against the live index while the rebuild was copying"""
+        def apply():
+            for kind, doc_id, profile_id in deletes:
+                collection = target.academic if kind == "academic" else target.student_collection_for(profile_id)
+                collection.delete(ids=[doc_id])
+        if deletes:
+            await self._executor.run(apply)
+    
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=True)
+
+
+# Singleton instance
+vector_rebuilder = VectorIndexRebuilder(
+    page_size=settings.reindex_page_size,
+    batch_size=settings.rag_ingest_batch_size,
+    max_workers=settings.reindex_max_workers
+)
+
+
+def get_vector_rebuilder() -> VectorIndexRebuilder:
+    """Dependency for getting the vector index rebuilder instance"""
+    return vector_rebuilder
@@ -0,0 +1,216 @@
+"""
+SkillTwin - Cross-Encoder Reranker
+Rescores retrieved academic candidates, micro-batching pairs across concurrent requests
+"""
+
+import asyncio
+import math
+from typing import List, Dict, Any, Optional, Set, Tuple
+
+from app.core.config import settings
+from app.core.executor import BoundedExecutor
+
+# Optional: sentence-transformers provides the local cross-encoder
+try:
+    from sentence_transformers import CrossEncoder
+    CROSS_ENCODER_AVAILABLE = True
+except ImportError:
+    CROSS_ENCODER_AVAILABLE = False
+
+
+def _sigmoid(x: float) -> float:
+    return 1.0 / (1.0 + math.exp(-x))
+
+
+class CrossEncoderReranker:
+    """
+    Scores (query, document) pairs with a small CPU cross-encoder.
+    Requests arriving within `max_wait_ms` of each other are merged into one
+    model call of up to `batch_size` pairs; batches run on a bounded pool.
+    """
+    
+    def __init__(
+        self,
+        model_name: str,
+        batch_size: int = 32,
+        max_wait_ms: float = 5.0,
+        max_workers: int = 2,
+        enabled: bool = False
+    ):
+        self.model_name = model_name
+        self.batch_size = max(1, batch_size)
+        self.max_wait = max_wait_ms / 1000
+        self.enabled = enabled
+        self._model = None
+        self._executor = BoundedExecutor(
+            name="rerank",
+            max_workers=max_workers,
+            max_pending=max_workers * 4
+        )
+        
+        self._pending: List[Tuple[List[Tuple[str, str]], asyncio.Future]] = []
+        self._pending_pairs = 0
+        self._wake: Optional[asyncio.Event] = None
+        self._full: Optional[asyncio.Event] = None
+        self._collector: Optional[asyncio.Task] = None
+        self._batches: Set[asyncio.Task] = set()
+        
+        # Metrics
+        self._requests = 0
+        self._batch_count = 0
+        self._pairs_scored = 0
+        self._timeouts = 0
+        self._errors = 0
+    
+    @property
+    def available(self) -> bool:
+        """True when sentence-transformers is installed (`enabled` is only the default)"""
+        return CROSS_ENCODER_AVAILABLE
+    
+    def _get_model(self):
+        if self._model is None:
+            self._model = CrossEncoder(self.model_name, device="cpu")
+        return self._model
+    
+    def _predict(self, pairs: List[Tuple[str, str]]) -> List[float]:
+        """Blocking model call; always run through the executor"""
+        scores = self._get_model().predict(pairs, batch_size=self.batch_size)
+        return [_sigmoid(float(score)) for score in scores]
+    
+    def _ensure_collector(self) -> None:
+        if self._collector is None or self._collector.done():
+            self._wake = asyncio.Event()
+            self._full = asyncio.Event()
+            self._collector = asyncio.create_task(self._collect(), name="rerank-collector")
+    
+    async def score(self, query: str, documents: List[str]) -> List[float]:
+        """Relevance in [0, 1] for each document; batched with concurrent callers"""
+        if not documents:
+            return []
+        self._ensure_collector()
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append(([(query, doc) for doc in documents], future))
+        self._pending_pairs += len(documents)
+        self._wake.set()
+        if self._pending_pairs >= self.batch_size:
+            self._full.set()
+        return await future
+    
+    async def _collect(self) -> None:
+        while True:
+            await self._wake.wait()
+            # Give concurrent requests a moment to join unless the batch is full
+            if self._pending_pairs < self.batch_size:
+                try:
+                    await asyncio.wait_for(self._full.wait(), timeout=self.max_wait)
+                except asyncio.TimeoutError:
+                    pass
+            self._full.clear()
+            
+            batch = []
+            size = 0
+            while self._pending and (not batch or size + len(self._pending[0][0]) <= self.batch_size):
+                pairs, future = self._pending.pop(0)
+                self._pending_pairs -= len(pairs)
+                if future.done():
+                    continue  # Caller gave up (latency budget exceeded)
+                batch.append((pairs, future))
+                size += len(pairs)
+            if not self._pending:
+                self._wake.clear()
+            elif self._pending_pairs >= self.batch_size:
+                self._full.set()
+            
+            if batch:
+                task = asyncio.create_task(self._run_batch(batch))
+                self._batches.add(task)
+                task.add_done_callback(self._batches.discard)
+    
+    async def _run_batch(self, batch: List[Tuple[List[Tuple[str, str]], asyncio.Future]]) -> None:
+        pairs = [pair for request_pairs, _ in batch for pair in request_pairs]
+        try:
+            scores = await self._executor.run(self._predict, pairs)
+        except Exception as e:
+            self._errors += 1
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        
+        self._batch_count += 1
+        self._pairs_scored += len(pairs)
+        offset = 0
+        for request_pairs, future in batch:
+            if not future.done():
+                future.set_result(scores[offset:offset + len(request_pairs)])
+            offset += len(request_pairs)
+    
+    async def rerank(
+        self,
+        query: str,
+        candidates: List[Dict[str, Any]],
+        n_results: int,
+        timeout: Optional[float] = None
+    ) -> Tuple[List[Dict[str, Any]], bool]:
+        """
+        Reorder candidates by cross-encoder score and keep the top `n_results`.
+        Returns (results, reranked); on timeout or error the retrieval order is kept.
+        """
+        if not candidates:
+            return candidates, False
+        self._requests += 1
+        try:
+            scores = await asyncio.wait_for(
+                self.score(query, [c["content"] for c in candidates]),
+                timeout=timeout
+            )
+        except asyncio.TimeoutError:
+            self._timeouts += 1
+            return candidates[:n_results], False
+        except Exception as e:
+            print(f"Rerank error: {e}")
+            return candidates[:n_results], False
+        
+        rescored = [
+            {**candidate, "retrieval_score": candidate["score"], "score": score}
+            for candidate, score in zip(candidates, scores)
+        ]
+        rescored.sort(key=lambda c: c["score"], reverse=True)
+        return rescored[:n_results], True
+    
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "available": self.available,
+            "model": self.model_name,
+            "loaded": self._model is not None,
+            "batch_size": self.batch_size,
+            "max_wait_ms": round(self.max_wait * 1000, 1),
+            "requests": self._requests,
+            "batches": self._batch_count,
+            "pairs_scored": self._pairs_scored,
+            "avg_pairs_per_batch": round(self._pairs_scored / self._batch_count, 1) if self._batch_count else 0.0,
+            "pending_pairs": self._pending_pairs,
+            "timeouts": self._timeouts,
+            "errors": self._errors,
+            "executor": self._executor.get_stats()
+        }
+    
+    def shutdown(self) -> None:
+        if self._collector is not None:
+            self._collector.cancel()
+        self._executor.shutdown(wait=True)
+
+
+# Singleton instance
+reranker = CrossEncoderReranker(
+    model_name=settings.rag_rerank_model,
+    batch_size=settings.rag_rerank_batch_size,
+    max_wait_ms=settings.rag_rerank_max_wait_ms,
+    max_workers=settings.rag_rerank_max_workers,
+    enabled=settings.rag_rerank_enabled
+)
+
+
+def get_reranker() -> CrossEncoderReranker:
+    """Dependency for getting the reranker instance"""
+    return reranker
@@ -3,19 +3,31 @@ SkillTwin - Dual RAG API Routes
 REST API endpoints for Dual RAG operations
 """
 
+import json
 from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Response, status
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.core.database import get_db
+from app.core.database import get_db, async_session_maker
 from app.modules.dual_rag.service import DualRAGService
 from app.modules.dual_rag.vector_store import get_vector_store, VectorStoreService
+from app.modules.dual_rag.llm import get_llm_client
+from app.modules.dual_rag.answer_cache import get_answer_cache
+from app.modules.dual_rag.write_buffer import get_interaction_buffer
+from app.modules.dual_rag.reranker import get_reranker
+from app.modules.dual_rag.chunking import get_chunk_deduplicator
+from app.modules.dual_rag.reindex import get_vector_rebuilder
+from app.modules.dual_rag.compaction import get_context_compactor
 from app.modules.dual_rag.schemas import (
     StudentContextCreate,
     StudentContextResponse,
     AcademicDocumentCreate,
     AcademicDocumentBulkCreate,
+    AcademicDocumentBulkResponse,
     AcademicDocumentResponse,
+    AcademicDocumentIngest,
+    AcademicDocumentIngestResponse,
     DualRAGQuery,
     DualRAGResponse,
     GapAnalysisResponse,
@@ -24,6 +36,8 @@ from app.modules.dual_rag.schemas import (
     ExplanationResponse,
     SemanticSearchQuery,
     SemanticSearchResponse,
+    BatchSearchQuery,
+    BatchSearchResponse,
     ChatMessageResponse,
     ChatFeedback
 )
@@ -72,16 +86,33 @@ async def add_academic_document(
     return document
 
 
-@router.post("/documents/bulk", response_model=List[AcademicDocumentResponse], status_code=status.HTTP_201_CREATED)
+@router.post("/documents/bulk", response_model=AcademicDocumentBulkResponse, status_code=status.HTTP_201_CREATED)
 async def add_academic_documents_bulk(
     bulk_data: AcademicDocumentBulkCreate,
     db: AsyncSession = Depends(get_db),
     vector_store: VectorStoreService = Depends(get_vector_store)
 ):
-    """Bulk add academic documents"""
+    """Bulk add academic documents; per-document failures are listed in `failed`"""
     service = DualRAGService(db, vector_store)
-    documents = await service.add_academic_documents_bulk(bulk_data.documents)
-    return documents
+    result = await service.add_academic_documents_bulk(bulk_data.documents)
+    return result
+
+
+@router.post("/documents/ingest", response_model=AcademicDocumentIngestResponse, status_code=status.HTTP_201_CREATED)
+async def ingest_academic_document(
+    doc_data: AcademicDocumentIngest,
+    db: AsyncSession = Depends(get_db),
+    vector_store: VectorStoreService = Depends(get_vector_store)
+):
+    """Chunk a full source, drop duplicate chunks and index the rest"""
+    service = DualRAGService(db, vector_store)
+    try:
+        return await service.ingest_academic_document(doc_data)
+    except RuntimeError as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=str(e)
+        )
 
 
 @router.get("/documents", response_model=List[AcademicDocumentResponse])
@@ -97,6 +128,23 @@ async def get_academic_documents(
     return documents
 
 
+@router.delete("/documents/{doc_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def delete_academic_document(
+    doc_id: str,
+    db: AsyncSession = Depends(get_db),
+    vector_store: VectorStoreService = Depends(get_vector_store)
+):
+    """Delete an academic document and invalidate cached answers built from it"""
+    service = DualRAGService(db, vector_store)
+    deleted = await service.delete_academic_document(doc_id)
+    
+    if not deleted:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Document not found"
+        )
+
+
 # ============ Dual RAG Query Endpoints ============
 
 @router.post("/query", response_model=DualRAGResponse)
@@ -114,6 +162,28 @@ async def process_query(
     return response
 
 
+@router.post("/query/stream")
+async def stream_query(
+    query: DualRAGQuery,
+    vector_store: VectorStoreService = Depends(get_vector_store)
+):
+    """
+    Streaming variant of /query, sent as newline-delimited JSON.
+    Events arrive in order: one "contexts" event with the retrieved sources,
+    "token" events with answer text as it is generated, and a final "done"
+    event with gaps, confidence and cited sources.
+    """
+    async def event_stream():
+        # The request-scoped session is closed before the body streams,
+        # so the generator owns its own session
+        async with async_session_maker() as db:
+            service = DualRAGService(db, vector_store)
+            async for event in service.stream_query(query):
+                yield json.dumps(event, default=str) + "\n"
+    
+    return StreamingResponse(event_stream(), media_type="application/x-ndjson")
+
+
 @router.post("/explain", response_model=ExplanationResponse)
 async def generate_explanation(
     request: ExplanationRequest,
@@ -172,6 +242,20 @@ async def semantic_search(
     return response
 
 
+@router.post("/search/batch", response_model=BatchSearchResponse)
+async def batch_semantic_search(
+    batch: BatchSearchQuery,
+    db: AsyncSession = Depends(get_db),
+    vector_store: VectorStoreService = Depends(get_vector_store)
+):
+    """
+    Run several searches in one request (e.g. all follow-up questions of an
+    explanation). Queries are embedded together; results are grouped per query.
+    """
+    service = DualRAGService(db, vector_store)
+    return await service.batch_semantic_search(batch)
+
+
 # ============ Chat History Endpoints ============
 
 @router.get("/chat/{profile_id}", response_model=List[ChatMessageResponse])
@@ -205,12 +289,60 @@ async def submit_chat_feedback(
     return {"status": "feedback recorded"}
 
 
+# ============ Admin Endpoints ============
+
+@router.post("/admin/reindex", status_code=status.HTTP_202_ACCEPTED)
+async def start_reindex(resume: bool = True):
+    """
+    Rebuild the vector store from the database into a new index generation.
+    Runs in the background; queries use the current index until the swap.
+    """
+    rebuilder = get_vector_rebuilder()
+    if not rebuilder.start(resume=resume):
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="A rebuild is already running"
+        )
+    return {"status": "started", "resume": resume}
+
+
+@router.get("/admin/reindex")
+async def get_reindex_progress():
+    """Progress and throughput of the current or last rebuild"""
+    return get_vector_rebuilder().get_progress()
+
+
+@router.post("/admin/compact")
+async def compact_student_contexts(response: Response, profile_id: Optional[str] = None):
+    """
+    Condense old student contexts into per-concept summaries now, instead of
+    waiting for the periodic run. One profile is compacted in the request;
+    all profiles are compacted in the background (see /stats "compaction").
+    """
+    compactor = get_context_compactor()
+    if profile_id:
+        return await compactor.compact_profile(profile_id)
+    if not compactor.trigger():
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="A compaction run is already in progress"
+        )
+    response.status_code = status.HTTP_202_ACCEPTED
+    return {"status": "started"}
+
+
 # ============ Stats Endpoint ============
 
 @router.get("/stats")
 async def get_vector_store_stats(
     vector_store: VectorStoreService = Depends(get_vector_store)
 ):
-    """Get vector store statistics"""
+    """Get vector store, LLM, cache, write buffer, reranker, deduplication and compaction statistics"""
     stats = await vector_store.get_collection_stats()
+    stats["llm"] = get_llm_client().get_stats()
+    stats["answer_cache"] = get_answer_cache().get_stats()
+    stats["write_buffer"] = get_interaction_buffer().get_stats()
+    stats["reranker"] = get_reranker().get_stats()
+    stats["deduplicator"] = get_chunk_deduplicator().get_stats()
+    stats["compaction"] = get_context_compactor().get_stats()
     return stats
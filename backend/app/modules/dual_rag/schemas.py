@@ -16,6 +16,7 @@ class ContextType(str, Enum):
     EXPLANATION = "explanation"
     CHAT = "chat"
     ASSESSMENT = "assessment"
+    SUMMARY = "summary"
 
 
 class SourceType(str, Enum):
@@ -32,6 +33,12 @@ class GapSeverity(str, Enum):
     CRITICAL = "critical"
 
 
+class GapAnalysisMode(str, Enum):
+    INLINE = "inline"  # Detect gaps first and address them in the answer
+    PARALLEL = "parallel"  # Detect gaps while the answer is generated
+    DEFERRED = "deferred"  # Detect gaps in a background job after responding
+
+
 # ============ Student Context Schemas ============
 
 class StudentContextBase(BaseModel):
@@ -98,6 +105,42 @@ class AcademicDocumentResponse(AcademicDocumentBase):
         from_attributes = True
 
 
+class BulkItemError(BaseModel):
+    """A document from a bulk upload that could not be ingested"""
+    index: int  # Position in the submitted list
+    title: str
+    error: str
+
+
+class AcademicDocumentBulkResponse(BaseModel):
+    """Outcome of a bulk upload"""
+    documents: List[AcademicDocumentResponse]
+    failed: List[BulkItemError] = []
+    total_submitted: int
+
+
+class AcademicDocumentIngest(AcademicDocumentCreate):
+    """A full source to be chunked; chunk sizes default to the server settings"""
+    chunk_tokens: Optional[int] = Field(default=None, ge=50, le=2000)
+    chunk_overlap_tokens: Optional[int] = Field(default=None, ge=0, le=500)
+    deduplicate: bool = True
+
+
+class DuplicateChunk(BaseModel):
+    """A chunk skipped because it repeats an indexed chunk"""
+    chunk_index: int  # Position among the chunks produced by splitting (same numbering as stored chunks)
+    duplicate_of: str  # ID of the existing chunk
+    kind: str  # "exact" or "near"
+    similarity: float
+
+
+class AcademicDocumentIngestResponse(BaseModel):
+    """Chunks stored for an ingested source"""
+    documents: List[AcademicDocumentResponse]
+    duplicates: List[DuplicateChunk] = []
+    total_chunks: int  # Chunks produced before deduplication
+
+
 # ============ Chat Schemas ============
 
 class ChatMessageBase(BaseModel):
@@ -144,6 +187,14 @@ class DualRAGQuery(BaseModel):
     include_academic_sources: bool = True
     max_student_results: int = 5
     max_academic_results: int = 5
+    gap_analysis_mode: Optional[GapAnalysisMode] = None  # Defaults to settings.rag_gap_analysis_mode
+    use_answer_cache: bool = True
+    rerank: Optional[bool] = None  # Cross-encoder reranking; defaults to settings.rag_rerank_enabled
+    lexical_weight: Optional[float] = Field(default=None, ge=0.0, le=1.0)  # Defaults to settings.rag_lexical_weight
+    # Student context scoring; each defaults to its settings.rag_student_* value
+    recency_half_life_days: Optional[float] = Field(default=None, gt=0.0)
+    recency_weight: Optional[float] = Field(default=None, ge=0.0, le=1.0)
+    error_boost: Optional[float] = Field(default=None, ge=0.0)
 
 
 class RetrievedContext(BaseModel):
@@ -161,9 +212,15 @@ class DualRAGResponse(BaseModel):
     student_contexts: List[RetrievedContext]
     academic_contexts: List[RetrievedContext]
     gaps_detected: List["GapAnalysisResponse"] = []
+    gaps_pending: bool = False  # Deferred gap analysis; results appear under /rag/gaps/{profile_id}
     confidence_score: float
     modality_used: str
     sources_cited: List[str]
+    incomplete_sources: List[str] = []  # Retrieval sources that timed out or failed
+    cached: bool = False  # Answer served from the semantic answer cache
+    context_tokens_used: int = 0  # Estimated tokens of retrieved context placed in the prompt
+    context_tokens_dropped: int = 0  # Estimated tokens removed by dedup, truncation or the budget
+    timings: Dict[str, float] = {}  # Per-stage latency in milliseconds
 
 
 # ============ Gap Analysis Schemas ============
@@ -232,6 +289,7 @@ class SemanticSearchQuery(BaseModel):
     subject: Optional[str] = None
     topic: Optional[str] = None
     limit: int = 10
+    lexical_weight: Optional[float] = Field(default=None, ge=0.0, le=1.0)  # Defaults to settings.rag_lexical_weight
 
 
 class SemanticSearchResult(BaseModel):
@@ -249,5 +307,26 @@ class SemanticSearchResponse(BaseModel):
     total_found: int
 
 
+class BatchSearchItem(BaseModel):
+    """One query of a batch search, with its own filters"""
+    query: str
+    subject: Optional[str] = None
+    topic: Optional[str] = None
+    limit: int = Field(default=10, ge=1, le=50)
+
+
+class BatchSearchQuery(BaseModel):
+    """Several searches answered with a single embedding call"""
+    queries: List[BatchSearchItem] = Field(..., min_length=1, max_length=50)
+    source: str = "all"  # "student", "academic", "all"
+    profile_id: Optional[str] = None  # Required for student results
+    lexical_weight: Optional[float] = Field(default=None, ge=0.0, le=1.0)  # Defaults to settings.rag_lexical_weight
+
+
+class BatchSearchResponse(BaseModel):
+    """One search response per query, in request order"""
+    results: List[SemanticSearchResponse]
+
+
 # Update forward reference
 DualRAGResponse.model_rebuild()
@@ -4,9 +4,11 @@ Business logic for Dual RAG Personalized Reasoning Engine
 """
 
 import uuid
+import time
+import asyncio
 from datetime import datetime
-from typing import Optional, List, Dict, Any, Tuple
-from sqlalchemy import select, and_
+from typing import Optional, List, Dict, Any, Tuple, AsyncIterator
+from sqlalchemy import select, insert, and_
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.modules.dual_rag.models import (
@@ -18,9 +20,15 @@ from app.modules.dual_rag.models import (
 from app.modules.dual_rag.schemas import (
     StudentContextCreate,
     AcademicDocumentCreate,
+    AcademicDocumentBulkResponse,
+    AcademicDocumentIngest,
+    AcademicDocumentIngestResponse,
+    BulkItemError,
+    DuplicateChunk,
     ChatMessageCreate,
     DualRAGQuery,
     DualRAGResponse,
+    GapAnalysisMode,
     RetrievedContext,
     GapAnalysisCreate,
     GapResolution,
@@ -28,18 +36,33 @@ from app.modules.dual_rag.schemas import (
     ExplanationResponse,
     SemanticSearchQuery,
     SemanticSearchResult,
-    SemanticSearchResponse
+    SemanticSearchResponse,
+    BatchSearchQuery,
+    BatchSearchResponse
 )
 from app.modules.dual_rag.vector_store import VectorStoreService, get_vector_store
+from app.modules.dual_rag.llm import LLMClient, get_llm_client
+from app.modules.dual_rag.answer_cache import CachedAnswer, SemanticAnswerCache, get_answer_cache
+from app.modules.dual_rag.chunking import (
+    TextChunker,
+    ChunkDeduplicator,
+    dedup_scope,
+    get_text_chunker,
+    get_chunk_deduplicator
+)
+from app.modules.dual_rag.context_packing import ContextPacker, get_context_packer
+from app.modules.dual_rag.reranker import CrossEncoderReranker, get_reranker
+from app.modules.dual_rag.reindex import academic_row_metadata
+from app.modules.dual_rag.student_scoring import StudentContextScorer, get_student_scorer
+from app.modules.dual_rag.write_buffer import InteractionWriteBuffer, get_interaction_buffer
 from app.modules.ltp.service import LTPService
 from app.core.config import settings
+from app.core.database import async_session_maker
+from app.core.tasks import spawn_background_task
+
 
-# Optional: Import Google Gemini for LLM calls
-try:
-    import google.generativeai as genai
-    GEMINI_AVAILABLE = True
-except ImportError:
-    GEMINI_AVAILABLE = False
+def _elapsed_ms(started: float) -> float:
+    return round((time.perf_counter() - started) * 1000, 2)
 
 
 class DualRAGService:
@@ -48,16 +71,32 @@ class DualRAGService:
     Retrieves and fuses student context with academic materials
     """
     
-    def __init__(self, db: AsyncSession, vector_store: VectorStoreService = None):
+    def __init__(
+        self,
+        db: AsyncSession,
+        vector_store: VectorStoreService = None,
+        llm: LLMClient = None,
+        answer_cache: SemanticAnswerCache = None,
+        write_buffer: InteractionWriteBuffer = None,
+        context_packer: ContextPacker = None,
+        reranker: CrossEncoderReranker = None,
+        chunker: TextChunker = None,
+        deduplicator: ChunkDeduplicator = None,
+        student_scorer: StudentContextScorer = None
+    ):
         self.db = db
         self.vector_store = vector_store or get_vector_store()
         self.ltp_service = LTPService(db)
         
-        # Initialize Gemini client if available
-        self.gemini_model = None
-        if GEMINI_AVAILABLE and settings.gemini_api_key:
-            genai.configure(api_key=settings.gemini_api_key)
-            self.gemini_model = genai.GenerativeModel(settings.gemini_model)
+        # Shared, process-wide Gemini client (unavailable if not configured)
+        self.llm = llm or get_llm_client()
+        self.answer_cache = answer_cache or get_answer_cache()
+        self.write_buffer = write_buffer or get_interaction_buffer()
+        self.context_packer = context_packer or get_context_packer()
+        self.reranker = reranker or get_reranker()
+        self.chunker = chunker or get_text_chunker()
+        self.deduplicator = deduplicator or get_chunk_deduplicator()
+        self.student_scorer = student_scorer or get_student_scorer()
     
     # ============ Student Context Operations ============
     
@@ -78,18 +117,7 @@ class DualRAGService:
         self.db.add(context)
         
         # Add to vector store
-        metadata = {
-            "profile_id": profile_id,
-            "context_type": context_data.context_type.value,
-            "concept_id": context_data.concept_id,
-            "concept_name": context_data.concept_name,
-            "subject": context_data.subject,
-            "topic": context_data.topic,
-            "was_correct": context_data.was_correct,
-            "created_at": datetime.utcnow().isoformat()
-        }
-        # Filter out None values
-        metadata = {k: v for k, v in metadata.items() if v is not None}
+        metadata = self._student_metadata(profile_id, context_data)
         
         embedding_id = await self.vector_store.add_student_context(
             doc_id=context_id,
@@ -102,6 +130,25 @@ class DualRAGService:
         await self.db.refresh(context)
         return context
     
+    def _student_metadata(
+        self,
+        profile_id: str,
+        context_data: StudentContextCreate,
+        created_at: Optional[datetime] = None
+    ) -> Dict[str, Any]:
+        """Vector store metadata for a student context, without None values"""
+        metadata = {
+            "profile_id": profile_id,
+            "context_type": context_data.context_type.value,
+            "concept_id": context_data.concept_id,
+            "concept_name": context_data.concept_name,
+            "subject": context_data.subject,
+            "topic": context_data.topic,
+            "was_correct": context_data.was_correct,
+            "created_at": (created_at or datetime.utcnow()).isoformat()
+        }
+        return {k: v for k, v in metadata.items() if v is not None}
+    
     async def get_student_contexts(
         self,
         profile_id: str,
@@ -133,39 +180,243 @@ class DualRAGService:
         self.db.add(document)
         
         # Add to vector store
-        metadata = {
-            "source_type": doc_data.source_type.value,
-            "source_name": doc_data.source_name,
-            "subject": doc_data.subject,
-            "topic": doc_data.topic,
-            "subtopic": doc_data.subtopic,
-            "grade_level": doc_data.grade_level,
-            "difficulty_level": doc_data.difficulty_level,
-            "title": doc_data.title
-        }
-        metadata = {k: v for k, v in metadata.items() if v is not None}
-        
         embedding_id = await self.vector_store.add_academic_document(
             doc_id=doc_id,
             content=doc_data.content,
-            metadata=metadata
+            metadata=self._academic_metadata(doc_data)
         )
         document.embedding_id = embedding_id
         
         await self.db.commit()
         await self.db.refresh(document)
+        
+        self.deduplicator.add(doc_id, doc_data.content, dedup_scope(doc_data.subject, doc_data.topic))
+        self.answer_cache.invalidate_scope(doc_data.subject, doc_data.topic)
         return document
     
     async def add_academic_documents_bulk(
         self,
         documents: List[AcademicDocumentCreate]
-    ) -> List[AcademicDocument]:
-        """Bulk add academic documents"""
-        results = []
-        for doc_data in documents:
-            doc = await self.add_academic_document(doc_data)
-            results.append(doc)
-        return results
+    ) -> AcademicDocumentBulkResponse:
+        """
+        Bulk add academic documents.
+        Embeddings are written to Chroma in batches of rag_ingest_batch_size and
+        all SQL rows go in with a single INSERT and commit. Documents that fail
+        are reported individually instead of aborting the upload.
+        """
+        failed: List[BulkItemError] = []
+        pending: List[Tuple[int, str, AcademicDocumentCreate]] = []
+        
+        for index, doc_data in enumerate(documents):
+            if not doc_data.content.strip():
+                failed.append(BulkItemError(index=index, title=doc_data.title, error="Empty content"))
+                continue
+            pending.append((index, str(uuid.uuid4()), doc_data))
+        
+        vector_failures = await self.vector_store.add_academic_documents(
+            doc_ids=[doc_id for _, doc_id, _ in pending],
+            contents=[doc_data.content for _, _, doc_data in pending],
+            metadatas=[self._academic_metadata(doc_data) for _, _, doc_data in pending],
+            batch_size=settings.rag_ingest_batch_size
+        )
+        
+        now = datetime.utcnow()
+        rows = []
+        for index, doc_id, doc_data in pending:
+            if doc_id in vector_failures:
+                failed.append(BulkItemError(
+                    index=index,
+                    title=doc_data.title,
+                    error=f"Indexing failed: {vector_failures[doc_id]}"
+                ))
+                continue
+            rows.append({
+                "id": doc_id,
+                **doc_data.model_dump(),
+                "source_type": doc_data.source_type.value,
+                "embedding_id": doc_id,
+                "created_at": now,
+                "updated_at": now
+            })
+        
+        created: List[AcademicDocument] = []
+        if rows:
+            try:
+                result = await self.db.scalars(
+                    insert(AcademicDocument).returning(AcademicDocument),
+                    rows
+                )
+                created = list(result.all())
+                await self.db.commit()
+            except Exception as e:
+                # Keep Chroma consistent with the database
+                await self.db.rollback()
+                await self.vector_store.delete_academic_documents([row["id"] for row in rows])
+                positions = {doc_id: (index, doc_data) for index, doc_id, doc_data in pending}
+                failed.extend(
+                    BulkItemError(
+                        index=positions[row["id"]][0],
+                        title=positions[row["id"]][1].title,
+                        error=f"Database insert failed: {e}"
+                    )
+                    for row in rows
+                )
+                created = []
+        
+        for doc in created:
+            self.deduplicator.add(doc.id, doc.content, dedup_scope(doc.subject, doc.topic))
+        for subject, topic in {(doc.subject, doc.topic) for doc in created}:
+            self.answer_cache.invalidate_scope(subject, topic)
+        
+        failed.sort(key=lambda item: item.index)
+        return AcademicDocumentBulkResponse(
+            documents=created,
+            failed=failed,
+            total_submitted=len(documents)
+        )
+    
+    async def delete_academic_document(self, doc_id: str) -> bool:
+        """Remove an academic document from the database and the vector store"""
+        result = await self.db.execute(
+            select(AcademicDocument).where(AcademicDocument.id == doc_id)
+        )
+        document = result.scalar_one_or_none()
+        if not document:
+            return False
+        
+        await self.vector_store.delete_academic_document(document.embedding_id or doc_id)
+        await self.db.delete(document)
+        await self.db.commit()
+        
+        self.deduplicator.remove_many([doc_id])
+        self.answer_cache.invalidate_documents([doc_id])
+        return True
+    
+    async def ingest_academic_document(
+        self,
+        doc_data: AcademicDocumentIngest
+    ) -> AcademicDocumentIngestResponse:
+        """
+        Split a source into overlapping chunks, skip chunks that duplicate
+        indexed ones, and store the rest through the bulk vector path.
+        Ingestion is all-or-nothing: if any chunk fails to index, nothing is kept.
+        """
+        chunks = self.chunker.split(
+            doc_data.content,
+            chunk_tokens=doc_data.chunk_tokens,
+            overlap_tokens=doc_data.chunk_overlap_tokens
+        )
+        
+        # Kept chunks carry their position among all split chunks, so stored
+        # chunk_index and DuplicateChunk.chunk_index share one numbering
+        kept: List[Tuple[int, str, str]] = []
+        duplicates: List[DuplicateChunk] = []
+        scope = dedup_scope(doc_data.subject, doc_data.topic)
+        for position, chunk in enumerate(chunks):
+            chunk_id = str(uuid.uuid4())
+            if not doc_data.deduplicate:
+                self.deduplicator.add(chunk_id, chunk, scope)
+                kept.append((position, chunk_id, chunk))
+                continue
+            # Registering as we go also catches repeats within this source
+            match = self.deduplicator.check_and_add(chunk_id, chunk, scope)
+            if match is None:
+                kept.append((position, chunk_id, chunk))
+            else:
+                duplicates.append(DuplicateChunk(
+                    chunk_index=position,
+                    duplicate_of=match.doc_id,
+                    kind=match.kind,
+                    similarity=round(match.similarity, 3)
+                ))
+        
+        fields = doc_data.model_dump(exclude={"content", "chunk_tokens", "chunk_overlap_tokens", "deduplicate"})
+        fields["source_type"] = doc_data.source_type.value
+        base_metadata = self._academic_metadata(doc_data)
+        kept_ids = [chunk_id for _, chunk_id, _ in kept]
+        
+        try:
+            vector_failures = await self.vector_store.add_academic_documents(
+                doc_ids=kept_ids,
+                contents=[chunk for _, _, chunk in kept],
+                metadatas=[
+                    {**base_metadata, "chunk_index": position, "total_chunks": len(chunks)}
+                    for position, _, _ in kept
+                ],
+                batch_size=settings.rag_ingest_batch_size
+            )
+            if vector_failures:
+                raise RuntimeError(f"Indexing failed: {next(iter(vector_failures.values()))}")
+            
+            now = datetime.utcnow()
+            rows = [
+                {
+                    "id": chunk_id,
+                    **fields,
+                    "content": chunk,
+                    "chunk_index": position,
+                    "total_chunks": len(chunks),
+                    "embedding_id": chunk_id,
+                    "created_at": now,
+                    "updated_at": now
+                }
+                for position, chunk_id, chunk in kept
+            ]
+            created: List[AcademicDocument] = []
+            if rows:
+                result = await self.db.scalars(
+                    insert(AcademicDocument).returning(AcademicDocument),
+                    rows
+                )
+                created = list(result.all())
+                await self.db.commit()
+        except Exception:
+            await self.db.rollback()
+            await self.vector_store.delete_academic_documents(kept_ids)
+            self.deduplicator.remove_many(kept_ids)
+            raise
+        
+        if created:
+            self.answer_cache.invalidate_scope(doc_data.subject, doc_data.topic)
+        return AcademicDocumentIngestResponse(
+            documents=created,
+            duplicates=duplicates,
+            total_chunks=len(chunks)
+        )
+    
+    async def rebuild_lexical_index(self) -> int:
+        """Load every academic document into the in-process BM25 and duplicate indexes"""
+        result = await self.db.stream_scalars(
+            select(AcademicDocument).execution_options(yield_per=1000)
+        )
+        documents = []
+        scopes = []
+        async for document in result:
+            documents.append((
+                document.embedding_id or document.id,
+                document.content,
+                academic_row_metadata(document)
+            ))
+            scopes.append(dedup_scope(document.subject, document.topic))
+        self.deduplicator.rebuild(
+            (doc_id, content, scope)
+            for (doc_id, content, _), scope in zip(documents, scopes)
+        )
+        return self.vector_store.lexical_index.rebuild(documents)
+    
+    def _academic_metadata(self, doc_data: AcademicDocumentCreate) -> Dict[str, Any]:
+        """Vector store metadata for an academic document (None values dropped)"""
+        metadata = {
+            "source_type": doc_data.source_type.value,
+            "source_name": doc_data.source_name,
+            "subject": doc_data.subject,
+            "topic": doc_data.topic,
+            "subtopic": doc_data.subtopic,
+            "grade_level": doc_data.grade_level,
+            "difficulty_level": doc_data.difficulty_level,
+            "title": doc_data.title
+        }
+        return {k: v for k, v in metadata.items() if v is not None}
     
     async def get_academic_documents(
         self,
@@ -191,20 +442,285 @@ class DualRAGService:
     async def process_query(self, query: DualRAGQuery) -> DualRAGResponse:
         """
         Main Dual RAG processing pipeline
-        1. Retrieve relevant student context
-        2. Retrieve relevant academic materials
-        3. Detect gaps/contradictions
-        4. Generate personalized response
+        1. Embed the query
+        2. Retrieve relevant student context and academic materials
+        3. Serve a cached answer for a semantically identical question, or
+        4. Detect gaps/contradictions and generate a personalized response
         """
-        student_contexts = []
-        academic_contexts = []
+        started = time.perf_counter()
+        context = await self._retrieve(query)
+        student_contexts = context["student_contexts"]
+        academic_contexts = context["academic_contexts"]
+        preferred_modality = context["modality"]
+        packed = context["packed"]
+        timings = context["timings"]
+        
+        gap_mode = self._gap_analysis_mode(query)
+        gaps = []
+        
+        stage_started = time.perf_counter()
+        cached = self._lookup_cached_answer(query, context)
+        if cached is not None:
+            # Gaps are personal, so they are still analysed for this student
+            gap_mode = GapAnalysisMode.DEFERRED
+            self._schedule_gap_analysis(query, student_contexts, academic_contexts)
+            answer, confidence = cached.answer, cached.confidence
+        elif gap_mode == GapAnalysisMode.PARALLEL:
+            # Gap detection and generation are independent LLM calls
+            gaps, (answer, confidence) = await asyncio.gather(
+                self._detect_gaps(
+                    query.profile_id,
+                    query.query,
+                    student_contexts,
+                    academic_contexts
+                ),
+                self._generate_response(
+                    query.query,
+                    packed.student_contexts,
+                    packed.academic_contexts,
+                    preferred_modality,
+                    []
+                )
+            )
+        else:
+            # Detect gaps
+            if gap_mode == GapAnalysisMode.INLINE:
+                gaps = await self._detect_gaps(
+                    query.profile_id,
+                    query.query,
+                    student_contexts,
+                    academic_contexts
+                )
+                timings["gap_analysis_ms"] = _elapsed_ms(stage_started)
+                stage_started = time.perf_counter()
+            else:
+                self._schedule_gap_analysis(query, student_contexts, academic_contexts)
+            
+            # Generate response
+            answer, confidence = await self._generate_response(
+                query.query,
+                packed.student_contexts,
+                packed.academic_contexts,
+                preferred_modality,
+                gaps
+            )
+        timings["generation_ms"] = _elapsed_ms(stage_started)
         
-        # Get learner's profile for personalization
-        profile = await self.ltp_service.get_profile_by_id(query.profile_id)
-        preferred_modality = "visual"  # Default
-        if profile:
-            preferred_modality = await self.ltp_service.get_preferred_modality(query.profile_id)
+        if cached is None:
+            self._store_cached_answer(
+                query, context, answer, confidence,
+                personalized=bool(packed.student_contexts or gaps)
+            )
         
+        stage_started = time.perf_counter()
+        await self._record_interaction(query, answer, student_contexts, academic_contexts)
+        timings["record_ms"] = _elapsed_ms(stage_started)
+        timings["total_ms"] = _elapsed_ms(started)
+        
+        return DualRAGResponse(
+            answer=answer,
+            student_contexts=student_contexts,
+            academic_contexts=academic_contexts,
+            gaps_detected=gaps,
+            gaps_pending=gap_mode == GapAnalysisMode.DEFERRED,
+            confidence_score=confidence,
+            modality_used=preferred_modality,
+            sources_cited=self._sources_cited(packed.academic_contexts),
+            incomplete_sources=context["incomplete_sources"],
+            cached=cached is not None,
+            context_tokens_used=packed.tokens_used,
+            context_tokens_dropped=packed.tokens_dropped,
+            timings=timings
+        )
+    
+    async def stream_query(self, query: DualRAGQuery) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Streaming variant of process_query.
+        Yields a "contexts" event as soon as retrieval finishes, a "token" event
+        per generated chunk, and a final "done" event with gaps, confidence and sources.
+        """
+        started = time.perf_counter()
+        context = await self._retrieve(query)
+        student_contexts = context["student_contexts"]
+        academic_contexts = context["academic_contexts"]
+        preferred_modality = context["modality"]
+        packed = context["packed"]
+        timings = context["timings"]
+        
+        yield {
+            "event": "contexts",
+            "student_contexts": [c.model_dump() for c in student_contexts],
+            "academic_contexts": [c.model_dump() for c in academic_contexts],
+            "modality_used": preferred_modality,
+            "incomplete_sources": context["incomplete_sources"]
+        }
+        
+        gap_mode = self._gap_analysis_mode(query)
+        gaps = []
+        gap_task = None
+        
+        cached = self._lookup_cached_answer(query, context)
+        if cached is not None:
+            gap_mode = GapAnalysisMode.DEFERRED
+            self._schedule_gap_analysis(query, student_contexts, academic_contexts)
+        elif gap_mode == GapAnalysisMode.INLINE:
+            gaps = await self._detect_gaps(
+                query.profile_id,
+                query.query,
+                student_contexts,
+                academic_contexts
+            )
+        elif gap_mode == GapAnalysisMode.PARALLEL:
+            gap_task = asyncio.create_task(self._detect_gaps(
+                query.profile_id,
+                query.query,
+                student_contexts,
+                academic_contexts
+            ))
+        else:
+            self._schedule_gap_analysis(query, student_contexts, academic_contexts)
+        
+        stage_started = time.perf_counter()
+        if cached is not None:
+            answer, confidence = cached.answer, cached.confidence
+            yield {"event": "token", "text": answer}
+        else:
+            chunks = []
+            confidence = 0.5
+            async for text, confidence in self._stream_response(
+                query.query,
+                packed.student_contexts,
+                packed.academic_contexts,
+                preferred_modality,
+                gaps
+            ):
+                if text:
+                    chunks.append(text)
+                    yield {"event": "token", "text": text}
+            answer = "".join(chunks)
+            self._store_cached_answer(
+                query, context, answer, confidence,
+                personalized=bool(packed.student_contexts or gaps)
+            )
+        timings["generation_ms"] = _elapsed_ms(stage_started)
+        
+        if gap_task is not None:
+            gaps = await gap_task
+        
+        stage_started = time.perf_counter()
+        await self._record_interaction(query, answer, student_contexts, academic_contexts)
+        timings["record_ms"] = _elapsed_ms(stage_started)
+        timings["total_ms"] = _elapsed_ms(started)
+        
+        yield {
+            "event": "done",
+            "gaps_detected": gaps,
+            "gaps_pending": gap_mode == GapAnalysisMode.DEFERRED,
+            "confidence_score": confidence,
+            "modality_used": preferred_modality,
+            "sources_cited": self._sources_cited(packed.academic_contexts),
+            "cached": cached is not None,
+            "context_tokens_used": packed.tokens_used,
+            "context_tokens_dropped": packed.tokens_dropped,
+            "timings": timings
+        }
+    
+    def _lookup_cached_answer(
+        self,
+        query: DualRAGQuery,
+        context: Dict[str, Any]
+    ) -> Optional[CachedAnswer]:
+        """Find a previous answer to a near-identical question over the same sources"""
+        if not query.use_answer_cache or context["query_embedding"] is None:
+            return None
+        return self.answer_cache.lookup(
+            embedding=context["query_embedding"],
+            subject=query.subject,
+            topic=query.topic,
+            modality=context["modality"],
+            academic_doc_ids=[c.id for c in context["academic_contexts"]],
+            profile_id=query.profile_id
+        )
+    
+    def _store_cached_answer(
+        self,
+        query: DualRAGQuery,
+        context: Dict[str, Any],
+        answer: str,
+        confidence: float,
+        personalized: bool
+    ) -> None:
+        """
+        Cache an LLM answer; fallback and interrupted answers are never cached.
+        A personalized answer (built from student contexts or gaps) is kept
+        for this profile only.
+        """
+        if not query.use_answer_cache or not self.llm.available or confidence < 0.85:
+            return
+        if context["query_embedding"] is None:
+            return
+        self.answer_cache.store(
+            embedding=context["query_embedding"],
+            subject=query.subject,
+            topic=query.topic,
+            modality=context["modality"],
+            academic_doc_ids=[c.id for c in context["academic_contexts"]],
+            answer=answer,
+            confidence=confidence,
+            profile_id=query.profile_id if personalized else None
+        )
+    
+    def _gap_analysis_mode(self, query: DualRAGQuery) -> GapAnalysisMode:
+        """Per-request gap analysis mode, falling back to the configured default"""
+        if query.gap_analysis_mode is not None:
+            return query.gap_analysis_mode
+        try:
+            return GapAnalysisMode(settings.rag_gap_analysis_mode)
+        except ValueError:
+            return GapAnalysisMode.INLINE
+    
+    def _schedule_gap_analysis(
+        self,
+        query: DualRAGQuery,
+        student_contexts: List[RetrievedContext],
+        academic_contexts: List[RetrievedContext]
+    ) -> None:
+        """Run gap detection after the response, in its own DB session"""
+        if not student_contexts or not academic_contexts:
+            return
+        spawn_background_task(
+            self._run_deferred_gap_analysis(
+                query.profile_id,
+                query.query,
+                student_contexts,
+                academic_contexts
+            ),
+            name=f"gap-analysis-{query.profile_id}"
+        )
+    
+    async def _run_deferred_gap_analysis(
+        self,
+        profile_id: str,
+        query: str,
+        student_contexts: List[RetrievedContext],
+        academic_contexts: List[RetrievedContext]
+    ) -> None:
+        """Background job: write GapAnalysis/Misconception rows for a finished query"""
+        async with async_session_maker() as db:
+            service = DualRAGService(db, self.vector_store, self.llm, self.answer_cache)
+            await service._detect_gaps(profile_id, query, student_contexts, academic_contexts)
+    
+    async def _retrieve(self, query: DualRAGQuery) -> Dict[str, Any]:
+        """
+        Embed the query and fetch both context sources plus the preferred modality.
+        Returns a dict with "modality", "student_contexts", "academic_contexts",
+        "incomplete_sources", the "query_embedding" used for retrieval, the
+        "packed" subset of contexts that fits the prompt token budget and
+        per-stage "timings" in milliseconds.
+        """
+        timings = {}
+        rerank = self._should_rerank(query)
+        rescore_students = not self.student_scorer.is_neutral(query.recency_weight, query.error_boost)
         # Build filters
         student_filters = {}
         academic_filters = {}
@@ -216,62 +732,115 @@ class DualRAGService:
             student_filters["topic"] = query.topic
             academic_filters["topic"] = query.topic
         
-        # Retrieve student context (Source A)
-        if query.include_student_context:
-            raw_student = await self.vector_store.search_student_contexts(
+        # Embed the query once; the same vector is used for both collections.
+        # Under embedding back-pressure retrieval falls back to the BM25 index.
+        stage_started = time.perf_counter()
+        query_embedding = None
+        if not self.vector_store.lexical_fast_path:
+            query_embedding = await self.vector_store.embed_query(query.query)
+        timings["embed_ms"] = _elapsed_ms(stage_started)
+        
+        # Over-fetch academic candidates when a reranker will pick the final set
+        n_academic = query.max_academic_results
+        if rerank:
+            n_academic *= settings.rag_rerank_candidate_multiplier
+        # Likewise for student contexts when recency/error scoring reorders them
+        n_student = query.max_student_results
+        if rescore_students:
+            n_student *= settings.rag_student_candidate_multiplier
+        
+        # Retrieve student context (Source A) and academic materials (Source B)
+        # concurrently, alongside the profile lookup for personalization
+        stage_started = time.perf_counter()
+        preferred_modality, retrieval = await asyncio.gather(
+            self._get_preferred_modality(query.profile_id),
+            self.vector_store.dual_search(
                 query=query.query,
                 profile_id=query.profile_id,
-                n_results=query.max_student_results,
-                filters=student_filters if student_filters else None
+                n_student=n_student,
+                n_academic=n_academic,
+                student_filters=student_filters if student_filters else None,
+                academic_filters=academic_filters if academic_filters else None,
+                include_student=query.include_student_context,
+                include_academic=query.include_academic_sources,
+                student_timeout=settings.rag_student_search_timeout,
+                academic_timeout=settings.rag_academic_search_timeout,
+                query_embedding=query_embedding,
+                lexical_weight=query.lexical_weight
             )
-            
-            student_contexts = [
-                RetrievedContext(
-                    id=r["id"],
-                    source="student",
-                    content=r["content"],
-                    relevance_score=r["score"],
-                    metadata=r["metadata"]
-                )
-                for r in raw_student
-            ]
+        )
+        timings["retrieval_ms"] = _elapsed_ms(stage_started)
         
-        # Retrieve academic materials (Source B)
-        if query.include_academic_sources:
-            raw_academic = await self.vector_store.search_academic_documents(
-                query=query.query,
-                n_results=query.max_academic_results,
-                filters=academic_filters if academic_filters else None
+        academic_results = retrieval["academic_documents"]
+        if rerank:
+            stage_started = time.perf_counter()
+            academic_results, _ = await self.reranker.rerank(
+                query.query,
+                academic_results,
+                query.max_academic_results,
+                timeout=settings.rag_rerank_timeout
             )
-            
-            academic_contexts = [
-                RetrievedContext(
-                    id=r["id"],
-                    source="academic",
-                    content=r["content"],
-                    relevance_score=r["score"],
-                    metadata=r["metadata"]
-                )
-                for r in raw_academic
-            ]
+            timings["rerank_ms"] = _elapsed_ms(stage_started)
         
-        # Detect gaps
-        gaps = await self._detect_gaps(
-            query.profile_id,
-            query.query,
-            student_contexts,
-            academic_contexts
-        )
+        student_results = retrieval["student_contexts"]
+        if rescore_students:
+            stage_started = time.perf_counter()
+            student_results = self.student_scorer.score(
+                student_results,
+                query.max_student_results,
+                half_life_days=query.recency_half_life_days,
+                recency_weight=query.recency_weight,
+                error_boost=query.error_boost
+            )
+            timings["student_scoring_ms"] = _elapsed_ms(stage_started)
+        
+        student_contexts = self._to_retrieved_contexts(student_results, "student")
+        academic_contexts = self._to_retrieved_contexts(academic_results, "academic")
         
-        # Generate response
-        answer, confidence = await self._generate_response(
-            query.query,
-            student_contexts,
-            academic_contexts,
-            preferred_modality,
-            gaps
+        stage_started = time.perf_counter()
+        packed = self.context_packer.pack(student_contexts, academic_contexts)
+        timings["packing_ms"] = _elapsed_ms(stage_started)
+        
+        return {
+            "modality": preferred_modality,
+            "student_contexts": student_contexts,
+            "academic_contexts": academic_contexts,
+            "incomplete_sources": retrieval["incomplete_sources"],
+            "query_embedding": query_embedding,
+            "packed": packed,
+            "timings": timings
+        }
+    
+    def _should_rerank(self, query: DualRAGQuery) -> bool:
+        """Per-query override of settings.rag_rerank_enabled, if the model is installed"""
+        if not query.include_academic_sources:
+            return False
+        enabled = self.reranker.enabled if query.rerank is None else query.rerank
+        return enabled and self.reranker.available
+    
+    async def _record_interaction(
+        self,
+        query: DualRAGQuery,
+        answer: str,
+        student_contexts: List[RetrievedContext],
+        academic_contexts: List[RetrievedContext]
+    ) -> None:
+        """Persist the exchange to chat history and the student's context store"""
+        interaction_context = StudentContextCreate(
+            context_type="chat",
+            content=f"Q: {query.query}\nA: {answer[:500]}",  # Truncate long answers
+            concept_id=query.concept_id,
+            subject=query.subject,
+            topic=query.topic
         )
         
+        if self.write_buffer.running:
+            # Written after the response by the next buffer flush
+            self._buffer_interaction(
+                query, answer, student_contexts, academic_contexts, interaction_context
+            )
+            return
+        
         # Save to chat history if session provided
         if query.session_id:
             await self._save_chat_message(
@@ -294,25 +863,81 @@ class DualRAGService:
         # Store this interaction as new student context
         await self.add_student_context(
             profile_id=query.profile_id,
-            context_data=StudentContextCreate(
-                context_type="chat",
-                content=f"Q: {query.query}\nA: {answer[:500]}",  # Truncate long answers
-                concept_id=query.concept_id,
-                subject=query.subject,
-                topic=query.topic
-            )
+            context_data=interaction_context
         )
+    
+    def _buffer_interaction(
+        self,
+        query: DualRAGQuery,
+        answer: str,
+        student_contexts: List[RetrievedContext],
+        academic_contexts: List[RetrievedContext],
+        interaction_context: StudentContextCreate
+    ) -> None:
+        """Queue the chat messages and interaction context on the write buffer"""
+        now = datetime.utcnow()
         
-        return DualRAGResponse(
-            answer=answer,
-            student_contexts=student_contexts,
-            academic_contexts=academic_contexts,
-            gaps_detected=gaps,
-            confidence_score=confidence,
-            modality_used=preferred_modality,
-            sources_cited=[c.metadata.get("source_name", "Unknown") for c in academic_contexts[:3]]
+        if query.session_id:
+            for role, content, context_ids, doc_ids in (
+                ("user", query.query, [], []),
+                (
+                    "assistant",
+                    answer,
+                    [c.id for c in student_contexts],
+                    [c.id for c in academic_contexts]
+                )
+            ):
+                self.write_buffer.add_chat_message({
+                    "id": str(uuid.uuid4()),
+                    "profile_id": query.profile_id,
+                    "session_id": query.session_id,
+                    "role": role,
+                    "content": content,
+                    "concept_id": query.concept_id,
+                    "student_context_ids": context_ids,
+                    "academic_doc_ids": doc_ids,
+                    "was_helpful": None,
+                    "created_at": datetime.utcnow()
+                })
+        
+        row = {
+            "id": str(uuid.uuid4()),
+            "profile_id": query.profile_id,
+            **interaction_context.model_dump(),
+            "embedding_id": None,
+            "created_at": now
+        }
+        row["context_type"] = interaction_context.context_type.value
+        self.write_buffer.add_student_context(
+            row,
+            self._student_metadata(query.profile_id, interaction_context, now)
         )
     
+    def _sources_cited(self, academic_contexts: List[RetrievedContext]) -> List[str]:
+        """Source names of the top academic contexts that were packed into the prompt"""
+        return [c.metadata.get("source_name", "Unknown") for c in academic_contexts[:3]]
+    
+    async def _get_preferred_modality(self, profile_id: str) -> str:
+        """Preferred modality for a profile, defaulting to visual"""
+        return await self.ltp_service.get_preferred_modality(profile_id)
+    
+    def _to_retrieved_contexts(
+        self,
+        results: List[Dict[str, Any]],
+        source: str
+    ) -> List[RetrievedContext]:
+        """Convert vector store hits into RetrievedContext models"""
+        return [
+            RetrievedContext(
+                id=r["id"],
+                source=source,
+                content=r["content"],
+                relevance_score=r["score"],
+                metadata=r["metadata"]
+            )
+            for r in results
+        ]
+    
     async def _detect_gaps(
         self,
         profile_id: str,
@@ -330,10 +955,15 @@ class DualRAGService:
         # Simple keyword-based gap detection (can be enhanced with LLM)
         # For now, we'll return empty list - this would be enhanced with actual LLM analysis
         
-        if self.gemini_model:
-            # Build prompts for gap analysis
-            student_text = "\n".join([c.content for c in student_contexts[:3]])
-            academic_text = "\n".join([c.content for c in academic_contexts[:3]])
+        if self.llm.available:
+            # Build prompts for gap analysis from a smaller packed context
+            packed = self.context_packer.pack(
+                student_contexts,
+                academic_contexts,
+                token_budget=settings.rag_gap_context_token_budget
+            )
+            student_text = "\n".join([c.content for c in packed.student_contexts])
+            academic_text = "\n".join([c.content for c in packed.academic_contexts])
             
             try:
                 prompt = f"""You are an educational analyst. Compare the student's understanding 
@@ -356,19 +986,17 @@ Academic sources:
 
 Identify gaps between student understanding and academic truth. Return ONLY valid JSON."""
 
-                response = await self.gemini_model.generate_content_async(
+                response_text = await self.llm.generate(
                     prompt,
-                    generation_config=genai.GenerationConfig(
-                        temperature=0.3,
-                        response_mime_type="application/json"
-                    )
+                    temperature=0.3,
+                    response_mime_type="application/json"
                 )
                 
                 import json
-                result = json.loads(response.text)
+                result = json.loads(response_text)
                 gaps = result.get("gaps", [])
                 
-                # Save detected gaps to database
+                # Save detected gaps to database in a single transaction
                 for gap in gaps:
                     await self.create_gap_analysis(
                         profile_id=profile_id,
@@ -380,10 +1008,13 @@ Identify gaps between student understanding and academic truth. Return ONLY vali
                             gap_severity=gap.get("severity", "moderate"),
                             student_context_ids=[c.id for c in student_contexts],
                             academic_doc_ids=[c.id for c in academic_contexts]
-                        )
+                        ),
+                        commit=False
                     )
+                await self.db.commit()
             except Exception as e:
                 # Log error but don't fail the main query
+                await self.db.rollback()
                 print(f"Gap analysis error: {e}")
         
         return gaps
@@ -397,8 +1028,58 @@ Identify gaps between student understanding and academic truth. Return ONLY vali
         gaps: List[Dict]
     ) -> Tuple[str, float]:
         """Generate personalized response using retrieved context"""
+        student_text, academic_text = self._format_context_text(student_contexts, academic_contexts)
         
-        # Build context strings
+        # An open circuit raises immediately, so the fallback is served without waiting
+        if self.llm.available:
+            try:
+                prompt = self._build_response_prompt(query, student_text, academic_text, modality, gaps)
+                answer = await self.llm.generate(prompt, temperature=0.7)
+                confidence = 0.85  # Could be calculated based on source quality
+                
+                return answer, confidence
+                
+            except Exception as e:
+                print(f"LLM generation error: {e}")
+        
+        return self._fallback_response(query, student_text, academic_text), 0.5
+    
+    async def _stream_response(
+        self,
+        query: str,
+        student_contexts: List[RetrievedContext],
+        academic_contexts: List[RetrievedContext],
+        modality: str,
+        gaps: List[Dict]
+    ) -> AsyncIterator[Tuple[str, float]]:
+        """Stream (text chunk, confidence) pairs as the LLM produces them"""
+        student_text, academic_text = self._format_context_text(student_contexts, academic_contexts)
+        
+        if self.llm.available:
+            streamed_any = False
+            try:
+                prompt = self._build_response_prompt(query, student_text, academic_text, modality, gaps)
+                async for text in self.llm.stream(prompt, temperature=0.7):
+                    streamed_any = True
+                    yield text, 0.85
+                return
+            except Exception as e:
+                print(f"LLM streaming error: {e}")
+            
+            # A partial answer was already sent: keep it, but at fallback
+            # confidence so it is never cached as complete
+            if streamed_any:
+                yield "", 0.5
+                return
+        
+        yield self._fallback_response(query, student_text, academic_text), 0.5
+    
+    def _format_context_text(
+        self,
+        student_contexts: List[RetrievedContext],
+        academic_contexts: List[RetrievedContext]
+    ) -> Tuple[str, str]:
+        """Render retrieved contexts as prompt sections"""
         student_text = "\n".join([
             f"- {c.content}" for c in student_contexts
         ]) if student_contexts else "No previous context available."
@@ -408,6 +1089,17 @@ Identify gaps between student understanding and academic truth. Return ONLY vali
             for c in academic_contexts
         ]) if academic_contexts else "No academic sources found."
         
+        return student_text, academic_text
+    
+    def _build_response_prompt(
+        self,
+        query: str,
+        student_text: str,
+        academic_text: str,
+        modality: str,
+        gaps: List[Dict]
+    ) -> str:
+        """Build the answer-generation prompt"""
         # Modality-specific instructions
         modality_instructions = {
             "visual": "Use diagrams descriptions, bullet points, and visual metaphors. Structure information visually.",
@@ -419,9 +1111,7 @@ Identify gaps between student understanding and academic truth. Return ONLY vali
         
         modality_guide = modality_instructions.get(modality, modality_instructions["visual"])
         
-        if self.gemini_model:
-            try:
-                prompt = f"""You are SkillTwin, an adaptive AI personal mentor. 
+        return f"""You are SkillTwin, an adaptive AI personal mentor. 
 
 Your task is to answer the student's question using both their personal learning history 
 and verified academic sources. Personalize your explanation based on their learning style.
@@ -448,22 +1138,10 @@ Known Gaps/Misconceptions to Address:
 {gaps if gaps else "None detected"}
 
 Please provide a personalized explanation."""
-
-                response = await self.gemini_model.generate_content_async(
-                    prompt,
-                    generation_config=genai.GenerationConfig(temperature=0.7)
-                )
-                
-                answer = response.text
-                confidence = 0.85  # Could be calculated based on source quality
-                
-                return answer, confidence
-                
-            except Exception as e:
-                print(f"LLM generation error: {e}")
-        
-        # Fallback response without LLM
-        fallback = f"""Based on your question about "{query}", here's what I found:
+    
+    def _fallback_response(self, query: str, student_text: str, academic_text: str) -> str:
+        """Answer assembled from retrieved context when the LLM is unavailable"""
+        return f"""Based on your question about "{query}", here's what I found:
 
 **From Academic Sources:**
 {academic_text[:500] if academic_text else "No sources available."}
@@ -472,8 +1150,6 @@ Please provide a personalized explanation."""
 {student_text[:300] if student_text != "No previous context available." else "This appears to be a new topic for you."}
 
 For a more detailed, personalized explanation, please ensure the AI service is configured."""
-        
-        return fallback, 0.5
     
     async def _save_chat_message(
         self,
@@ -505,17 +1181,16 @@ For a more detailed, personalized explanation, please ensure the AI service is c
     async def create_gap_analysis(
         self,
         profile_id: str,
-        gap_data: GapAnalysisCreate
+        gap_data: GapAnalysisCreate,
+        commit: bool = True
     ) -> GapAnalysis:
-        """Create a gap analysis record"""
+        """Create a gap analysis record (commit=False leaves it to the caller's transaction)"""
         gap = GapAnalysis(
             id=str(uuid.uuid4()),
             profile_id=profile_id,
             **gap_data.model_dump()
         )
         self.db.add(gap)
-        await self.db.commit()
-        await self.db.refresh(gap)
         
         # Also create a misconception in LTP if significant
         if gap_data.gap_severity in ["significant", "critical"]:
@@ -528,11 +1203,17 @@ For a more detailed, personalized explanation, please ensure the AI service is c
                     description=gap_data.gap_description,
                     student_response=gap_data.student_understanding,
                     correct_understanding=gap_data.correct_understanding,
-                    severity=gap_data.gap_severity.value,
+                    # Misconceptions use low/medium/high/critical
+                    severity="high" if gap_data.gap_severity == "significant" else gap_data.gap_severity.value,
                     detection_source="dual_rag"
-                )
+                ),
+                commit=False
             )
         
+        if commit:
+            await self.db.commit()
+            await self.db.refresh(gap)
+        
         return gap
     
     async def get_unresolved_gaps(self, profile_id: str) -> List[GapAnalysis]:
@@ -638,7 +1319,8 @@ For a more detailed, personalized explanation, please ensure the AI service is c
             academic_results = await self.vector_store.search_academic_documents(
                 query=query.query,
                 n_results=query.limit,
-                filters=filters if filters else None
+                filters=filters if filters else None,
+                lexical_weight=query.lexical_weight
             )
             
             for r in academic_results:
@@ -655,6 +1337,47 @@ For a more detailed, personalized explanation, please ensure the AI service is c
             total_found=len(results)
         )
     
+    async def batch_semantic_search(
+        self,
+        batch: BatchSearchQuery
+    ) -> BatchSearchResponse:
+        """Perform several semantic searches with one embedding call"""
+        filters = []
+        for item in batch.queries:
+            item_filters = {}
+            if item.subject:
+                item_filters["subject"] = item.subject
+            if item.topic:
+                item_filters["topic"] = item.topic
+            filters.append(item_filters or None)
+        
+        grouped = await self.vector_store.batch_search(
+            queries=[item.query for item in batch.queries],
+            n_results=max(item.limit for item in batch.queries),
+            filters=filters,
+            profile_id=batch.profile_id,
+            include_student=batch.source in ["student", "all"],
+            include_academic=batch.source in ["academic", "all"],
+            lexical_weight=batch.lexical_weight
+        )
+        
+        responses = []
+        for item, hits in zip(batch.queries, grouped):
+            results = [
+                SemanticSearchResult(
+                    id=r["id"],
+                    source=source,
+                    content=r["content"],
+                    score=r["score"],
+                    metadata=r["metadata"]
+                )
+                for source in ("student", "academic")
+                for r in hits[source][:item.limit]
+            ]
+            responses.append(SemanticSearchResponse(results=results, total_found=len(results)))
+        
+        return BatchSearchResponse(results=responses)
+    
     # ============ Chat History ============
     
     async def get_chat_history(
@@ -0,0 +1,106 @@
+"""
+SkillTwin - Student Context Scoring
+Re-scores retrieved student contexts by similarity, recency and past mistakes
+"""
+
+from datetime import datetime
+from typing import List, Dict, Any, Optional
+
+import numpy as np
+
+from app.core.config import settings
+
+
+class StudentContextScorer:
+    """
+    Post-retrieval scorer for student contexts, vectorized over the candidates:
+
+        score = similarity
+              * ((1 - recency_weight) + recency_weight * 0.5 ** (age_days / half_life_days))
+              * (1 + error_boost) for contexts the student got wrong
+              * type_weights[context_type]
+
+    With recency_weight 0, error_boost 0 and no type weights the vector order is kept.
+    """
+    
+    def __init__(
+        self,
+        half_life_days: float = 30.0,
+        recency_weight: float = 0.3,
+        error_boost: float = 0.25,
+        type_weights: Optional[Dict[str, float]] = None
+    ):
+        self.half_life_days = half_life_days
+        self.recency_weight = recency_weight
+        self.error_boost = error_boost
+        self.type_weights = type_weights or {}
+    
+    def is_neutral(
+        self,
+        recency_weight: Optional[float] = None,
+        error_boost: Optional[float] = None
+    ) -> bool:
+        """True when scoring with these overrides would not change the order"""
+        recency_weight = self.recency_weight if recency_weight is None else recency_weight
+        error_boost = self.error_boost if error_boost is None else error_boost
+        return recency_weight <= 0 and error_boost <= 0 and not self.type_weights
+    
+    def score(
+        self,
+        candidates: List[Dict[str, Any]],
+        n_results: int,
+        half_life_days: Optional[float] = None,
+        recency_weight: Optional[float] = None,
+        error_boost: Optional[float] = None,
+        now: Optional[datetime] = None
+    ) -> List[Dict[str, Any]]:
+        """Top `n_results` candidates by combined score; "retrieval_score" keeps the similarity"""
+        if not candidates:
+            return candidates
+        half_life_days = self.half_life_days if half_life_days is None else half_life_days
+        recency_weight = self.recency_weight if recency_weight is None else recency_weight
+        error_boost = self.error_boost if error_boost is None else error_boost
+        
+        metadatas = [c.get("metadata") or {} for c in candidates]
+        similarity = np.clip(np.array([c["score"] for c in candidates], dtype=np.float64), 0.0, None)
+        
+        # Contexts without a timestamp are treated as new
+        created = np.array(
+            [m.get("created_at") or "NaT" for m in metadatas],
+            dtype="datetime64[s]"
+        )
+        now64 = np.datetime64(now or datetime.utcnow(), "s")
+        age_days = np.nan_to_num((now64 - created) / np.timedelta64(1, "D"), nan=0.0)
+        decay = np.exp2(-np.maximum(age_days, 0.0) / max(half_life_days, 1e-6))
+        recency = (1.0 - recency_weight) + recency_weight * decay
+        
+        wrong = np.array([m.get("was_correct") is False for m in metadatas])
+        errors = 1.0 + error_boost * wrong
+        
+        if self.type_weights:
+            types = np.array([
+                self.type_weights.get(m.get("context_type"), 1.0) for m in metadatas
+            ])
+        else:
+            types = 1.0
+        
+        scores = similarity * recency * errors * types
+        order = np.argsort(-scores, kind="stable")[:n_results]
+        return [
+            {**candidates[i], "retrieval_score": candidates[i]["score"], "score": float(scores[i])}
+            for i in order
+        ]
+
+
+# Singleton instance
+student_scorer = StudentContextScorer(
+    half_life_days=settings.rag_student_recency_half_life_days,
+    recency_weight=settings.rag_student_recency_weight,
+    error_boost=settings.rag_student_error_boost,
+    type_weights=settings.rag_student_context_type_weights
+)
+
+
+def get_student_scorer() -> StudentContextScorer:
+    """Dependency for getting the student context scorer instance"""
+    return student_scorer
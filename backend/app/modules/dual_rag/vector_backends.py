@@ -0,0 +1,207 @@
+"""
+SkillTwin - Vector Store Backends
+Pluggable storage behind VectorStoreService (ChromaDB or a local memory-mapped index)
+"""
+
+import json
+import os
+from abc import ABC, abstractmethod
+from typing import List, Dict, Any, Optional, Tuple
+
+import chromadb
+from chromadb.segment.impl.manager.local import LocalSegmentManager
+
+from app.core.config import settings
+
+
+class VectorCollection(ABC):
+    """
+    A named set of (id, document, metadata, embedding) records.
+    Mirrors the subset of the Chroma collection API used by VectorStoreService,
+    so Chroma collections satisfy it as-is and results keep Chroma's shape
+    ({"ids": [[...]], "documents": [[...]], "metadatas": [[...]], "distances": [[...]]}).
+    """
+    
+    name: str
+    
+    @abstractmethod
+    def add(
+        self,
+        ids: List[str],
+        documents: Optional[List[str]] = None,
+        metadatas: Optional[List[Dict[str, Any]]] = None,
+        embeddings: Optional[List[List[float]]] = None
+    ) -> None:
+        ...
+    
+    @abstractmethod
+    def query(
+        self,
+        query_embeddings: Optional[List[List[float]]] = None,
+        n_results: int = 10,
+        where: Optional[Dict[str, Any]] = None,
+        query_texts: Optional[List[str]] = None
+    ) -> Dict[str, Any]:
+        ...
+    
+    @abstractmethod
+    def get(
+        self,
+        limit: Optional[int] = None,
+        offset: Optional[int] = None,
+        include: Optional[List[str]] = None
+    ) -> Dict[str, Any]:
+        """Stored records in insertion order: {"ids": [...], "documents": ..., "metadatas": ...}"""
+        ...
+    
+    @abstractmethod
+    def delete(self, ids: List[str]) -> None:
+        ...
+    
+    @abstractmethod
+    def count(self) -> int:
+        ...
+
+
+class VectorBackend(ABC):
+    """Creates and opens collections; missing collections raise ValueError like Chroma"""
+    
+    name: str
+    path: str
+    
+    @abstractmethod
+    def get_or_create_collection(
+        self,
+        name: str,
+        metadata: Optional[Dict[str, Any]] = None,
+        embedding_function=None
+    ) -> VectorCollection:
+        ...
+    
+    @abstractmethod
+    def get_collection(self, name: str, embedding_function=None) -> VectorCollection:
+        ...
+    
+    @abstractmethod
+    def delete_collection(self, name: str) -> None:
+        ...
+    
+    @abstractmethod
+    def list_collections(self) -> List[str]:
+        """Names of the collections stored by the backend"""
+        ...
+    
+    def release_collection(self, collection: VectorCollection) -> None:
+        """Free the memory held for an idle collection; it is reloaded on next use"""
+    
+    def get_stats(self) -> Dict[str, Any]:
+        return {"backend": self.name, "path": self.path}
+
+
+class ChromaBackend(VectorBackend):
+    """ChromaDB PersistentClient (HNSW indexes, float32 vectors)"""
+    
+    name = "chroma"
+    
+    def __init__(self, path: str):
+        self.path = path
+        self._client = chromadb.PersistentClient(path=path)
+    
+    def get_or_create_collection(
+        self,
+        name: str,
+        metadata: Optional[Dict[str, Any]] = None,
+        embedding_function=None
+    ):
+        return self._client.get_or_create_collection(
+            name=name,
+            metadata=metadata,
+            embedding_function=embedding_function
+        )
+    
+    def get_collection(self, name: str, embedding_function=None):
+        return self._client.get_collection(name=name, embedding_function=embedding_function)
+    
+    def delete_collection(self, name: str) -> None:
+        self._client.delete_collection(name=name)
+    
+    def list_collections(self) -> List[str]:
+        return [collection.name for collection in self._client.list_collections()]
+    
+    def release_collection(self, collection) -> None:
+        """
+        Chroma 0.4 keeps every segment it has opened in memory for the life of
+        the client. Stop and forget the collection's segment instances so the
+        HNSW index can be freed; the next access rebuilds them from disk and
+        replays unpersisted writes from Chroma's embeddings queue.
+        Queries already holding an instance finish on it (reads still work).
+        """
+        manager = getattr(self._client._server, "_manager", None)
+        if not isinstance(manager, LocalSegmentManager):
+            return
+        with manager._lock:
+            segments = manager._segment_cache.get(collection.id, {}).values()
+            instances = [manager._instances.pop(segment["id"], None) for segment in segments]
+            file_handles = getattr(manager, "_vector_instances_file_handle_cache", None)
+            if file_handles is not None:
+                file_handles.cache.pop(collection.id, None)
+        for instance in instances:
+            if instance is not None:
+                instance.stop()
+
+
+# ============ Index Generations ============
+# A rebuild writes generation N+1 next to the live index and then points the
+# manifest at it. Generation 0 is the configured directory itself.
+
+def read_vector_manifest() -> Dict[str, Any]:
+    """Active index generation and rebuild checkpoint ({} before the first rebuild)"""
+    try:
+        with open(settings.vector_store_manifest_path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def write_vector_manifest(manifest: Dict[str, Any]) -> None:
+    """Replace the manifest atomically so readers never see a partial file"""
+    path = settings.vector_store_manifest_path
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def generation_path(name: str, generation: int) -> str:
+    base = settings.chroma_persist_directory if name == "chroma" else settings.mmap_index_directory
+    return base if generation == 0 else f"{base.rstrip('/')}.g{generation}"
+
+
+def active_generation(name: str) -> Tuple[int, str]:
+    """(generation, path) of the live index for a backend"""
+    manifest = read_vector_manifest()
+    if manifest.get("backend") == name and manifest.get("path"):
+        return manifest.get("generation", 0), manifest["path"]
+    return 0, generation_path(name, 0)
+
+
+def create_vector_backend(name: Optional[str] = None, path: Optional[str] = None) -> VectorBackend:
+    """
+    Backend selected by settings.vector_store_backend ("chroma" or "mmap").
+    Opens the live generation from the manifest unless `path` is given.
+    """
+    name = name or settings.vector_store_backend
+    if name not in ("chroma", "mmap"):
+        raise ValueError(f"Unknown vector store backend: {name}")
+    path = path or active_generation(name)[1]
+    if name == "chroma":
+        return ChromaBackend(path=path)
+    from app.modules.dual_rag.mmap_index import MmapVectorBackend
+    return MmapVectorBackend(
+        path=path,
+        dtype=settings.mmap_index_dtype
+    )
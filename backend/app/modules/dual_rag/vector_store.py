@@ -4,10 +4,112 @@ ChromaDB integration for semantic search
 """
 
 import os
-from typing import List, Dict, Any, Optional
-import chromadb
+import re
+import asyncio
+import hashlib
+import threading
+import zlib
+from collections import OrderedDict
+from typing import List, Dict, Any, Optional, Awaitable, Tuple
 
 from app.core.config import settings
+from app.core.executor import BoundedExecutor
+from app.modules.dual_rag.embeddings import EmbeddingService, get_embedding_service
+from app.modules.dual_rag.lexical_index import BM25Index, reciprocal_rank_fusion
+from app.modules.dual_rag.vector_backends import VectorBackend, create_vector_backend
+
+
+_COLLECTION_NAME = re.compile(r"^[a-zA-Z0-9][a-zA-Z0-9._-]{1,50}[a-zA-Z0-9]$")
+
+
+def _vector_where(where_filter: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """Chroma accepts one field per where clause; combine several with $and"""
+    if not where_filter or len(where_filter) == 1:
+        return where_filter or None
+    return {"$and": [{key: value} for key, value in where_filter.items()]}
+
+
+class StudentShardCache:
+    """
+    Maps profiles to student-context collections and keeps recently used ones open.
+    mode "none": everyone shares the "student_contexts" collection
+    mode "profile": one small collection per profile
+    mode "hash": profiles spread over a fixed number of bucket collections
+    Idle shards are evicted in LRU order and released from the backend, so
+    memory follows the number of active students rather than all of them.
+    """
+    
+    def __init__(self, mode: str = "none", buckets: int = 64, cache_size: int = 256):
+        if mode not in ("none", "profile", "hash"):
+            raise ValueError(f"Unknown student shard mode: {mode}")
+        self.mode = mode
+        self.buckets = max(1, buckets)
+        self.cache_size = max(1, cache_size)
+        self._collections: "OrderedDict[str, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._loads = 0
+        self._evictions = 0
+    
+    @property
+    def enabled(self) -> bool:
+        return self.mode != "none"
+    
+    def shard_name(self, profile_id: Optional[str]) -> str:
+        if not self.enabled or profile_id is None:
+            return "student_contexts"
+        if self.mode == "hash":
+            return f"student_contexts_b{zlib.crc32(profile_id.encode()) % self.buckets:04d}"
+        name = f"student_{profile_id}"
+        if not _COLLECTION_NAME.match(name):
+            name = f"student_{hashlib.sha1(profile_id.encode()).hexdigest()}"
+        return name
+    
+    def get(self, client, profile_id: str, embedding_function, create: bool = True):
+        """Open (or create) the profile's shard; None if missing and create is False"""
+        name = self.shard_name(profile_id)
+        with self._lock:
+            collection = self._collections.get(name)
+            if collection is not None:
+                self._collections.move_to_end(name)
+                self._hits += 1
+                return collection
+        
+        try:
+            if create:
+                collection = client.get_or_create_collection(
+                    name=name,
+                    metadata={"description": "Student-specific learning contexts", "shard_mode": self.mode},
+                    embedding_function=embedding_function
+                )
+            else:
+                collection = client.get_collection(name=name, embedding_function=embedding_function)
+        except ValueError:
+            return None  # Shard does not exist yet
+        
+        evicted = []
+        with self._lock:
+            self._collections[name] = collection
+            self._collections.move_to_end(name)
+            self._loads += 1
+            while len(self._collections) > self.cache_size:
+                evicted.append(self._collections.popitem(last=False)[1])
+                self._evictions += 1
+        for idle in evicted:
+            client.release_collection(idle)
+        return collection
+    
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "mode": self.mode,
+                "buckets": self.buckets if self.mode == "hash" else None,
+                "open_shards": len(self._collections),
+                "cache_size": self.cache_size,
+                "hits": self._hits,
+                "loads": self._loads,
+                "evictions": self._evictions
+            }
 
 
 class VectorStoreService:
@@ -15,6 +117,11 @@ class VectorStoreService:
     
     _instance = None
     _client = None
+    _executor = None
+    _embedder = None
+    _lexical = None
+    _shards = None
+    _tracked_deletes = None
     
     def __new__(cls):
         if cls._instance is None:
@@ -22,31 +129,122 @@ class VectorStoreService:
         return cls._instance
     
     def __init__(self):
-        if self._client is None:
-            # Initialize ChromaDB client with new API
-            self._client = chromadb.PersistentClient(
-                path=settings.chroma_persist_directory
-            )
-            
-            # Initialize collections
-            self._student_collection = self._client.get_or_create_collection(
-                name="student_contexts",
-                metadata={"description": "Student-specific learning contexts"}
-            )
-            
-            self._academic_collection = self._client.get_or_create_collection(
-                name="academic_documents", 
-                metadata={"description": "Verified academic materials"}
+        if self._executor is None:
+            # Chroma's client is synchronous; every call goes through this pool
+            self._executor = BoundedExecutor(
+                name="vector_store",
+                max_workers=settings.vector_store_max_workers,
+                max_pending=settings.vector_store_max_pending,
+                queue_timeout=settings.vector_store_queue_timeout
             )
+        
+        if self._embedder is None:
+            self._embedder = get_embedding_service()
+        
+        if self._lexical is None:
+            # Filled from the database on startup, then kept in sync by add/delete
+            self._lexical = BM25Index()
+        
+        if self._shards is None:
+            self._shards = self.new_shard_cache()
+        
+        if self._client is None:
+            # ChromaDB by default; settings.vector_store_backend selects another backend
+            self._client = create_vector_backend()
+            self._student_collection, self._academic_collection = self.open_collections(self._client)
+    
+    @staticmethod
+    def new_shard_cache() -> "StudentShardCache":
+        return StudentShardCache(
+            mode=settings.rag_student_shard_mode,
+            buckets=settings.rag_student_shard_buckets,
+            cache_size=settings.rag_student_shard_cache_size
+        )
+    
+    def open_collections(self, client: VectorBackend) -> Tuple[Any, Any]:
+        """(student, academic) collections of a backend, created if missing"""
+        student = client.get_or_create_collection(
+            name="student_contexts",
+            metadata={"description": "Student-specific learning contexts"},
+            embedding_function=self._embedder.function
+        )
+        academic = client.get_or_create_collection(
+            name="academic_documents",
+            metadata={"description": "Verified academic materials"},
+            embedding_function=self._embedder.function
+        )
+        return student, academic
+    
+    @property
+    def backend(self) -> VectorBackend:
+        return self._client
+    
+    def swap_backend(self, client: VectorBackend) -> None:
+        """Serve from a rebuilt backend; calls already running finish on the old one"""
+        student, academic = self.open_collections(client)
+        shards = self.new_shard_cache()
+        self._client, self._student_collection, self._academic_collection, self._shards = (
+            client, student, academic, shards
+        )
+    
+    def begin_delete_tracking(self) -> None:
+        """Record deletes so a rebuild in progress can replay them before swapping"""
+        self._tracked_deletes = []
+    
+    def end_delete_tracking(self) -> List[Tuple[str, str, Optional[str]]]:
+        """Stop tracking and return the recorded (kind, doc_id, profile_id) deletes"""
+        deletes, self._tracked_deletes = self._tracked_deletes or [], None
+        return deletes
+    
+    def _track_deletes(self, kind: str, doc_ids: List[str], profile_id: Optional[str] = None) -> None:
+        if self._tracked_deletes is not None:
+            self._tracked_deletes.extend((kind, doc_id, profile_id) for doc_id in doc_ids)
     
     @property
     def student_collection(self):
         return self._student_collection
     
+    @property
+    def student_shards(self) -> "StudentShardCache":
+        return self._shards
+    
+    def _student_collection_for(self, profile_id: Optional[str], create: bool = True):
+        """
+        Collection holding a profile's contexts (blocking; run via the executor).
+        Returns None when reading a shard that has never been written.
+        """
+        if not self._shards.enabled or profile_id is None:
+            return self._student_collection
+        return self._shards.get(self._client, profile_id, self._embedder.function, create)
+    
+    def _student_where(self, profile_id: str, filters: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        # A per-profile collection only holds that profile's contexts
+        where_filter = {} if self._shards.mode == "profile" else {"profile_id": profile_id}
+        if filters:
+            where_filter.update(filters)
+        return where_filter or None
+    
     @property
     def academic_collection(self):
         return self._academic_collection
     
+    @property
+    def embedder(self) -> EmbeddingService:
+        return self._embedder
+    
+    @property
+    def lexical_index(self) -> BM25Index:
+        return self._lexical
+    
+    @property
+    def lexical_fast_path(self) -> bool:
+        """True when the embedding executor is saturated and BM25 can answer instead"""
+        return self._embedder.executor.saturated and self._lexical.ready
+    
+    async def embed_query(self, query: str) -> List[float]:
+        """Embed a query once so it can be reused across collections"""
+        return await self._embedder.embed_query(query)
+    
     async def add_student_context(
         self,
         doc_id: str,
@@ -54,13 +252,50 @@ class VectorStoreService:
         metadata: Dict[str, Any]
     ) -> str:
         """Add student context to vector store"""
-        self._student_collection.add(
-            ids=[doc_id],
-            documents=[content],
-            metadatas=[metadata]
+        await self._executor.run(
+            self._add_student_batch,
+            metadata.get("profile_id"),
+            [doc_id],
+            [content],
+            [metadata]
         )
         return doc_id
     
+    async def add_student_contexts(
+        self,
+        doc_ids: List[str],
+        contents: List[str],
+        metadatas: List[Dict[str, Any]]
+    ) -> List[str]:
+        """Add several student contexts with a single Chroma add per shard"""
+        if not doc_ids:
+            return []
+        groups: Dict[Optional[str], Tuple[List[str], List[str], List[Dict[str, Any]]]] = {}
+        for doc_id, content, metadata in zip(doc_ids, contents, metadatas):
+            key = self._shards.shard_name(metadata.get("profile_id"))
+            ids, docs, metas = groups.setdefault(key, ([], [], []))
+            ids.append(doc_id)
+            docs.append(content)
+            metas.append(metadata)
+        for ids, docs, metas in groups.values():
+            await self._executor.run(
+                self._add_student_batch, metas[0].get("profile_id"), ids, docs, metas
+            )
+        return doc_ids
+    
+    def _add_student_batch(
+        self,
+        profile_id: Optional[str],
+        doc_ids: List[str],
+        contents: List[str],
+        metadatas: List[Dict[str, Any]]
+    ) -> None:
+        self._student_collection_for(profile_id).add(
+            ids=doc_ids,
+            documents=contents,
+            metadatas=metadatas
+        )
+    
     async def add_academic_document(
         self,
         doc_id: str,
@@ -68,49 +303,282 @@ class VectorStoreService:
         metadata: Dict[str, Any]
     ) -> str:
         """Add academic document to vector store"""
-        self._academic_collection.add(
+        embeddings = await self._embedder.embed_documents([content])
+        await self._executor.run(
+            self._academic_collection.add,
             ids=[doc_id],
+            embeddings=embeddings,
             documents=[content],
             metadatas=[metadata]
         )
+        self._lexical.add(doc_id, content, metadata)
         return doc_id
     
+    async def add_academic_documents(
+        self,
+        doc_ids: List[str],
+        contents: List[str],
+        metadatas: List[Dict[str, Any]],
+        batch_size: int = 64
+    ) -> Dict[str, str]:
+        """
+        Add many academic documents, embedding and writing one batch at a time.
+        Embedding of the next batch overlaps the Chroma write of the current one.
+        A failing batch is retried item by item so one bad document does not
+        sink its neighbours. Returns {doc_id: error} for the items that failed.
+        """
+        batches = [
+            (doc_ids[i:i + batch_size], contents[i:i + batch_size], metadatas[i:i + batch_size])
+            for i in range(0, len(doc_ids), max(1, batch_size))
+        ]
+        failures: Dict[str, str] = {}
+        if not batches:
+            return failures
+        
+        next_embeddings = asyncio.ensure_future(self._embed_batch(batches[0][1]))
+        for index, (ids, docs, metas) in enumerate(batches):
+            embeddings = await next_embeddings
+            if index + 1 < len(batches):
+                next_embeddings = asyncio.ensure_future(self._embed_batch(batches[index + 1][1]))
+            
+            try:
+                if isinstance(embeddings, Exception):
+                    raise embeddings
+                await self._executor.run(
+                    self._academic_collection.add,
+                    ids=ids,
+                    embeddings=embeddings,
+                    documents=docs,
+                    metadatas=metas
+                )
+                self._lexical.add_many(zip(ids, docs, metas))
+            except Exception:
+                failures.update(await self._add_academic_individually(ids, docs, metas))
+        
+        return failures
+    
+    async def _embed_batch(self, texts: List[str]):
+        """Embed a batch, returning the exception instead of raising it"""
+        try:
+            return await self._embedder.embed_documents(texts)
+        except Exception as e:
+            return e
+    
+    async def _add_academic_individually(
+        self,
+        doc_ids: List[str],
+        contents: List[str],
+        metadatas: List[Dict[str, Any]]
+    ) -> Dict[str, str]:
+        """Fallback for a failed batch: add items one at a time and collect errors"""
+        failures = {}
+        for doc_id, content, metadata in zip(doc_ids, contents, metadatas):
+            try:
+                await self.add_academic_document(doc_id, content, metadata)
+            except Exception as e:
+                failures[doc_id] = str(e)
+        return failures
+    
     async def search_student_contexts(
         self,
         query: str,
         profile_id: str,
         n_results: int = 5,
-        filters: Optional[Dict[str, Any]] = None
+        filters: Optional[Dict[str, Any]] = None,
+        query_embedding: Optional[List[float]] = None
     ) -> List[Dict[str, Any]]:
         """Search student contexts with optional filters"""
-        where_filter = {"profile_id": profile_id}
-        if filters:
-            where_filter.update(filters)
+        where_filter = self._student_where(profile_id, filters)
         
-        results = self._student_collection.query(
-            query_texts=[query],
-            n_results=n_results,
-            where=where_filter
+        if query_embedding is None:
+            query_embedding = await self.embed_query(query)
+        
+        results = await self._executor.run(
+            self._query_student_shard,
+            profile_id,
+            [query_embedding],
+            n_results,
+            where_filter
         )
         
         return self._format_results(results)
     
+    def _query_student_shard(
+        self,
+        profile_id: str,
+        query_embeddings: List[List[float]],
+        n_results: int,
+        where_filter: Optional[Dict[str, Any]]
+    ) -> Optional[Dict]:
+        collection = self._student_collection_for(profile_id, create=False)
+        if collection is None:
+            return None
+        if self._shards.mode == "profile":
+            # Small shards can hold fewer items than requested
+            n_results = min(n_results, collection.count())
+            if not n_results:
+                return None
+        return collection.query(
+            query_embeddings=query_embeddings,
+            n_results=n_results,
+            where=_vector_where(where_filter)
+        )
+    
     async def search_academic_documents(
         self,
         query: str,
         n_results: int = 5,
-        filters: Optional[Dict[str, Any]] = None
+        filters: Optional[Dict[str, Any]] = None,
+        query_embedding: Optional[List[float]] = None,
+        lexical_weight: Optional[float] = None
     ) -> List[Dict[str, Any]]:
-        """Search academic documents with optional filters"""
+        """
+        Search academic documents with optional filters.
+        Dense and BM25 results are fused by weighted reciprocal rank fusion;
+        lexical_weight 0 is pure vector search and 1 is pure BM25.
+        """
         where_filter = filters if filters else None
         
-        results = self._academic_collection.query(
-            query_texts=[query],
-            n_results=n_results,
-            where=where_filter
+        if lexical_weight is None:
+            lexical_weight = settings.rag_lexical_weight
+        if not self._lexical.ready:
+            lexical_weight = 0.0
+        elif query_embedding is None and self.lexical_fast_path:
+            # Embedding is backed up; answer from the inverted index alone
+            lexical_weight = 1.0
+        
+        if lexical_weight >= 1.0:
+            return self._lexical_only(query, n_results, where_filter)
+        
+        if query_embedding is None:
+            query_embedding = await self.embed_query(query)
+        
+        # Fetch deeper candidate lists when fusing so both rankings contribute
+        n_candidates = n_results * 2 if lexical_weight > 0 else n_results
+        results = await self._executor.run(
+            self._academic_collection.query,
+            query_embeddings=[query_embedding],
+            n_results=n_candidates,
+            where=_vector_where(where_filter)
         )
+        vector_results = self._format_results(results)
         
-        return self._format_results(results)
+        if lexical_weight <= 0:
+            return vector_results
+        
+        return reciprocal_rank_fusion(
+            vector_results,
+            self._lexical.search(query, n_candidates, where_filter),
+            lexical_weight,
+            n_results,
+            k=settings.rag_hybrid_rrf_k
+        )
+    
+    def _lexical_only(
+        self,
+        query: str,
+        n_results: int,
+        where_filter: Optional[Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
+        """
+        BM25 results scored like fused ones (top hit 1.0), since raw BM25 is
+        unbounded and would outrank cosine scores; the raw value stays in "lexical_score"
+        """
+        return reciprocal_rank_fusion(
+            [],
+            self._lexical.search(query, n_results, where_filter),
+            1.0,
+            n_results,
+            k=settings.rag_hybrid_rrf_k
+        )
+    
+    async def batch_search(
+        self,
+        queries: List[str],
+        n_results: int = 5,
+        filters: Optional[List[Optional[Dict[str, Any]]]] = None,
+        profile_id: Optional[str] = None,
+        include_student: bool = False,
+        include_academic: bool = True,
+        lexical_weight: Optional[float] = None
+    ) -> List[Dict[str, List[Dict[str, Any]]]]:
+        """
+        Search several queries at once. All queries are embedded in one model
+        call and each collection gets one multi-query request per distinct
+        filter. Returns {"student": [...], "academic": [...]} per query, in order;
+        student contexts are only searched when a profile_id is given.
+        """
+        if not queries:
+            return []
+        filters = filters or [None] * len(queries)
+        include_student = include_student and profile_id is not None
+        
+        if lexical_weight is None:
+            lexical_weight = settings.rag_lexical_weight
+        if not self._lexical.ready:
+            lexical_weight = 0.0
+        elif not include_student and self.lexical_fast_path:
+            lexical_weight = 1.0
+        dense_academic = include_academic and lexical_weight < 1.0
+        
+        embeddings = None
+        if include_student or dense_academic:
+            embeddings = await self._embedder.embed_queries(queries)
+        
+        # Chroma applies one where clause per request, so queries sharing a filter go together
+        groups: Dict[Tuple, List[int]] = {}
+        for i, query_filter in enumerate(filters):
+            key = tuple(sorted((query_filter or {}).items()))
+            groups.setdefault(key, []).append(i)
+        
+        n_candidates = n_results * 2 if 0 < lexical_weight < 1 else n_results
+        group_indices = list(groups.values())
+        
+        # Every group's requests go out together rather than one group at a time
+        pending = {}
+        for group, indices in enumerate(group_indices):
+            where_filter = filters[indices[0]] or None
+            vectors = [embeddings[i] for i in indices] if embeddings else None
+            if include_student:
+                pending[(group, "student")] = self._executor.run(
+                    self._query_student_shard,
+                    profile_id,
+                    vectors,
+                    n_results,
+                    self._student_where(profile_id, where_filter)
+                )
+            if dense_academic:
+                pending[(group, "academic")] = self._executor.run(
+                    self._academic_collection.query,
+                    query_embeddings=vectors,
+                    n_results=n_candidates,
+                    where=_vector_where(where_filter)
+                )
+        raw = dict(zip(pending, await asyncio.gather(*pending.values())))
+        
+        results = [{"student": [], "academic": []} for _ in queries]
+        for group, indices in enumerate(group_indices):
+            where_filter = filters[indices[0]] or None
+            for position, i in enumerate(indices):
+                if include_student:
+                    results[i]["student"] = self._format_results(raw[(group, "student")], position)
+                if not include_academic:
+                    continue
+                if lexical_weight >= 1.0:
+                    results[i]["academic"] = self._lexical_only(queries[i], n_results, where_filter)
+                    continue
+                vector_results = self._format_results(raw[(group, "academic")], position)
+                if lexical_weight <= 0:
+                    results[i]["academic"] = vector_results
+                else:
+                    results[i]["academic"] = reciprocal_rank_fusion(
+                        vector_results,
+                        self._lexical.search(queries[i], n_candidates, where_filter),
+                        lexical_weight,
+                        n_results,
+                        k=settings.rag_hybrid_rrf_k
+                    )
+        return results
     
     async def dual_search(
         self,
@@ -119,32 +587,91 @@ class VectorStoreService:
         n_student: int = 5,
         n_academic: int = 5,
         student_filters: Optional[Dict[str, Any]] = None,
-        academic_filters: Optional[Dict[str, Any]] = None
-    ) -> Dict[str, List[Dict[str, Any]]]:
-        """Perform dual search across both collections"""
-        student_results = await self.search_student_contexts(
-            query, profile_id, n_student, student_filters
-        )
-        academic_results = await self.search_academic_documents(
-            query, n_academic, academic_filters
-        )
+        academic_filters: Optional[Dict[str, Any]] = None,
+        include_student: bool = True,
+        include_academic: bool = True,
+        student_timeout: Optional[float] = None,
+        academic_timeout: Optional[float] = None,
+        query_embedding: Optional[List[float]] = None,
+        lexical_weight: Optional[float] = None
+    ) -> Dict[str, Any]:
+        """
+        Perform dual search across both collections concurrently.
+        The query is embedded once and the vector shared by both searches.
+        A source that fails or exceeds its timeout contributes no results and
+        is listed in "incomplete_sources" so callers can answer with the other.
+        When embedding is saturated and no vector was supplied, academic results
+        come from the lexical index alone and student search is skipped.
+        """
+        fast_path = query_embedding is None and self.lexical_fast_path
+        if query_embedding is None and not fast_path and (include_student or include_academic):
+            query_embedding = await self.embed_query(query)
+        
+        searches = []
+        if include_student and fast_path:
+            searches.append(self._skipped_search("student", "saturated"))
+        elif include_student:
+            searches.append(self._timed_search(
+                "student",
+                self.search_student_contexts(
+                    query, profile_id, n_student, student_filters, query_embedding
+                ),
+                student_timeout
+            ))
+        if include_academic:
+            searches.append(self._timed_search(
+                "academic",
+                self.search_academic_documents(
+                    query, n_academic, academic_filters, query_embedding, lexical_weight
+                ),
+                academic_timeout
+            ))
+        
+        outcomes = dict(await asyncio.gather(*searches))
         
         return {
-            "student_contexts": student_results,
-            "academic_documents": academic_results
+            "student_contexts": outcomes.get("student", (None, []))[1],
+            "academic_documents": outcomes.get("academic", (None, []))[1],
+            "incomplete_sources": [
+                source for source, (error, _) in outcomes.items() if error
+            ]
         }
     
-    def _format_results(self, results: Dict) -> List[Dict[str, Any]]:
-        """Format ChromaDB results into a cleaner structure"""
+    async def _skipped_search(
+        self,
+        source: str,
+        reason: str
+    ) -> Tuple[str, Tuple[Optional[str], List[Dict[str, Any]]]]:
+        return source, (reason, [])
+    
+    async def _timed_search(
+        self,
+        source: str,
+        search: Awaitable[List[Dict[str, Any]]],
+        timeout: Optional[float]
+    ) -> Tuple[str, Tuple[Optional[str], List[Dict[str, Any]]]]:
+        """Await one side of a dual search, converting timeouts/errors into empty results"""
+        try:
+            results = await asyncio.wait_for(search, timeout=timeout)
+            return source, (None, results)
+        except asyncio.TimeoutError:
+            print(f"{source.capitalize()} search timed out after {timeout}s")
+            return source, ("timeout", [])
+        except Exception as e:
+            print(f"{source.capitalize()} search error: {e}")
+            return source, ("error", [])
+    
+    def _format_results(self, results: Dict, index: int = 0) -> List[Dict[str, Any]]:
+        """Format ChromaDB results (for the query at `index`) into a cleaner structure"""
         formatted = []
         
-        if not results or not results.get('ids') or not results['ids'][0]:
+        if not results or len(results.get('ids') or []) <= index or not results['ids'][index]:
             return formatted
         
-        ids = results['ids'][0]
-        documents = results['documents'][0] if results.get('documents') else []
-        metadatas = results['metadatas'][0] if results.get('metadatas') else []
-        distances = results['distances'][0] if results.get('distances') else []
+        ids = results['ids'][index]
+        documents = results['documents'][index] if results.get('documents') else []
+        metadatas = results['metadatas'][index] if results.get('metadatas') else []
+        distances = results['distances'][index] if results.get('distances') else []
         
         for i, doc_id in enumerate(ids):
             formatted.append({
@@ -156,28 +683,69 @@ class VectorStoreService:
         
         return formatted
     
-    async def delete_student_context(self, doc_id: str) -> bool:
-        """Delete a student context from vector store"""
+    async def delete_student_context(self, doc_id: str, profile_id: Optional[str] = None) -> bool:
+        """Delete a student context from vector store (profile_id locates its shard)"""
+        self._track_deletes("student", [doc_id], profile_id)
+        try:
+            await self._executor.run(self._delete_student, [doc_id], profile_id)
+            return True
+        except Exception:
+            return False
+    
+    async def delete_student_contexts(self, doc_ids: List[str], profile_id: Optional[str] = None) -> bool:
+        """Delete several student contexts of one profile in one call"""
+        if not doc_ids:
+            return True
+        self._track_deletes("student", doc_ids, profile_id)
         try:
-            self._student_collection.delete(ids=[doc_id])
+            await self._executor.run(self._delete_student, doc_ids, profile_id)
             return True
         except Exception:
             return False
     
+    def _delete_student(self, doc_ids: List[str], profile_id: Optional[str]) -> None:
+        collection = self._student_collection_for(profile_id, create=False)
+        if collection is not None:
+            collection.delete(ids=doc_ids)
+    
     async def delete_academic_document(self, doc_id: str) -> bool:
         """Delete an academic document from vector store"""
+        self._track_deletes("academic", [doc_id])
         try:
-            self._academic_collection.delete(ids=[doc_id])
+            await self._executor.run(self._academic_collection.delete, ids=[doc_id])
+            self._lexical.remove(doc_id)
             return True
         except Exception:
             return False
     
-    async def get_collection_stats(self) -> Dict[str, int]:
+    async def delete_academic_documents(self, doc_ids: List[str]) -> bool:
+        """Delete several academic documents in one call"""
+        if not doc_ids:
+            return True
+        self._track_deletes("academic", doc_ids)
+        try:
+            await self._executor.run(self._academic_collection.delete, ids=doc_ids)
+            self._lexical.remove_many(doc_ids)
+            return True
+        except Exception:
+            return False
+    
+    async def get_collection_stats(self) -> Dict[str, Any]:
         """Get stats about the collections"""
         return {
-            "student_contexts_count": self._student_collection.count(),
-            "academic_documents_count": self._academic_collection.count()
+            "student_contexts_count": await self._executor.run(self._student_collection.count),
+            "academic_documents_count": await self._executor.run(self._academic_collection.count),
+            "executor": self._executor.get_stats(),
+            "embedding": self._embedder.get_stats(),
+            "lexical": self._lexical.get_stats(),
+            "student_shards": self._shards.get_stats(),
+            "backend": self._client.get_stats()
         }
+    
+    def shutdown(self) -> None:
+        """Release executor threads (called on application shutdown)"""
+        self._executor.shutdown(wait=True)
+        self._embedder.shutdown()
 
 
 # Singleton instance
@@ -0,0 +1,279 @@
+"""
+SkillTwin - Interaction Write Buffer
+Write-behind queue for chat history and interaction contexts produced by Dual RAG queries
+"""
+
+import asyncio
+import time
+from typing import List, Dict, Any, Optional, Tuple
+
+from sqlalchemy import insert, update
+from sqlalchemy.exc import OperationalError
+
+from app.core.config import settings
+from app.core.database import async_session_maker
+from app.modules.dual_rag.models import StudentContext, ChatHistory
+from app.modules.dual_rag.vector_store import VectorStoreService, get_vector_store
+
+
+class InteractionWriteBuffer:
+    """
+    Collects chat messages and student contexts and persists them in batches.
+    Each flush does one bulk INSERT per table in a single transaction, then
+    one Chroma add for the queued contexts, and only then marks the contexts
+    as embedded. A flush runs when `max_batch` rows are queued or every
+    `flush_interval` seconds, whichever comes first.
+    Transient database errors (e.g. "database is locked") are retried with
+    backoff; if they persist, the rows go back on the queue for the next flush.
+    Each queue keeps at most `max_pending` rows, so an outage drops the oldest
+    rows (counted in rows_dropped) instead of growing memory without bound.
+    """
+    
+    def __init__(
+        self,
+        max_batch: int = 200,
+        flush_interval: float = 1.0,
+        enabled: bool = True,
+        max_retries: int = 3,
+        retry_backoff: float = 0.2,
+        max_pending: int = 10000,
+        vector_store: Optional[VectorStoreService] = None
+    ):
+        self.max_batch = max(1, max_batch)
+        self.flush_interval = flush_interval
+        self.enabled = enabled
+        self.max_retries = max(0, max_retries)
+        self.retry_backoff = retry_backoff
+        self.max_pending = max(self.max_batch, max_pending)
+        self._vector_store = vector_store
+        
+        self._chat_rows: List[Dict[str, Any]] = []
+        self._context_rows: List[Dict[str, Any]] = []
+        self._context_documents: List[str] = []
+        self._context_metadatas: List[Dict[str, Any]] = []
+        
+        self._task: Optional[asyncio.Task] = None
+        self._wake: Optional[asyncio.Event] = None
+        self._flush_lock: Optional[asyncio.Lock] = None
+        self._closing = False
+        
+        # Metrics
+        self._flushes = 0
+        self._rows_written = 0
+        self._rows_dropped = 0
+        self._rows_requeued = 0
+        self._retries = 0
+        self._vector_failures = 0
+        self._total_flush_time = 0.0
+    
+    @property
+    def vector_store(self) -> VectorStoreService:
+        return self._vector_store or get_vector_store()
+    
+    @property
+    def running(self) -> bool:
+        """True when writes may be queued instead of persisted inline"""
+        return self.enabled and self._task is not None and not self._closing
+    
+    @property
+    def pending(self) -> int:
+        return len(self._chat_rows) + len(self._context_rows)
+    
+    def start(self) -> None:
+        """Start the background flusher (called from the app lifespan)"""
+        if not self.enabled or self._task is not None:
+            return
+        self._closing = False
+        self._wake = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._task = asyncio.create_task(self._run(), name="interaction-write-buffer")
+    
+    async def stop(self) -> None:
+        """Stop the flusher and persist everything still queued"""
+        if self._task is None:
+            return
+        self._closing = True
+        self._wake.set()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+        while self.pending:
+            if not await self.flush():
+                # The database is still failing; do not spin on shutdown
+                print(f"Write buffer: {self.pending} queued rows could not be persisted on shutdown")
+                self._rows_dropped += self.pending
+                self._clear()
+                break
+    
+    def add_chat_message(self, row: Dict[str, Any]) -> None:
+        """Queue a ChatHistory row"""
+        self._chat_rows.append(row)
+        self._trim()
+        self._maybe_wake()
+    
+    def add_student_context(self, row: Dict[str, Any], metadata: Dict[str, Any]) -> None:
+        """Queue a StudentContext row together with its vector store metadata"""
+        self._context_rows.append(row)
+        self._context_documents.append(row["content"])
+        self._context_metadatas.append(metadata)
+        self._trim()
+        self._maybe_wake()
+    
+    def _take(self) -> Tuple[List, List, List, List]:
+        """Detach everything queued so far"""
+        batch = (self._chat_rows, self._context_rows, self._context_documents, self._context_metadatas)
+        self._clear()
+        return batch
+    
+    def _clear(self) -> None:
+        self._chat_rows, self._context_rows = [], []
+        self._context_documents, self._context_metadatas = [], []
+    
+    def _requeue(self, chat_rows, context_rows, documents, metadatas) -> None:
+        """Put a failed batch back in front of rows queued since it was taken"""
+        self._chat_rows[:0] = chat_rows
+        self._context_rows[:0] = context_rows
+        self._context_documents[:0] = documents
+        self._context_metadatas[:0] = metadatas
+        self._rows_requeued += len(chat_rows) + len(context_rows)
+        dropped = self._trim()
+        if dropped:
+            print(f"Write buffer full ({self.max_pending} rows per queue), dropped the {dropped} oldest rows")
+    
+    def _trim(self) -> int:
+        """Drop the oldest rows of a queue holding more than max_pending; returns how many"""
+        chat_excess = len(self._chat_rows) - self.max_pending
+        context_excess = len(self._context_rows) - self.max_pending
+        if chat_excess > 0:
+            del self._chat_rows[:chat_excess]
+        if context_excess > 0:
+            del self._context_rows[:context_excess]
+            del self._context_documents[:context_excess]
+            del self._context_metadatas[:context_excess]
+        dropped = max(0, chat_excess) + max(0, context_excess)
+        self._rows_dropped += dropped
+        return dropped
+    
+    async def _write(self, statements) -> None:
+        """Run (statement, params) pairs in one transaction, retrying transient errors"""
+        for attempt in range(self.max_retries + 1):
+            try:
+                async with async_session_maker() as session:
+                    for statement, params in statements:
+                        await session.execute(statement, params)
+                    await session.commit()
+                return
+            except OperationalError:
+                if attempt == self.max_retries:
+                    raise
+                self._retries += 1
+                await asyncio.sleep(self.retry_backoff * (2 ** attempt))
+    
+    def _maybe_wake(self) -> None:
+        if self._wake is not None and self.pending >= self.max_batch:
+            self._wake.set()
+    
+    async def _run(self) -> None:
+        while not self._closing:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            if self.pending:
+                await self.flush()
+    
+    async def flush(self) -> int:
+        """Write queued rows; returns the number of rows persisted"""
+        async with self._flush_lock or asyncio.Lock():
+            chat_rows, context_rows, documents, metadatas = self._take()
+            if not chat_rows and not context_rows:
+                return 0
+            
+            started = time.perf_counter()
+            try:
+                return await self._flush_batch(chat_rows, context_rows, documents, metadatas)
+            finally:
+                self._flushes += 1
+                self._total_flush_time += time.perf_counter() - started
+    
+    async def _flush_batch(self, chat_rows, context_rows, documents, metadatas) -> int:
+        # SQL first: vectors are only added for rows that exist, so a failed
+        # insert cannot leave orphaned vectors behind
+        statements = []
+        if chat_rows:
+            statements.append((insert(ChatHistory), chat_rows))
+        if context_rows:
+            statements.append((insert(StudentContext), [{**row, "embedding_id": None} for row in context_rows]))
+        written = len(chat_rows) + len(context_rows)
+        try:
+            await self._write(statements)
+        except OperationalError as e:
+            # Still locked or unreachable after retries: try again next flush
+            self._requeue(chat_rows, context_rows, documents, metadatas)
+            print(f"Write buffer database error, {written} rows re-queued: {e}")
+            return 0
+        except Exception as e:
+            # Not transient (e.g. a constraint violation); retrying cannot help
+            self._rows_dropped += written
+            print(f"Write buffer database error, {written} rows dropped: {e}")
+            return 0
+        self._rows_written += written
+        
+        if context_rows:
+            ids = [row["id"] for row in context_rows]
+            try:
+                await self.vector_store.add_student_contexts(
+                    doc_ids=ids,
+                    contents=documents,
+                    metadatas=metadatas
+                )
+            except Exception as e:
+                # Keep the SQL rows; they are simply not retrievable by similarity until a reindex
+                self._vector_failures += 1
+                print(f"Write buffer vector store error: {e}")
+                return written
+            try:
+                await self._write([(
+                    update(StudentContext)
+                    .where(StudentContext.id.in_(ids))
+                    .values(embedding_id=StudentContext.id),
+                    None
+                )])
+            except Exception as e:
+                print(f"Write buffer could not mark {len(ids)} contexts as embedded: {e}")
+        
+        return written
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Queue depth and flush counters"""
+        return {
+            "enabled": self.enabled,
+            "running": self.running,
+            "pending": self.pending,
+            "max_pending": self.max_pending,
+            "max_batch": self.max_batch,
+            "flush_interval": self.flush_interval,
+            "flushes": self._flushes,
+            "rows_written": self._rows_written,
+            "rows_dropped": self._rows_dropped,
+            "rows_requeued": self._rows_requeued,
+            "retries": self._retries,
+            "vector_failures": self._vector_failures,
+            "avg_flush_ms": round(self._total_flush_time / self._flushes * 1000, 1) if self._flushes else 0.0
+        }
+
+
+# Singleton instance
+interaction_buffer = InteractionWriteBuffer(
+    max_batch=settings.rag_write_buffer_max_batch,
+    flush_interval=settings.rag_write_buffer_flush_interval,
+    enabled=settings.rag_write_buffer_enabled,
+    max_retries=settings.rag_write_buffer_max_retries,
+    retry_backoff=settings.rag_write_buffer_retry_backoff,
+    max_pending=settings.rag_write_buffer_max_pending
+)
+
+
+def get_interaction_buffer() -> InteractionWriteBuffer:
+    """Dependency for getting the interaction write buffer instance"""
+    return interaction_buffer
@@ -5,7 +5,8 @@ Section 3.1: Persistent representation of learner's evolving cognitive state
 
 from datetime import datetime
 from typing import Optional, List
-from sqlalchemy import String, DateTime, Float, Integer, ForeignKey, JSON, Text, Enum
+from sqlalchemy import String, DateTime, Float, Integer, ForeignKey, JSON, Text, Enum, Index
+from sqlalchemy import event, select, func, case
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from app.core.database import Base
 import enum
@@ -120,6 +121,10 @@ class ConceptMastery(Base):
     Links LTP to specific concepts with mastery metrics
     """
     __tablename__ = "concept_masteries"
+    __table_args__ = (
+        # One row per learner and concept; mastery updates upsert against it
+        Index("uq_concept_mastery_profile_concept", "profile_id", "concept_id", unique=True),
+    )
     
     id: Mapped[str] = mapped_column(String(36), primary_key=True)
     profile_id: Mapped[str] = mapped_column(String(36), ForeignKey("learning_twin_profiles.id"))
@@ -150,6 +155,79 @@ class ConceptMastery(Base):
     concept: Mapped["Concept"] = relationship("Concept", back_populates="masteries")
 
 
+def _merge_duplicate_masteries(index, connection, **kw) -> None:
+    """
+    Databases created before the unique index can hold several rows for one
+    (profile, concept), left by concurrent answers. Merge each group into its
+    most recently practiced row so the index can be created: history counters
+    are summed, the latest score, level and SM-2 schedule are kept, and the
+    profile counters that were bumped once per duplicate are corrected.
+    """
+    table = ConceptMastery.__table__
+    profiles = LearningTwinProfile.__table__
+    groups = connection.execute(
+        select(table.c.profile_id, table.c.concept_id)
+        .group_by(table.c.profile_id, table.c.concept_id)
+        .having(func.count() > 1)
+    ).all()
+    
+    removed = 0
+    for profile_id, concept_id in groups:
+        rows = connection.execute(
+            select(table).where(
+                (table.c.profile_id == profile_id) & (table.c.concept_id == concept_id)
+            )
+        ).mappings().all()
+        rows = sorted(
+            rows,
+            key=lambda row: (row["last_practiced_at"] or datetime.min, row["first_seen_at"] or datetime.min),
+            reverse=True
+        )
+        keeper, duplicates = rows[0], rows[1:]
+        first_seen = [row["first_seen_at"] for row in rows if row["first_seen_at"] is not None]
+        mastered = [row["mastered_at"] for row in rows if row["mastered_at"] is not None]
+        
+        connection.execute(
+            table.update()
+            .where(table.c.id == keeper["id"])
+            .values(
+                attempts_count=sum(row["attempts_count"] or 0 for row in rows),
+                correct_count=sum(row["correct_count"] or 0 for row in rows),
+                time_spent_minutes=sum(row["time_spent_minutes"] or 0 for row in rows),
+                first_seen_at=min(first_seen) if first_seen else None,
+                mastered_at=min(mastered) if mastered else None
+            )
+        )
+        connection.execute(table.delete().where(table.c.id.in_([row["id"] for row in duplicates])))
+        
+        extra_attempted = len(duplicates)
+        extra_mastered = max(0, len(mastered) - 1)
+        attempted, mastered_total = profiles.c.total_concepts_attempted, profiles.c.total_concepts_mastered
+        connection.execute(
+            profiles.update()
+            .where(profiles.c.id == profile_id)
+            .values(
+                total_concepts_attempted=case(
+                    (attempted < extra_attempted, 0), else_=attempted - extra_attempted
+                ),
+                total_concepts_mastered=case(
+                    (mastered_total < extra_mastered, 0), else_=mastered_total - extra_mastered
+                )
+            )
+        )
+        removed += len(duplicates)
+    
+    if removed:
+        print(f"🔧 Merged {removed} duplicate concept mastery rows in {len(groups)} groups")
+
+
+event.listen(
+    next(index for index in ConceptMastery.__table__.indexes if index.name == "uq_concept_mastery_profile_concept"),
+    "before_create",
+    _merge_duplicate_masteries
+)
+
+
 class Misconception(Base):
     """
     Tracks identified misconceptions for targeted correction
@@ -17,6 +17,8 @@ from app.modules.ltp.schemas import (
     ConceptResponse,
     ConceptMasteryResponse,
     ConceptMasteryUpdate,
+    ConceptMasteryBatchUpdate,
+    ConceptMasteryBatchResponse,
     MisconceptionCreate,
     MisconceptionResponse,
     MisconceptionUpdate,
@@ -64,12 +66,13 @@ async def get_profile_by_user(user_id: str, db: AsyncSession = Depends(get_db)):
     # Get additional data
     masteries = await service.get_profile_masteries(profile.id)
     misconceptions = await service.get_active_misconceptions(profile.id)
+    sessions = await service.get_recent_sessions(profile.id, limit=10)
     
     return LTPDetailedResponse(
-        **profile.__dict__,
+        **LTPResponse.model_validate(profile).model_dump(),
         concept_masteries=masteries[:20],  # Limit for response size
         recent_misconceptions=misconceptions[:10],
-        recent_sessions=profile.learning_sessions[-10:] if profile.learning_sessions else []
+        recent_sessions=sessions
     )
 
 
@@ -180,6 +183,19 @@ async def update_concept_mastery(
     return mastery
 
 
+@router.post("/masteries/batch", response_model=ConceptMasteryBatchResponse)
+async def update_concept_masteries(
+    batch: ConceptMasteryBatchUpdate,
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Apply many quiz results at once (end of quiz, offline sync), for one or
+    more profiles. Results for unknown profiles are skipped and reported.
+    """
+    service = LTPService(db)
+    return await service.update_concept_masteries(batch.results)
+
+
 @router.get("/profiles/{profile_id}/due-for-review", response_model=List[ConceptMasteryResponse])
 async def get_due_for_review(
     profile_id: str,
@@ -0,0 +1,216 @@
+"""
+SkillTwin - Spaced Repetition Scheduler
+Vectorized SM-2 scheduling and cohort-wide review re-planning
+"""
+
+import time
+from datetime import datetime
+from typing import List, Dict, Any, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import select, bindparam, case
+
+from app.core.config import settings
+from app.core.database import async_session_maker, floor_int
+from app.modules.ltp.models import ConceptMastery
+
+# SM-2 fixes the first two intervals; later ones grow by the ease factor
+_FIRST_INTERVAL = 1
+_SECOND_INTERVAL = 6
+_EASE_BONUS = 0.1  # Added to the ease factor after a correct answer
+_EASE_PENALTY = 0.2  # Subtracted after a wrong one
+
+
+class SM2Scheduler:
+    """
+    SM-2 over whole arrays of mastery rows. `review` applies one answer per
+    row, `review_values` is the same step as SQL expressions for updating a
+    single row in place, and `replan` recomputes schedules without an
+    answer, e.g. after the ease bounds have been tuned.
+    """
+    
+    def __init__(
+        self,
+        min_ease: float = 1.3,
+        max_ease: float = 2.5,
+        chunk_size: int = 10000
+    ):
+        self.min_ease = min_ease
+        self.max_ease = max_ease
+        self.chunk_size = max(1, chunk_size)
+    
+    def review(
+        self,
+        intervals: np.ndarray,
+        eases: np.ndarray,
+        correct: np.ndarray
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """New (interval_days, ease_factor) after one answer per row"""
+        intervals = np.asarray(intervals, dtype=np.int64)
+        eases = np.asarray(eases, dtype=np.float64)
+        correct = np.asarray(correct, dtype=bool)
+        
+        grown = np.where(
+            intervals == _FIRST_INTERVAL,
+            _SECOND_INTERVAL,
+            (intervals * eases).astype(np.int64)
+        )
+        new_intervals = np.where(correct, grown, _FIRST_INTERVAL)
+        new_eases = np.where(
+            correct,
+            np.minimum(self.max_ease, eases + _EASE_BONUS),
+            np.maximum(self.min_ease, eases - _EASE_PENALTY)
+        )
+        return new_intervals, new_eases
+    
+    def review_values(self, correct: bool) -> Dict[str, Any]:
+        """`review` for one answer as ConceptMastery UPDATE values computed in SQL"""
+        interval = ConceptMastery.review_interval_days
+        ease = ConceptMastery.ease_factor
+        if correct:
+            return {
+                "review_interval_days": case(
+                    (interval == _FIRST_INTERVAL, _SECOND_INTERVAL),
+                    else_=floor_int(interval * ease)
+                ),
+                "ease_factor": case(
+                    (ease + _EASE_BONUS > self.max_ease, self.max_ease),
+                    else_=ease + _EASE_BONUS
+                )
+            }
+        return {
+            "review_interval_days": _FIRST_INTERVAL,
+            "ease_factor": case(
+                (ease - _EASE_PENALTY < self.min_ease, self.min_ease),
+                else_=ease - _EASE_PENALTY
+            )
+        }
+    
+    def replan(
+        self,
+        intervals: np.ndarray,
+        eases: np.ndarray,
+        anchors: np.ndarray,
+        ease_scale: float = 1.0
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Rescale ease factors (clipped to the configured bounds) and stretch the
+        grown intervals by the same ratio. Returns (intervals, eases,
+        next_review_at) with next_review_at = anchor + interval as datetime64[s].
+        """
+        intervals = np.asarray(intervals, dtype=np.int64)
+        eases = np.asarray(eases, dtype=np.float64)
+        
+        new_eases = np.clip(eases * ease_scale, self.min_ease, self.max_ease)
+        ratio = new_eases / np.maximum(eases, 1e-9)
+        stretched = np.maximum(_SECOND_INTERVAL, (intervals * ratio).astype(np.int64))
+        new_intervals = np.where(intervals > _SECOND_INTERVAL, stretched, intervals)
+        
+        next_review = (
+            np.asarray(anchors, dtype="datetime64[s]")
+            + new_intervals.astype("timedelta64[D]").astype("timedelta64[s]")
+        )
+        return new_intervals, new_eases, next_review
+    
+    async def replan_profiles(
+        self,
+        profile_ids: Optional[List[str]] = None,
+        ease_scale: float = 1.0,
+        now: Optional[datetime] = None
+    ) -> Dict[str, Any]:
+        """
+        Re-plan the stored schedules of `profile_ids` (all profiles when None).
+        Rows are read in keyset-paginated chunks and only changed rows are
+        written back, one executemany UPDATE and commit per chunk.
+        """
+        started = time.perf_counter()
+        now = now or datetime.utcnow()
+        table = ConceptMastery.__table__
+        write = (
+            table.update()
+            .where(table.c.id == bindparam("row_id"))
+            .values(
+                review_interval_days=bindparam("interval"),
+                ease_factor=bindparam("ease"),
+                next_review_at=bindparam("next_review")
+            )
+        )
+        
+        stats = {"rows": 0, "changed": 0, "chunks": 0}
+        cursor = None
+        while True:
+            query = select(
+                table.c.id,
+                table.c.review_interval_days,
+                table.c.ease_factor,
+                table.c.last_practiced_at,
+                table.c.first_seen_at,
+                table.c.next_review_at
+            ).order_by(table.c.id).limit(self.chunk_size)
+            if cursor is not None:
+                query = query.where(table.c.id > cursor)
+            if profile_ids is not None:
+                query = query.where(table.c.profile_id.in_(profile_ids))
+            
+            async with async_session_maker() as db:
+                rows = (await db.execute(query)).all()
+                if not rows:
+                    break
+                cursor = rows[-1].id
+                
+                ids, intervals, eases, anchors, current = zip(*(
+                    (
+                        row.id,
+                        row.review_interval_days,
+                        row.ease_factor,
+                        row.last_practiced_at or row.first_seen_at or now,
+                        row.next_review_at
+                    )
+                    for row in rows
+                ))
+                intervals = np.array(intervals, dtype=np.int64)
+                eases = np.array(eases, dtype=np.float64)
+                new_intervals, new_eases, next_review = self.replan(
+                    intervals, eases, np.array(anchors, dtype="datetime64[s]"), ease_scale
+                )
+                current = np.array(
+                    [value or "NaT" for value in current], dtype="datetime64[s]"
+                )
+                changed = np.flatnonzero(
+                    (new_intervals != intervals)
+                    | (new_eases != eases)
+                    | (next_review != current)
+                )
+                
+                if len(changed):
+                    next_review_values = next_review[changed].tolist()
+                    await db.execute(write, [
+                        {
+                            "row_id": ids[i],
+                            "interval": int(new_intervals[i]),
+                            "ease": float(new_eases[i]),
+                            "next_review": next_review_values[j]
+                        }
+                        for j, i in enumerate(changed)
+                    ])
+                    await db.commit()
+            
+            stats["rows"] += len(rows)
+            stats["changed"] += len(changed)
+            stats["chunks"] += 1
+        
+        stats["seconds"] = round(time.perf_counter() - started, 3)
+        return stats
+
+
+# Singleton instance
+review_scheduler = SM2Scheduler(
+    min_ease=settings.ltp_sm2_min_ease,
+    max_ease=settings.ltp_sm2_max_ease,
+    chunk_size=settings.ltp_replan_chunk_size
+)
+
+
+def get_review_scheduler() -> SM2Scheduler:
+    """Dependency for getting the spaced repetition scheduler instance"""
+    return review_scheduler
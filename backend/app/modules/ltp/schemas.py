@@ -3,9 +3,9 @@ SkillTwin - Learning Twin Profile (LTP) Schemas
 Pydantic schemas for API request/response validation
 """
 
-from datetime import datetime
+from datetime import datetime, timezone
 from typing import Optional, List, Dict
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, field_validator
 from enum import Enum
 
 
@@ -83,6 +83,36 @@ class ConceptMasteryResponse(ConceptMasteryBase):
         from_attributes = True
 
 
+class ConceptMasteryResult(BaseModel):
+    """One quiz answer in a batch upload"""
+    profile_id: str
+    concept_id: str
+    correct: bool
+    confidence_score: Optional[float] = Field(ge=0.0, le=1.0, default=None)
+    answered_at: Optional[datetime] = None  # Defaults to upload time; used to order offline answers
+
+    @field_validator("answered_at")
+    @classmethod
+    def _to_naive_utc(cls, value: Optional[datetime]) -> Optional[datetime]:
+        """Stored timestamps are naive UTC (datetime.utcnow()); convert offsets like "Z" """
+        if value is not None and value.tzinfo is not None:
+            value = value.astimezone(timezone.utc).replace(tzinfo=None)
+        return value
+
+
+class ConceptMasteryBatchUpdate(BaseModel):
+    """Quiz results for any number of profiles and concepts"""
+    results: List[ConceptMasteryResult] = Field(..., min_length=1, max_length=5000)
+
+
+class ConceptMasteryBatchResponse(BaseModel):
+    """Updated mastery rows (without concept details) and skipped profiles"""
+    masteries: List[ConceptMasteryResponse]
+    results_applied: int
+    masteries_created: int
+    unknown_profile_ids: List[str] = []
+
+
 # ============ Misconception Schemas ============
 
 class MisconceptionBase(BaseModel):
@@ -5,10 +5,12 @@ Business logic for managing learner cognitive profiles
 
 import uuid
 from datetime import datetime, timedelta
+from enum import Enum
 from typing import Optional, List, Dict, Tuple
-from sqlalchemy import select, func, and_
+from sqlalchemy import select, update, func, and_, bindparam, tuple_
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import selectinload
+from sqlalchemy import inspect as sa_inspect
+from sqlalchemy.orm import selectinload, raiseload
 
 from app.modules.ltp.models import (
     LearningTwinProfile,
@@ -23,6 +25,9 @@ from app.modules.ltp.schemas import (
     LTPUpdate,
     ConceptCreate,
     ConceptMasteryUpdate,
+    ConceptMasteryResult,
+    ConceptMasteryResponse,
+    ConceptMasteryBatchResponse,
     MisconceptionCreate,
     MisconceptionUpdate,
     LearningSessionCreate,
@@ -33,6 +38,38 @@ from app.modules.ltp.schemas import (
     KnowledgeGraphResponse
 )
 from app.core.config import settings
+from app.core.database import request_cache, dialect_insert
+from app.modules.ltp.scheduler import review_scheduler
+
+
+class ProfileLoad(str, Enum):
+    """
+    Relationships loaded with a profile. Anything not loaded raises on access
+    instead of lazy-loading, so a missing level shows up immediately.
+    """
+    SCALAR = "scalar"  # Profile columns only
+    MASTERIES = "masteries"  # Plus concept masteries
+    FULL = "full"  # Plus misconceptions and learning sessions
+
+
+_PROFILE_RELATIONSHIPS = {
+    ProfileLoad.SCALAR: [],
+    ProfileLoad.MASTERIES: [LearningTwinProfile.concept_masteries],
+    ProfileLoad.FULL: [
+        LearningTwinProfile.concept_masteries,
+        LearningTwinProfile.misconceptions,
+        LearningTwinProfile.learning_sessions
+    ]
+}
+
+
+def _profile_options(load: ProfileLoad) -> list:
+    return [selectinload(rel) for rel in _PROFILE_RELATIONSHIPS[load]] + [raiseload("*")]
+
+
+def _has_relationships(profile: LearningTwinProfile, load: ProfileLoad) -> bool:
+    unloaded = sa_inspect(profile).unloaded
+    return not any(rel.key in unloaded for rel in _PROFILE_RELATIONSHIPS[load])
 
 
 class LTPService:
@@ -41,6 +78,11 @@ class LTPService:
     def __init__(self, db: AsyncSession):
         self.db = db
     
+    @property
+    def _profiles(self) -> Dict[str, LearningTwinProfile]:
+        """Profiles already loaded in this request, by ID (shared via the session)"""
+        return request_cache(self.db, "ltp_profiles")
+    
     # ============ LTP CRUD Operations ============
     
     async def create_profile(self, user_id: str) -> LearningTwinProfile:
@@ -58,34 +100,49 @@ class LTPService:
         )
         self.db.add(profile)
         await self.db.commit()
-        await self.db.refresh(profile)
+        self._profiles[profile.id] = profile
         return profile
     
-    async def get_profile_by_user_id(self, user_id: str) -> Optional[LearningTwinProfile]:
-        """Get LTP by user ID"""
+    async def get_profile_by_user_id(
+        self,
+        user_id: str,
+        load: ProfileLoad = ProfileLoad.SCALAR
+    ) -> Optional[LearningTwinProfile]:
+        """Get LTP by user ID with the relationships of `load`"""
+        for profile in self._profiles.values():
+            if profile.user_id == user_id and _has_relationships(profile, load):
+                return profile
         result = await self.db.execute(
             select(LearningTwinProfile)
             .where(LearningTwinProfile.user_id == user_id)
-            .options(
-                selectinload(LearningTwinProfile.concept_masteries),
-                selectinload(LearningTwinProfile.misconceptions),
-                selectinload(LearningTwinProfile.learning_sessions)
-            )
+            .options(*_profile_options(load))
         )
-        return result.scalar_one_or_none()
+        profile = result.scalar_one_or_none()
+        if profile:
+            self._profiles[profile.id] = profile
+        return profile
     
-    async def get_profile_by_id(self, profile_id: str) -> Optional[LearningTwinProfile]:
-        """Get LTP by profile ID"""
+    async def get_profile_by_id(
+        self,
+        profile_id: str,
+        load: ProfileLoad = ProfileLoad.SCALAR
+    ) -> Optional[LearningTwinProfile]:
+        """
+        Get LTP by profile ID with the relationships of `load`. Repeated
+        lookups in the same request are served from the request cache.
+        """
+        profile = self._profiles.get(profile_id)
+        if profile is not None and _has_relationships(profile, load):
+            return profile
         result = await self.db.execute(
             select(LearningTwinProfile)
             .where(LearningTwinProfile.id == profile_id)
-            .options(
-                selectinload(LearningTwinProfile.concept_masteries),
-                selectinload(LearningTwinProfile.misconceptions),
-                selectinload(LearningTwinProfile.learning_sessions)
-            )
+            .options(*_profile_options(load))
         )
-        return result.scalar_one_or_none()
+        profile = result.scalar_one_or_none()
+        if profile:
+            self._profiles[profile_id] = profile
+        return profile
     
     async def update_profile(self, profile_id: str, update_data: LTPUpdate) -> Optional[LearningTwinProfile]:
         """Update LTP with new data"""
@@ -99,7 +156,6 @@ class LTPService:
         
         profile.updated_at = datetime.utcnow()
         await self.db.commit()
-        await self.db.refresh(profile)
         return profile
     
     async def update_activity(self, profile_id: str) -> None:
@@ -168,6 +224,41 @@ class LTPService:
         concept_id: str
     ) -> ConceptMastery:
         """Get existing mastery record or create new one"""
+        if await self._insert_mastery_if_missing(profile_id, concept_id, datetime.utcnow()):
+            await self.db.commit()
+        return await self._load_mastery(profile_id, concept_id)
+    
+    async def _insert_mastery_if_missing(self, profile_id: str, concept_id: str, now: datetime) -> bool:
+        """
+        Upsert the mastery row (no commit). Returns True when it was created,
+        in which case the profile's attempted-concepts counter is bumped too.
+        """
+        created_id = await self.db.scalar(
+            dialect_insert(ConceptMastery)
+            .values(
+                id=str(uuid.uuid4()),
+                profile_id=profile_id,
+                concept_id=concept_id,
+                first_seen_at=now,
+                next_review_at=now + timedelta(days=1)
+            )
+            .on_conflict_do_nothing(index_elements=["profile_id", "concept_id"])
+            .returning(ConceptMastery.id)
+        )
+        if created_id is None:
+            return False
+        await self._increment_profile(profile_id, LearningTwinProfile.total_concepts_attempted)
+        return True
+    
+    async def _increment_profile(self, profile_id: str, column, amount: int = 1) -> None:
+        """SQL-side counter increment; a cached profile object is updated in place"""
+        await self.db.execute(
+            update(LearningTwinProfile)
+            .where(LearningTwinProfile.id == profile_id)
+            .values({column: column + amount})
+        )
+    
+    async def _load_mastery(self, profile_id: str, concept_id: str) -> Optional[ConceptMastery]:
         result = await self.db.execute(
             select(ConceptMastery)
             .where(
@@ -176,27 +267,10 @@ class LTPService:
                     ConceptMastery.concept_id == concept_id
                 )
             )
+            .options(selectinload(ConceptMastery.concept))
+            .execution_options(populate_existing=True)
         )
-        mastery = result.scalar_one_or_none()
-        
-        if not mastery:
-            mastery = ConceptMastery(
-                id=str(uuid.uuid4()),
-                profile_id=profile_id,
-                concept_id=concept_id,
-                next_review_at=datetime.utcnow() + timedelta(days=1)
-            )
-            self.db.add(mastery)
-            await self.db.commit()
-            await self.db.refresh(mastery)
-            
-            # Update profile stats
-            profile = await self.get_profile_by_id(profile_id)
-            if profile:
-                profile.total_concepts_attempted += 1
-                await self.db.commit()
-        
-        return mastery
+        return result.scalar_one_or_none()
     
     async def update_concept_mastery(
         self,
@@ -204,46 +278,218 @@ class LTPService:
         concept_id: str,
         update_data: ConceptMasteryUpdate
     ) -> Optional[ConceptMastery]:
-        """Update mastery record with new learning data"""
-        mastery = await self.get_or_create_concept_mastery(profile_id, concept_id)
+        """
+        Update mastery record with new learning data in a single transaction.
+        Counters and the SM-2 schedule are computed in SQL from the stored
+        values, so concurrent answers for the same concept cannot overwrite
+        each other.
+        """
+        now = datetime.utcnow()
+        await self._insert_mastery_if_missing(profile_id, concept_id, now)
+        
+        values = {"last_practiced_at": now}
         
         # Handle quiz/practice result
         if update_data.correct is not None:
-            mastery.attempts_count += 1
-            if update_data.correct:
-                mastery.correct_count += 1
-            
-            # Recalculate mastery score based on accuracy
-            mastery.mastery_score = mastery.correct_count / mastery.attempts_count
-            
-            # Update spaced repetition using SM-2 algorithm
-            mastery = self._update_spaced_repetition(mastery, update_data.correct)
+            correct = 1 if update_data.correct else 0
+            values.update({
+                "attempts_count": ConceptMastery.attempts_count + 1,
+                "correct_count": ConceptMastery.correct_count + correct,
+                # Recalculate mastery score based on accuracy
+                "mastery_score": (ConceptMastery.correct_count + correct) * 1.0 / (ConceptMastery.attempts_count + 1),
+                # Update spaced repetition using SM-2 algorithm
+                **review_scheduler.review_values(update_data.correct)
+            })
         
         # Direct score updates
         if update_data.mastery_score is not None:
-            mastery.mastery_score = update_data.mastery_score
+            values["mastery_score"] = update_data.mastery_score
         
         if update_data.confidence_score is not None:
-            mastery.confidence_score = update_data.confidence_score
+            values["confidence_score"] = update_data.confidence_score
+        
+        where = and_(
+            ConceptMastery.profile_id == profile_id,
+            ConceptMastery.concept_id == concept_id
+        )
+        row = (await self.db.execute(
+            update(ConceptMastery)
+            .where(where)
+            .values(values)
+            .returning(
+                ConceptMastery.mastery_score,
+                ConceptMastery.review_interval_days,
+                ConceptMastery.mastered_at
+            )
+            .execution_options(synchronize_session=False)
+        )).one()
         
-        # Update mastery level based on score
-        mastery.mastery_level = self._calculate_mastery_level(mastery.mastery_score)
+        # Update mastery level based on score; the row is write-locked until commit
+        level = self._calculate_mastery_level(row.mastery_score)
+        derived = {"mastery_level": level}
+        if update_data.correct is not None:
+            derived["next_review_at"] = now + timedelta(days=row.review_interval_days)
         
         # Check if newly mastered
-        if (mastery.mastery_level in [MasteryLevel.MASTERED.value, MasteryLevel.EXPERT.value] 
-            and mastery.mastered_at is None):
-            mastery.mastered_at = datetime.utcnow()
-            
-            # Update profile stats
-            profile = await self.get_profile_by_id(profile_id)
-            if profile:
-                profile.total_concepts_mastered += 1
-                await self.db.commit()
+        newly_mastered = (
+            level in [MasteryLevel.MASTERED.value, MasteryLevel.EXPERT.value]
+            and row.mastered_at is None
+        )
+        if newly_mastered:
+            derived["mastered_at"] = now
+        
+        await self.db.execute(
+            update(ConceptMastery)
+            .where(where)
+            .values(derived)
+            .execution_options(synchronize_session=False)
+        )
+        if newly_mastered:
+            await self._increment_profile(profile_id, LearningTwinProfile.total_concepts_mastered)
+        
+        await self.db.commit()
+        return await self._load_mastery(profile_id, concept_id)
+    
+    async def update_concept_masteries(
+        self,
+        results: List[ConceptMasteryResult]
+    ) -> ConceptMasteryBatchResponse:
+        """
+        Apply a batch of quiz results in one transaction: missing mastery rows
+        are upserted together, all affected rows are loaded in one query, the
+        answers are replayed in memory (in answered_at order, SM-2 through the
+        vectorized scheduler) and the rows are written back with a single
+        executemany UPDATE.
+        """
+        now = datetime.utcnow()
+        profile_ids = {r.profile_id for r in results}
+        known = set((await self.db.scalars(
+            select(LearningTwinProfile.id).where(LearningTwinProfile.id.in_(profile_ids))
+        )).all())
+        
+        answers: Dict[Tuple[str, str], List[ConceptMasteryResult]] = {}
+        for result in sorted(results, key=lambda r: r.answered_at or now):
+            if result.profile_id in known:
+                answers.setdefault((result.profile_id, result.concept_id), []).append(result)
+        if not answers:
+            return ConceptMasteryBatchResponse(
+                masteries=[], results_applied=0, masteries_created=0,
+                unknown_profile_ids=sorted(profile_ids - known)
+            )
+        
+        created_for = list((await self.db.scalars(
+            dialect_insert(ConceptMastery)
+            .values([
+                {
+                    "id": str(uuid.uuid4()),
+                    "profile_id": profile_id,
+                    "concept_id": concept_id,
+                    "first_seen_at": now,
+                    "next_review_at": now + timedelta(days=1)
+                }
+                for profile_id, concept_id in answers
+            ])
+            .on_conflict_do_nothing(index_elements=["profile_id", "concept_id"])
+            .returning(ConceptMastery.profile_id)
+        )).all())
+        
+        # The insert above holds the write lock, so nothing changes these rows before commit
+        table = ConceptMastery.__table__
+        rows = (await self.db.execute(
+            select(table)
+            .where(tuple_(table.c.profile_id, table.c.concept_id).in_(list(answers)))
+            .with_for_update()
+        )).mappings().all()
+        
+        updated = [dict(row) for row in rows]
+        was_mastered = [state["mastered_at"] is not None for state in updated]
+        groups = [answers[(state["profile_id"], state["concept_id"])] for state in updated]
+        
+        # Round k applies every row's k-th answer, one vectorized SM-2 step per round
+        for k in range(max(len(group) for group in groups)):
+            active = [i for i, group in enumerate(groups) if len(group) > k]
+            intervals, eases = review_scheduler.review(
+                [updated[i]["review_interval_days"] for i in active],
+                [updated[i]["ease_factor"] for i in active],
+                [groups[i][k].correct for i in active]
+            )
+            for i, interval, ease in zip(active, intervals.tolist(), eases.tolist()):
+                answer = groups[i][k]
+                self._apply_quiz_answer(updated[i], answer, interval, ease, answer.answered_at or now)
+        
+        mastered_for = [
+            state["profile_id"]
+            for state, mastered in zip(updated, was_mastered)
+            if not mastered and state["mastered_at"] is not None
+        ]
+        
+        columns = [
+            "attempts_count", "correct_count", "mastery_score", "confidence_score",
+            "mastery_level", "review_interval_days", "ease_factor",
+            "next_review_at", "last_practiced_at", "mastered_at"
+        ]
+        await self.db.execute(
+            table.update()
+            .where(table.c.id == bindparam("row_id"))
+            .values({column: bindparam(column) for column in columns}),
+            [{"row_id": state["id"], **{c: state[c] for c in columns}} for state in updated]
+        )
+        
+        # Profile counters, one executemany for all affected profiles
+        counters: Dict[str, List[int]] = {}
+        for profile_id in created_for:
+            counters.setdefault(profile_id, [0, 0])[0] += 1
+        for profile_id in mastered_for:
+            counters.setdefault(profile_id, [0, 0])[1] += 1
+        if counters:
+            profiles = LearningTwinProfile.__table__
+            await self.db.execute(
+                profiles.update()
+                .where(profiles.c.id == bindparam("profile_id"))
+                .values(
+                    total_concepts_attempted=profiles.c.total_concepts_attempted + bindparam("attempted"),
+                    total_concepts_mastered=profiles.c.total_concepts_mastered + bindparam("mastered")
+                ),
+                [
+                    {"profile_id": profile_id, "attempted": attempted, "mastered": mastered}
+                    for profile_id, (attempted, mastered) in counters.items()
+                ]
+            )
         
-        mastery.last_practiced_at = datetime.utcnow()
         await self.db.commit()
-        await self.db.refresh(mastery)
-        return mastery
+        return ConceptMasteryBatchResponse(
+            masteries=[ConceptMasteryResponse(**state) for state in updated],
+            results_applied=sum(len(group) for group in answers.values()),
+            masteries_created=len(created_for),
+            unknown_profile_ids=sorted(profile_ids - known)
+        )
+    
+    def _apply_quiz_answer(
+        self,
+        state: Dict,
+        answer: ConceptMasteryResult,
+        interval: int,
+        ease: float,
+        answered_at: datetime
+    ) -> None:
+        """In-memory counterpart of update_concept_mastery for one answer and its SM-2 step"""
+        state["attempts_count"] += 1
+        if answer.correct:
+            state["correct_count"] += 1
+        state["mastery_score"] = state["correct_count"] / state["attempts_count"]
+        
+        state["review_interval_days"] = interval
+        state["ease_factor"] = ease
+        state["next_review_at"] = answered_at + timedelta(days=interval)
+        
+        if answer.confidence_score is not None:
+            state["confidence_score"] = answer.confidence_score
+        
+        state["mastery_level"] = self._calculate_mastery_level(state["mastery_score"])
+        if (state["mastery_level"] in [MasteryLevel.MASTERED.value, MasteryLevel.EXPERT.value]
+            and state["mastered_at"] is None):
+            state["mastered_at"] = answered_at
+        state["last_practiced_at"] = answered_at
     
     def _calculate_mastery_level(self, score: float) -> str:
         """Calculate mastery level from score"""
@@ -257,21 +503,6 @@ class LTPService:
             return MasteryLevel.LEARNING.value
         return MasteryLevel.NOT_STARTED.value
     
-    def _update_spaced_repetition(self, mastery: ConceptMastery, correct: bool) -> ConceptMastery:
-        """Update spaced repetition parameters using SM-2 algorithm"""
-        if correct:
-            if mastery.review_interval_days == 1:
-                mastery.review_interval_days = 6
-            else:
-                mastery.review_interval_days = int(mastery.review_interval_days * mastery.ease_factor)
-            mastery.ease_factor = min(2.5, mastery.ease_factor + 0.1)
-        else:
-            mastery.review_interval_days = 1
-            mastery.ease_factor = max(1.3, mastery.ease_factor - 0.2)
-        
-        mastery.next_review_at = datetime.utcnow() + timedelta(days=mastery.review_interval_days)
-        return mastery
-    
     async def get_concepts_due_for_review(self, profile_id: str, limit: int = 10) -> List[ConceptMastery]:
         """Get concepts that need review based on spaced repetition"""
         result = await self.db.execute(
@@ -301,17 +532,19 @@ class LTPService:
     async def create_misconception(
         self,
         profile_id: str,
-        misconception_data: MisconceptionCreate
+        misconception_data: MisconceptionCreate,
+        commit: bool = True
     ) -> Misconception:
-        """Record a new misconception"""
+        """Record a new misconception (commit=False leaves it to the caller's transaction)"""
         misconception = Misconception(
             id=str(uuid.uuid4()),
             profile_id=profile_id,
             **misconception_data.model_dump()
         )
         self.db.add(misconception)
-        await self.db.commit()
-        await self.db.refresh(misconception)
+        if commit:
+            await self.db.commit()
+            await self.db.refresh(misconception)
         return misconception
     
     async def get_active_misconceptions(self, profile_id: str) -> List[Misconception]:
@@ -405,6 +638,16 @@ class LTPService:
         
         return session
     
+    async def get_recent_sessions(self, profile_id: str, limit: int = 10) -> List[LearningSession]:
+        """Latest learning sessions of a profile, oldest first"""
+        result = await self.db.execute(
+            select(LearningSession)
+            .where(LearningSession.profile_id == profile_id)
+            .order_by(LearningSession.started_at.desc())
+            .limit(limit)
+        )
+        return list(reversed(result.scalars().all()))
+    
     # ============ Analytics Operations ============
     
     async def get_analytics(self, profile_id: str) -> LTPAnalytics:
@@ -524,14 +767,17 @@ class LTPService:
         else:
             new_pref = max(0.0, current_pref - learning_rate * 0.5)
         
-        profile.modality_preferences[modality] = new_pref
+        # Assign a new dict: in-place JSON changes are not tracked
+        profile.modality_preferences = {**profile.modality_preferences, modality: new_pref}
         profile.updated_at = datetime.utcnow()
         await self.db.commit()
     
     async def get_preferred_modality(self, profile_id: str) -> str:
         """Get the most preferred learning modality"""
+        # Through the request cache, so later lookups in the request are free
         profile = await self.get_profile_by_id(profile_id)
-        if not profile or not profile.modality_preferences:
+        preferences = profile.modality_preferences if profile else None
+        if not preferences:
             return "visual"  # Default
         
-        return max(profile.modality_preferences, key=profile.modality_preferences.get)
+        return max(preferences, key=preferences.get)
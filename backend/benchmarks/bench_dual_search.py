@@ -0,0 +1,122 @@
+"""
+Benchmark: sequential vs concurrent Dual RAG retrieval
+Seeds a throwaway Chroma store and compares p50/p99 latency of awaiting the
+student and academic searches one after the other against dual_search.
+
+Run from the backend directory:
+    python -m benchmarks.bench_dual_search --queries 200
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import tempfile
+import time
+import uuid
+
+SUBJECTS = ["Physics", "Mathematics", "Computer Science", "Chemistry"]
+TOPICS = ["Mechanics", "Energy", "Algebra", "Calculus", "Algorithms", "Bonding"]
+WORDS = (
+    "force mass acceleration energy momentum velocity work power friction gravity "
+    "derivative integral limit vector matrix function algorithm recursion graph "
+    "atom molecule bond electron reaction equilibrium entropy wave frequency"
+).split()
+QUERIES = [
+    "Explain Newton's Second Law",
+    "What is kinetic energy?",
+    "How does momentum conservation work?",
+    "Solve an F=ma problem for me",
+    "What is the derivative of x squared?",
+    "How does recursion work?",
+]
+
+
+def _sentence(rng: random.Random, length: int = 40) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(length))
+
+
+def _percentile(samples, pct: float) -> float:
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def _seed(store, n_profiles: int, n_student: int, n_academic: int, rng: random.Random):
+    profiles = [str(uuid.uuid4()) for _ in range(n_profiles)]
+    for i in range(n_academic):
+        await store.add_academic_document(
+            doc_id=str(uuid.uuid4()),
+            content=_sentence(rng),
+            metadata={
+                "subject": rng.choice(SUBJECTS),
+                "topic": rng.choice(TOPICS),
+                "source_name": f"Textbook {i % 10}",
+            }
+        )
+    for i in range(n_student):
+        await store.add_student_context(
+            doc_id=str(uuid.uuid4()),
+            content=_sentence(rng, 25),
+            metadata={"profile_id": profiles[i % n_profiles], "context_type": "chat"}
+        )
+    return profiles
+
+
+async def _sequential(store, query: str, profile_id: str):
+    await store.search_student_contexts(query, profile_id, 5)
+    await store.search_academic_documents(query, 5)
+
+
+async def _concurrent(store, query: str, profile_id: str):
+    await store.dual_search(query, profile_id, 5, 5)
+
+
+async def _measure(label: str, fn, store, profiles, n_queries: int, rng: random.Random):
+    samples = []
+    for _ in range(n_queries):
+        started = time.perf_counter()
+        await fn(store, rng.choice(QUERIES), rng.choice(profiles))
+        samples.append((time.perf_counter() - started) * 1000)
+    print(
+        f"{label:<12} p50={_percentile(samples, 50):7.2f} ms  "
+        f"p99={_percentile(samples, 99):7.2f} ms  mean={statistics.mean(samples):7.2f} ms"
+    )
+    return samples
+
+
+async def main(args):
+    from app.modules.dual_rag.vector_store import VectorStoreService
+
+    rng = random.Random(args.seed)
+    store = VectorStoreService()
+
+    print(f"Seeding {args.academic} academic docs and {args.student} student contexts...")
+    profiles = await _seed(store, args.profiles, args.student, args.academic, rng)
+
+    # Warm up the embedding model and Chroma segment caches
+    await _concurrent(store, QUERIES[0], profiles[0])
+
+    sequential = await _measure("sequential", _sequential, store, profiles, args.queries, rng)
+    concurrent = await _measure("concurrent", _concurrent, store, profiles, args.queries, rng)
+
+    print(
+        f"\np50 gain: {_percentile(sequential, 50) / _percentile(concurrent, 50):.2f}x  "
+        f"p99 gain: {_percentile(sequential, 99) / _percentile(concurrent, 99):.2f}x"
+    )
+    store.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--academic", type=int, default=2000)
+    parser.add_argument("--student", type=int, default=5000)
+    parser.add_argument("--profiles", type=int, default=50)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    # Point the singleton vector store at a scratch directory before it is imported
+    os.environ["CHROMA_PERSIST_DIRECTORY"] = tempfile.mkdtemp(prefix="skilltwin-bench-")
+    asyncio.run(main(args))
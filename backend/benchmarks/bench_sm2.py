@@ -0,0 +1,186 @@
+"""
+Benchmark: per-row vs vectorized SM-2 scheduling
+Compares the per-row Python SM-2 path (one ConceptMastery-like object at a
+time) with SM2Scheduler on synthetic mastery rows, for a review step and a
+cohort re-plan, and checks both produce identical schedules. With --db-rows
+it also re-plans a scratch SQLite database through the ORM row by row and
+through SM2Scheduler.replan_profiles.
+
+Run from the backend directory:
+    python -m benchmarks.bench_sm2 --rows 1000000 --db-rows 100000
+"""
+
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import numpy as np
+
+MIN_EASE = 1.3
+MAX_EASE = 2.5
+
+
+def _synthetic(rng: np.random.Generator, n: int):
+    """Intervals from real SM-2 runs (1, 6, 15, ...), eases in bounds, whole-second anchors"""
+    steps = rng.integers(0, 6, size=n)
+    eases = np.round(rng.uniform(MIN_EASE, MAX_EASE, size=n), 2)
+    intervals = np.where(steps == 0, 1, 6 * eases ** np.maximum(steps - 1, 0)).astype(np.int64)
+    base = np.datetime64("2026-01-01T00:00:00", "s")
+    anchors = base + rng.integers(0, 300 * 86400, size=n).astype("timedelta64[s]")
+    correct = rng.random(n) < 0.75
+    return intervals, eases, anchors, correct
+
+
+def _review_row(mastery, correct: bool, now: datetime) -> None:
+    """The per-row SM-2 update LTPService applied to one ConceptMastery"""
+    if correct:
+        if mastery.review_interval_days == 1:
+            mastery.review_interval_days = 6
+        else:
+            mastery.review_interval_days = int(mastery.review_interval_days * mastery.ease_factor)
+        mastery.ease_factor = min(MAX_EASE, mastery.ease_factor + 0.1)
+    else:
+        mastery.review_interval_days = 1
+        mastery.ease_factor = max(MIN_EASE, mastery.ease_factor - 0.2)
+    mastery.next_review_at = now + timedelta(days=mastery.review_interval_days)
+
+
+def _replan_row(mastery, ease_scale: float) -> None:
+    """Per-row equivalent of SM2Scheduler.replan"""
+    ease = min(MAX_EASE, max(MIN_EASE, mastery.ease_factor * ease_scale))
+    if mastery.review_interval_days > 6:
+        ratio = ease / max(mastery.ease_factor, 1e-9)
+        mastery.review_interval_days = max(6, int(mastery.review_interval_days * ratio))
+    mastery.ease_factor = ease
+    anchor = mastery.last_practiced_at or mastery.first_seen_at
+    mastery.next_review_at = anchor + timedelta(days=mastery.review_interval_days)
+
+
+def _rows(intervals, eases, anchors):
+    return [
+        SimpleNamespace(
+            review_interval_days=interval,
+            ease_factor=ease,
+            last_practiced_at=anchor,
+            first_seen_at=anchor,
+            next_review_at=None
+        )
+        for interval, ease, anchor in zip(intervals.tolist(), eases.tolist(), anchors.tolist())
+    ]
+
+
+def _timed(label: str, fn):
+    started = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - started
+    print(f"{label:<28} {elapsed:8.3f} s")
+    return result, elapsed
+
+
+def bench_compute(args):
+    from app.modules.ltp.scheduler import SM2Scheduler
+
+    rng = np.random.default_rng(args.seed)
+    scheduler = SM2Scheduler(min_ease=MIN_EASE, max_ease=MAX_EASE)
+    intervals, eases, anchors, correct = _synthetic(rng, args.rows)
+    now = datetime(2026, 10, 1)
+    print(f"{args.rows} mastery rows\n")
+
+    print("Review step (one answer per row)")
+    rows = _rows(intervals, eases, anchors)
+    _, per_row = _timed("  per-row", lambda: [
+        _review_row(row, ok, now) for row, ok in zip(rows, correct.tolist())
+    ])
+    (new_intervals, new_eases), vectorized = _timed(
+        "  vectorized", lambda: scheduler.review(intervals, eases, correct)
+    )
+    assert new_intervals.tolist() == [row.review_interval_days for row in rows]
+    assert new_eases.tolist() == [row.ease_factor for row in rows]
+    print(f"  speedup {per_row / vectorized:.1f}x, schedules identical\n")
+
+    print(f"Re-plan (ease scale {args.ease_scale})")
+    rows = _rows(intervals, eases, anchors)
+    _, per_row = _timed("  per-row", lambda: [_replan_row(row, args.ease_scale) for row in rows])
+    (new_intervals, new_eases, next_review), vectorized = _timed(
+        "  vectorized", lambda: scheduler.replan(intervals, eases, anchors, args.ease_scale)
+    )
+    assert new_intervals.tolist() == [row.review_interval_days for row in rows]
+    assert new_eases.tolist() == [row.ease_factor for row in rows]
+    assert next_review.tolist() == [row.next_review_at for row in rows]
+    print(f"  speedup {per_row / vectorized:.1f}x, schedules identical\n")
+
+
+async def _seed_database(rows) -> None:
+    from sqlalchemy import insert, delete
+    from app.core.database import async_session_maker
+    from app.modules.ltp.models import ConceptMastery
+
+    async with async_session_maker() as db:
+        await db.execute(delete(ConceptMastery))
+        for start in range(0, len(rows), 10000):
+            await db.execute(insert(ConceptMastery), rows[start:start + 10000])
+        await db.commit()
+
+
+async def bench_database(args):
+    from sqlalchemy import select
+    from app.core.database import init_db, async_session_maker, engine
+    from app.main import app  # noqa: F401  (registers every model with SQLAlchemy)
+    from app.modules.ltp.models import ConceptMastery
+    from app.modules.ltp.scheduler import SM2Scheduler
+
+    rng = np.random.default_rng(args.seed)
+    intervals, eases, anchors, _ = _synthetic(rng, args.db_rows)
+    await init_db()
+    profiles = [str(uuid.uuid4()) for _ in range(max(1, args.db_rows // 200))]
+    rows = [
+        {
+            "id": str(uuid.uuid4()),
+            "profile_id": profiles[i % len(profiles)],
+            "concept_id": str(uuid.uuid4()),
+            "review_interval_days": interval,
+            "ease_factor": ease,
+            "last_practiced_at": anchor,
+            "first_seen_at": anchor
+        }
+        for i, (interval, ease, anchor) in enumerate(zip(intervals.tolist(), eases.tolist(), anchors.tolist()))
+    ]
+    print(f"Database re-plan of {args.db_rows} SQLite rows (ease scale {args.ease_scale})")
+
+    await _seed_database(rows)
+    started = time.perf_counter()
+    async with async_session_maker() as db:
+        for mastery in (await db.scalars(select(ConceptMastery))).all():
+            _replan_row(mastery, args.ease_scale)
+        await db.commit()
+    per_row = time.perf_counter() - started
+    print(f"{'  per-row ORM':<28} {per_row:8.3f} s")
+
+    await _seed_database(rows)
+    scheduler = SM2Scheduler(min_ease=MIN_EASE, max_ease=MAX_EASE, chunk_size=args.chunk_size)
+    stats = await scheduler.replan_profiles(ease_scale=args.ease_scale)
+    print(f"{'  vectorized chunks':<28} {stats['seconds']:8.3f} s  ({stats['changed']} changed, {stats['chunks']} chunks)")
+    print(f"  speedup {per_row / stats['seconds']:.1f}x")
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--db-rows", type=int, default=0)
+    parser.add_argument("--chunk-size", type=int, default=10000)
+    parser.add_argument("--ease-scale", type=float, default=0.9)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    # Point the database at a scratch file before the engine is created
+    os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{tempfile.mkdtemp(prefix='skilltwin-bench-')}/bench.db"
+    os.environ["DEBUG"] = "false"
+    bench_compute(args)
+    if args.db_rows:
+        asyncio.run(bench_database(args))
@@ -0,0 +1,127 @@
+"""
+Benchmark: Chroma vs memory-mapped float16/int8 vector backends
+Indexes synthetic clustered embeddings in each backend and reports recall@k
+against exact float32 search, query latency, cold-start time and vector
+bytes per million chunks.
+
+Run from the backend directory:
+    python -m benchmarks.bench_vector_backends --docs 50000 --queries 200
+"""
+
+import argparse
+import statistics
+import tempfile
+import time
+import uuid
+
+import numpy as np
+
+SUBJECTS = ["Physics", "Mathematics", "Computer Science", "Chemistry"]
+
+
+def _percentile(samples, pct: float) -> float:
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def _clustered(rng: np.random.Generator, n: int, dim: int, centers: np.ndarray) -> np.ndarray:
+    """Unit vectors scattered around random centers, like sentence embeddings"""
+    labels = rng.integers(0, len(centers), size=n)
+    vectors = centers[labels] + 0.35 * rng.standard_normal((n, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def _exact_top_k(corpus: np.ndarray, subjects: np.ndarray, queries: np.ndarray, query_subjects, k: int):
+    truth = []
+    for query, subject in zip(queries, query_subjects):
+        rows = np.flatnonzero(subjects == subject) if subject else np.arange(len(corpus))
+        distances = ((corpus[rows] - query) ** 2).sum(axis=1)
+        truth.append(set(rows[np.argsort(distances)[:k]].tolist()))
+    return truth
+
+
+def _load(collection, ids, vectors, subjects, batch_size: int = 5000):
+    for start in range(0, len(ids), batch_size):
+        end = start + batch_size
+        collection.add(
+            ids=ids[start:end],
+            embeddings=vectors[start:end].tolist(),
+            documents=[f"chunk {i}" for i in range(start, min(end, len(ids)))],
+            metadatas=[{"subject": s} for s in subjects[start:end]]
+        )
+
+
+def _evaluate(label, collection, ids, queries, query_subjects, truth, k, open_seconds, vector_bytes, n_docs):
+    index_of = {doc_id: i for i, doc_id in enumerate(ids)}
+    recalls, latencies = [], []
+    for query, subject, expected in zip(queries, query_subjects, truth):
+        started = time.perf_counter()
+        result = collection.query(
+            query_embeddings=[query.tolist()],
+            n_results=k,
+            where={"subject": subject} if subject else None
+        )
+        latencies.append((time.perf_counter() - started) * 1000)
+        found = {index_of[doc_id] for doc_id in result["ids"][0]}
+        recalls.append(len(found & expected) / len(expected))
+
+    per_million = vector_bytes / n_docs * 1_000_000 / 2 ** 20 if vector_bytes else float("nan")
+    print(
+        f"{label:<10} recall@{k}={statistics.mean(recalls):.4f}  "
+        f"p50={_percentile(latencies, 50):7.2f} ms  p99={_percentile(latencies, 99):7.2f} ms  "
+        f"open={open_seconds * 1000:8.1f} ms  vectors/1M={per_million:8.1f} MiB"
+    )
+
+
+def main(args):
+    from app.modules.dual_rag.vector_backends import ChromaBackend
+    from app.modules.dual_rag.mmap_index import MmapVectorBackend
+
+    rng = np.random.default_rng(args.seed)
+    centers = rng.standard_normal((args.clusters, args.dim)).astype(np.float32)
+    corpus = _clustered(rng, args.docs, args.dim, centers)
+    subjects = np.array([SUBJECTS[i % len(SUBJECTS)] for i in range(args.docs)])
+    queries = _clustered(rng, args.queries, args.dim, centers)
+    # Half the queries filter by subject, as Dual RAG does when a subject is given
+    query_subjects = [SUBJECTS[i % len(SUBJECTS)] if i % 2 else None for i in range(args.queries)]
+    ids = [str(uuid.uuid4()) for _ in range(args.docs)]
+
+    print(f"Computing exact top-{args.k} for {args.queries} queries over {args.docs} vectors...")
+    truth = _exact_top_k(corpus, subjects, queries, query_subjects, args.k)
+
+    # Chroma (HNSW, float32)
+    chroma_dir = tempfile.mkdtemp(prefix="skilltwin-bench-chroma-")
+    collection = ChromaBackend(chroma_dir).get_or_create_collection("bench")
+    _load(collection, ids, corpus, subjects)
+    started = time.perf_counter()
+    collection = ChromaBackend(chroma_dir).get_collection("bench")
+    collection.query(query_embeddings=[queries[0].tolist()], n_results=1)  # Forces the index to load
+    chroma_open = time.perf_counter() - started
+    _evaluate(
+        "chroma", collection, ids, queries, query_subjects, truth, args.k,
+        chroma_open, args.docs * args.dim * 4, args.docs
+    )
+
+    for dtype in ("float16", "int8"):
+        mmap_dir = tempfile.mkdtemp(prefix=f"skilltwin-bench-{dtype}-")
+        _load(MmapVectorBackend(mmap_dir, dtype).get_or_create_collection("bench"), ids, corpus, subjects)
+        started = time.perf_counter()
+        collection = MmapVectorBackend(mmap_dir, dtype).get_collection("bench")
+        collection.query(query_embeddings=[queries[0].tolist()], n_results=1)
+        mmap_open = time.perf_counter() - started
+        _evaluate(
+            f"mmap-{dtype}", collection, ids, queries, query_subjects, truth, args.k,
+            mmap_open, collection.get_stats()["vector_bytes"], args.docs
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--docs", type=int, default=50000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--clusters", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=42)
+    main(parser.parse_args())
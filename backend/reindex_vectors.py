@@ -0,0 +1,50 @@
+"""
+Vector Index Rebuild Script for SkillTwin
+Rebuilds the vector store from the database, e.g. after index corruption or an
+embedding model change. Interrupted rebuilds resume from their last checkpoint.
+
+Run from the backend directory while the server is stopped:
+    python reindex_vectors.py            # resume an unfinished rebuild if there is one
+    python reindex_vectors.py --restart  # discard the checkpoint and start over
+
+With the server running, use POST /api/v1/rag/admin/reindex instead so the
+live process swaps to the new index.
+"""
+
+import argparse
+import asyncio
+
+from app.core.database import init_db
+from app.main import app  # noqa: F401  (registers every model with SQLAlchemy)
+from app.modules.dual_rag.reindex import vector_rebuilder
+from app.modules.dual_rag.vector_store import vector_store
+
+
+def _report(progress):
+    done = sum(progress.get("done", {}).values())
+    total = sum(progress.get("totals", {}).values())
+    eta = progress.get("eta_seconds")
+    print(
+        f"   {progress.get('phase', '')}: {done}/{total} rows, "
+        f"{progress.get('docs_per_second', 0)} docs/s"
+        + (f", ETA {eta:.0f}s" if eta is not None else "")
+    )
+
+
+async def reindex(resume: bool):
+    print("🔄 Rebuilding vector index from the database...")
+    await init_db()
+    try:
+        progress = await vector_rebuilder.rebuild(resume=resume, on_progress=_report)
+    finally:
+        vector_rebuilder.shutdown()
+        vector_store.shutdown()
+    print(f"✅ Generation {progress['generation']} is live at {progress['path']}")
+    print(f"   {sum(progress['done'].values())} rows in {progress['elapsed_seconds']}s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--restart", action="store_true", help="ignore any unfinished rebuild checkpoint")
+    args = parser.parse_args()
+    asyncio.run(reindex(resume=not args.restart))
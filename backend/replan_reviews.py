@@ -0,0 +1,33 @@
+"""
+Review Re-planning Script for SkillTwin
+Recomputes SM-2 review intervals, ease factors and next review dates for all
+(or selected) learners, e.g. nightly or after tuning LTP_SM2_MIN_EASE /
+LTP_SM2_MAX_EASE. Safe to run while the server is up.
+
+Run from the backend directory:
+    python replan_reviews.py                          # every profile
+    python replan_reviews.py --ease-scale 0.9         # shorten all schedules by 10%
+    python replan_reviews.py --profile <id> --profile <id>
+"""
+
+import argparse
+import asyncio
+
+from app.core.database import init_db
+from app.main import app  # noqa: F401  (registers every model with SQLAlchemy)
+from app.modules.ltp.scheduler import review_scheduler
+
+
+async def replan(profile_ids, ease_scale: float):
+    print("🔄 Re-planning review schedules...")
+    await init_db()
+    stats = await review_scheduler.replan_profiles(profile_ids=profile_ids, ease_scale=ease_scale)
+    print(f"✅ {stats['changed']} of {stats['rows']} schedules changed in {stats['seconds']}s ({stats['chunks']} chunks)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--profile", action="append", dest="profile_ids", help="limit to this profile (repeatable)")
+    parser.add_argument("--ease-scale", type=float, default=1.0, help="multiply every ease factor before clipping")
+    args = parser.parse_args()
+    asyncio.run(replan(args.profile_ids, args.ease_scale))
@@ -0,0 +1,67 @@
+"""
+SkillTwin - Test Configuration
+Runs the app against a throwaway database and vector store
+"""
+
+import hashlib
+import os
+import re
+import tempfile
+
+import pytest
+
+# Settings are read on import, so the environment is set before the app loads
+_tmp = tempfile.mkdtemp(prefix="skilltwin-tests-")
+os.environ.update({
+    "DATABASE_URL": f"sqlite+aiosqlite:///{_tmp}/skilltwin.db",
+    "CHROMA_PERSIST_DIRECTORY": f"{_tmp}/chroma_db",
+    "MMAP_INDEX_DIRECTORY": f"{_tmp}/vector_index",
+    "VECTOR_STORE_MANIFEST_PATH": f"{_tmp}/vector_store_manifest.json",
+    "EMBEDDING_CACHE_PATH": f"{_tmp}/embedding_cache.sqlite3",
+    "GEMINI_API_KEY": "",
+    "DEBUG": "false",
+    # Background writers would add statements to whichever request is being counted
+    "RAG_WRITE_BUFFER_ENABLED": "false",
+    "RAG_COMPACTION_ENABLED": "false",
+})
+
+
+class _HashingEmbeddingFunction:
+    """Deterministic bag-of-words vectors, so tests never download the ONNX model"""
+    
+    def __call__(self, input):
+        vectors = []
+        for text in input:
+            vector = [0.0] * 64
+            for word in re.findall(r"\w+", text.lower()):
+                vector[int(hashlib.md5(word.encode()).hexdigest(), 16) % 64] += 1.0
+            norm = sum(x * x for x in vector) ** 0.5 or 1.0
+            vectors.append([x / norm for x in vector])
+        return vectors
+
+
+# Before the app builds the embedding service and opens its collections
+from chromadb.utils import embedding_functions  # noqa: E402
+
+embedding_functions.DefaultEmbeddingFunction = _HashingEmbeddingFunction
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+from app.core.database import statements_executed  # noqa: E402
+from app.main import app  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def client():
+    with TestClient(app) as client:
+        yield client
+
+
+@pytest.fixture
+def count_statements():
+    """Call a function and return (its result, SQL statements it ran)"""
+    def count(fn, *args, **kwargs):
+        before = statements_executed()
+        result = fn(*args, **kwargs)
+        return result, statements_executed() - before
+    return count
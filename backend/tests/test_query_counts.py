@@ -0,0 +1,133 @@
+"""
+SkillTwin - Query Count Tests
+SQL statements per request for the LTP profile, modality and session routes.
+The counts must not grow with a learner's history (no N+1 lazy loads).
+"""
+
+import uuid
+
+import pytest
+from sqlalchemy import event
+
+from app.core.database import engine
+from app.modules.dual_rag.service import DualRAGService
+
+P = "/api/v1/ltp"
+
+
+@pytest.fixture
+def profile(client):
+    user_id = f"user-{uuid.uuid4()}"
+    response = client.post(f"{P}/profiles/{user_id}")
+    assert response.status_code == 201
+    return response.json()
+
+
+@pytest.fixture
+def concepts(client):
+    return [
+        client.post(f"{P}/concepts", json={"name": f"Concept {uuid.uuid4()}", "subject": "Physics", "topic": "Mechanics"}).json()
+        for _ in range(3)
+    ]
+
+
+def _add_history(client, profile_id, concepts):
+    """One session, mastery and misconception per concept"""
+    for concept in concepts:
+        session = client.post(f"{P}/profiles/{profile_id}/sessions", json={"session_type": "quiz"}).json()
+        client.patch(f"{P}/sessions/{session['id']}", json={"duration_minutes": 5})
+        client.post(f"{P}/profiles/{profile_id}/masteries/{concept['id']}", json={"correct": True})
+        client.post(
+            f"{P}/profiles/{profile_id}/misconceptions",
+            json={"concept_id": concept["id"], "misconception_type": "factual", "description": "Mixed up"}
+        )
+
+
+def test_get_profile(client, profile, count_statements):
+    response, statements = count_statements(client.get, f"{P}/profiles/{profile['id']}")
+    assert response.status_code == 200
+    assert statements == 1
+
+
+def test_get_profile_by_user_with_history(client, profile, concepts, count_statements):
+    url = f"{P}/profiles/user/{profile['user_id']}"
+    _add_history(client, profile["id"], concepts[:1])
+    response, statements = count_statements(client.get, url)
+    assert response.status_code == 200
+    assert statements == 5
+    
+    _add_history(client, profile["id"], concepts[1:])
+    response, statements = count_statements(client.get, url)
+    assert len(response.json()["concept_masteries"]) == 3
+    assert statements == 5
+
+
+def test_mastery_update(client, profile, concepts, count_statements):
+    url = f"{P}/profiles/{profile['id']}/masteries/{concepts[0]['id']}"
+    # The first correct answer also bumps the profile's attempted and mastered counters
+    response, statements = count_statements(client.post, url, json={"correct": True})
+    assert response.status_code == 200
+    assert statements == 8
+    
+    response, statements = count_statements(client.post, url, json={"correct": True})
+    assert response.json()["attempts_count"] == 2
+    assert statements == 6
+
+
+def test_modality_routes(client, profile, count_statements):
+    response, statements = count_statements(
+        client.post,
+        f"{P}/profiles/{profile['id']}/modality-feedback",
+        params={"modality": "analogy", "success": True}
+    )
+    assert response.status_code == 200
+    assert statements == 2
+    
+    response, statements = count_statements(client.get, f"{P}/profiles/{profile['id']}/preferred-modality")
+    assert response.json()["preferred_modality"] == "analogy"
+    assert statements == 1
+
+
+def test_session_routes(client, profile, count_statements):
+    response, statements = count_statements(
+        client.post, f"{P}/profiles/{profile['id']}/sessions", json={"session_type": "quiz"}
+    )
+    assert response.status_code == 201
+    assert statements == 4
+    
+    response, statements = count_statements(
+        client.patch, f"{P}/sessions/{response.json()['id']}", json={"duration_minutes": 7}
+    )
+    assert response.status_code == 200
+    assert statements == 5
+
+
+def test_rag_query_serves_repeated_profile_lookups_from_request_cache(client, profile, monkeypatch):
+    profile_selects = []
+    
+    def record(conn, cursor, statement, *args):
+        if statement.lstrip().startswith("SELECT") and "FROM learning_twin_profiles" in statement:
+            profile_selects.append(statement)
+    
+    # Look the profile up several times during the query, as other steps would
+    original = DualRAGService._get_preferred_modality
+    
+    async def lookup_repeatedly(self, profile_id):
+        modality = await original(self, profile_id)
+        assert await self.ltp_service.get_profile_by_id(profile_id) is not None
+        assert await self.ltp_service.get_preferred_modality(profile_id) == modality
+        assert await self.ltp_service.get_profile_by_id(profile_id) is not None
+        return modality
+    
+    monkeypatch.setattr(DualRAGService, "_get_preferred_modality", lookup_repeatedly)
+    event.listen(engine.sync_engine, "before_cursor_execute", record)
+    try:
+        response = client.post(
+            "/api/v1/rag/query",
+            json={"profile_id": profile["id"], "query": "Why do heavier objects not fall faster?"}
+        )
+    finally:
+        event.remove(engine.sync_engine, "before_cursor_execute", record)
+    
+    assert response.status_code == 200
+    assert len(profile_selects) == 1